@@ -0,0 +1,211 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a library of synthetic request arrival processes, and of the
+queueing formulas that depend on how bursty those arrivals are.  The
+other simulations assume Poisson arrivals (M/M/1 queues), for which
+the squared coefficient of variation (SCV) of inter-arrival times is
+one.  Burstier arrivals (SCV > 1) see longer queues at the same load.
+
+ACTIVE INGREDIENTS IN MODEL:
+    poisson ...... exponentially distributed inter-arrival times
+    mmpp ......... Markov-modulated Poisson: the arrival rate switches
+                   among a set of states, staying in each for an
+                   exponentially distributed time
+    on/off ....... Poisson arrivals during ON periods, none during OFF
+                   periods, with heavy-tailed (Pareto) period lengths
+    queueing ..... Kingman's G/G/1 approximation: the M/M/1 queue length
+                   scaled by (SCV(arrivals) + SCV(service)) / 2
+
+    Streams are lazy generators of (us) timestamps, which can be
+    collected into (stdlib) arrays of doubles for analysis.
+"""
+
+import math
+import random
+from array import array
+from units import *
+
+
+def poisson(rate, duration, seed=None):
+    """ generate Poisson arrival times
+        rate -- average arrivals per second
+        duration -- (us) length of the stream
+        seed -- random number seed (for repeatable streams)
+    """
+    rng = random.Random(seed)
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate) * SECOND
+        if t >= duration:
+            return
+        yield t
+
+
+def mmpp(rates, holds, duration, seed=None):
+    """ generate Markov-modulated Poisson arrival times
+        rates -- list of arrival rates (per second) for each state
+        holds -- list of mean (us) times spent in each state
+        duration -- (us) length of the stream
+        seed -- random number seed (for repeatable streams)
+
+        NOTE: when a state ends, we move to one of the other states
+              (chosen uniformly).
+    """
+    rng = random.Random(seed)
+    state = 0
+    t = 0.0
+    end = rng.expovariate(1.0 / holds[state])
+    while t < duration:
+        # arrivals within this state
+        if rates[state] > 0:
+            while True:
+                t += rng.expovariate(rates[state]) * SECOND
+                if t >= end or t >= duration:
+                    break
+                yield t
+        t = end
+
+        # and then on to another state
+        if len(rates) > 1:
+            nxt = rng.randrange(len(rates) - 1)
+            state = nxt if nxt < state else nxt + 1
+        end = t + rng.expovariate(1.0 / holds[state])
+
+
+def onoff(rate, on, off, duration, alpha=1.5, seed=None):
+    """ generate heavy-tailed on/off arrival times
+        rate -- arrivals per second while ON
+        on -- mean (us) length of ON periods
+        off -- mean (us) length of OFF periods
+        duration -- (us) length of the stream
+        alpha -- Pareto shape of period lengths (1 < alpha < 2 is
+                 heavy tailed: finite mean, infinite variance)
+        seed -- random number seed (for repeatable streams)
+    """
+    rng = random.Random(seed)
+    scale = (alpha - 1) / alpha     # Pareto minimum per unit mean
+    t = 0.0
+    while t < duration:
+        end = t + on * scale * rng.paretovariate(alpha)
+        while True:
+            t += rng.expovariate(rate) * SECOND
+            if t >= end or t >= duration:
+                break
+            yield t
+        t = end + off * scale * rng.paretovariate(alpha)
+
+
+def collect(stream):
+    """ gather a stream of arrival times into an array of doubles """
+    return array('d', stream)
+
+
+def interarrivals(times):
+    """ (mean, SCV) of the inter-arrival times of a stream
+        times -- (sorted) arrival times
+    """
+    n = 0
+    total = 0.0
+    squares = 0.0
+    last = None
+    for t in times:
+        if last is not None:
+            gap = t - last
+            n += 1
+            total += gap
+            squares += gap * gap
+        last = t
+    if n < 2:
+        return (float('inf'), 1.0)
+    mean = total / n
+    var = max(0.0, squares / n - mean * mean)
+    return (mean, var / (mean * mean))
+
+
+def counts(times, interval, duration):
+    """ number of arrivals in each (fixed length) interval
+        times -- arrival times
+        interval -- (us) length of each interval
+        duration -- (us) length of the stream
+    """
+    bins = array('l', [0] * int(math.ceil(float(duration) / interval)))
+    for t in times:
+        bins[int(t / interval)] += 1
+    return bins
+
+
+def mmpp_idc(rates, holds):
+    """ (asymptotic) index of dispersion of counts of a two state MMPP
+        rates -- arrival rates (per second) in each state
+        holds -- mean (us) times spent in each state
+
+        NOTE: over long intervals, this (rather than the inter-arrival
+              SCV) is what governs heavy traffic queueing
+    """
+    (l1, l2) = rates
+    r1 = SECOND / float(holds[0])   # rate of leaving each state
+    r2 = SECOND / float(holds[1])
+    mean = (l1 * r2 + l2 * r1) / (r1 + r2)
+    return 1 + 2 * ((l1 - l2) ** 2) * r1 * r2 / ((r1 + r2) ** 3 * mean)
+
+
+def gg1_factor(ca2, cs2=1.0):
+    """ Kingman scaling of M/M/1 queue length for G/G/1
+        ca2 -- SCV of inter-arrival times (1 = Poisson)
+        cs2 -- SCV of service times (1 = exponential)
+    """
+    return (ca2 + cs2) / 2.0
+
+
+def queue_length(rho, max_depth=1000, ca2=1.0, cs2=1.0):
+    """ average queue depth as a function of load and burstiness
+        rho -- average fraction of time the server is busy
+        max_depth -- the longest the queue can possibly be
+        ca2 -- SCV of inter-arrival times (1 = Poisson)
+        cs2 -- SCV of service times (1 = exponential)
+    """
+    if (rho >= 1):
+        return max_depth
+    avg = gg1_factor(ca2, cs2) * rho / (1 - rho)
+    return avg if avg < max_depth else max_depth
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    from Poisson import cdf
+
+    duration = 100 * SECOND
+    rate = 1000
+    streams = (
+        ("poisson", poisson(rate, duration, seed=1)),
+        ("mmpp(2x)", mmpp((rate / 2, 2 * rate), (SECOND, SECOND / 2),
+                          duration, seed=1)),
+        ("on/off", onoff(2 * rate, SECOND / 10, SECOND / 10, duration,
+                         seed=1)),
+    )
+    print("Arrival processes (%d/s for %ds)" % (rate, duration / SECOND))
+    print("\tprocess      arrivals   gap(us)    SCV   IDC(1s)  " +
+          "P(>1100/s)  rho=0.8 queue")
+    for (name, stream) in streams:
+        times = collect(stream)
+        (mean, scv) = interarrivals(times)
+        bins = counts(times, SECOND, duration)
+        m = float(sum(bins)) / len(bins)
+        v = sum([(b - m) ** 2 for b in bins]) / len(bins)
+        over = len([b for b in bins if b > 1100]) / float(len(bins))
+        idc = v / m
+        print("\t%-10s %9d %9.1f %6.2f %8.1f %9.3f %14.1f" %
+              (name, len(times), mean, scv, idc, over,
+               queue_length(0.8, ca2=scv)))
+    print("\tPoisson P(>1100/s) = %5.3f" %
+          (1 - cdf(rate, 1, [1100])[0]))
+    print("\tanalytic MMPP IDC = %3.1f" %
+          mmpp_idc((rate / 2, 2 * rate), (SECOND, SECOND / 2)))
+    print("")
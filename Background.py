@@ -0,0 +1,251 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of background work (scrubbing, recovery, backfill
+and compaction) on a Server, and of how it interferes with foreground
+(client) I/O.  The other Server simulations assume that the disks are
+serving only foreground requests.
+
+ACTIVE INGREDIENTS IN MODEL:
+    activities ... each background activity has a bandwidth cap (bytes/sec
+                   per disk), a priority, an I/O size, and the number of
+                   bytes it reads, writes and sends over the network for
+                   each byte it processes
+    scheduling ... disk time is shared (like a weighted priority queue)
+                   in proportion to priority: when the foreground would
+                   use all of the disk, each activity gets its weighted
+                   share (up to its cap), and anything an activity does
+                   not need is shared among the others
+    throughput ... foreground gets the disk time left over, and the HBA
+                   and NIC bandwidth that the background is not using
+    latency ...... a foreground request that arrives while a background
+                   I/O is in progress must wait for (half of) it.  We use
+                   the capped (rather than the shared) background disk
+                   utilization, because that is what lightly loaded
+                   disks see.
+    completion ... time to process a given amount of data, both on idle
+                   disks (at the cap) and under saturating foreground
+                   load (at the shared rate)
+"""
+
+from units import *
+
+
+class Activity:
+    """ a type of background work """
+
+    def __init__(self, name, cap, priority=1, io=1 * MB, seq=True,
+                 reads=1.0, writes=0.0, net=0.0):
+        """ describe a background activity
+            name -- for reporting
+            cap -- maximum bytes/sec (per disk) of background work
+            priority -- relative scheduling weight
+            io -- size of each background I/O
+            seq -- are the background I/Os sequential
+            reads -- bytes read from disk per byte processed
+            writes -- bytes written to disk per byte processed
+            net -- bytes sent over the network per byte processed
+        """
+        self.name = name
+        self.cap = cap
+        self.priority = priority
+        self.io = io
+        self.seq = seq
+        self.reads = reads
+        self.writes = writes
+        self.net = net
+
+    def disk_time(self, fs):
+        """ (us) disk time to process one I/O worth of data
+            fs -- SimFS on which the work is done
+        """
+        t = 0
+        if self.reads > 0:
+            (t_r, bw, l) = fs.read(self.io, fs.size, seq=self.seq)
+            t += self.reads * t_r
+        if self.writes > 0:
+            (t_w, bw, l) = fs.write(self.io, fs.size, seq=self.seq)
+            t += self.writes * t_w
+        return t
+
+    def demand(self, fs):
+        """ fraction of a disk's time the activity uses at its cap """
+        return min(1.0, self.cap * self.disk_time(fs) /
+                   (float(self.io) * SECOND))
+
+
+class Background:
+    """ Performance Modeling Background Work Interference Simulation. """
+
+    def __init__(self, activities, client_priority=63):
+        """ create a background work simulation
+            activities -- list of Activity
+            client_priority -- scheduling weight of foreground requests
+        """
+        self.activities = activities
+        self.client_priority = client_priority
+        self.desc = ", ".join([a.name for a in activities])
+        self.memo = {}
+
+    def shares(self, fs):
+        """ fraction of disk time each activity gets under saturating
+            foreground load (weighted max-min fair sharing)
+            fs -- SimFS on which the work is done
+
+            returns {activity name: fraction of disk time}
+        """
+        demand = {}
+        for a in self.activities:
+            demand[a.name] = a.demand(fs)
+        weight = {}
+        for a in self.activities:
+            weight[a.name] = a.priority
+
+        # hand out what is left in proportion to the weights of those
+        #   who still want more, until everyone is satisfied (or capped)
+        shares = {}
+        left = 1.0
+        active = list(demand.keys())
+        while active and left > 0:
+            total = self.client_priority + sum([weight[n] for n in active])
+            capped = [n for n in active
+                      if demand[n] <= left * weight[n] / total]
+            if not capped:
+                for n in active:
+                    shares[n] = left * weight[n] / total
+                break
+            for n in capped:
+                shares[n] = demand[n]
+                left -= demand[n]
+                active.remove(n)
+        return shares
+
+    def interference(self, fs, disks):
+        """ (remembered) resources consumed by background work
+            fs -- SimFS on which the work is done
+            disks -- number of such disks in the server
+
+            returns (fraction of disk time, HBA bytes/sec, NIC bytes/sec,
+                     (us) expected wait behind a background I/O)
+        """
+        key = (fs, disks)
+        if key in self.memo:
+            return self.memo[key]
+
+        shares = self.shares(fs)
+        busy = 0.0
+        hba = 0.0
+        net = 0.0
+        wait = 0.0
+        for a in self.activities:
+            t_io = a.disk_time(fs)
+            rate = shares[a.name] * a.io * SECOND / t_io
+            busy += shares[a.name]
+            hba += disks * rate * (a.reads + a.writes)
+            net += disks * rate * a.net
+            wait += a.demand(fs) * t_io / 2
+        self.memo[key] = (busy, hba, net, wait)
+        return self.memo[key]
+
+    def completion(self, name, bytes, fs):
+        """ (us) time for one disk to complete an activity
+            name -- of the activity
+            bytes -- amount of data (per disk) to be processed
+            fs -- SimFS on which the work is done
+
+            returns (time on an idle disk, time under saturating load)
+        """
+        for a in self.activities:
+            if a.name == name:
+                break
+        t_io = a.disk_time(fs)
+        idle = a.demand(fs) * a.io * SECOND / t_io
+        loaded = self.shares(fs)[name] * a.io * SECOND / t_io
+        return (bytes * SECOND / idle,
+                bytes * SECOND / loaded if loaded > 0 else float('inf'))
+
+
+# characteristics of each type of background work
+#   (priorities are those of the Ceph OSD op queue)
+ACTIVITIES = {
+    #             priority  io size  seq    reads  writes net
+    'scrub':      (5,       512 * KB, True,  1.0,   0.0,   0.0),
+    'recovery':   (3,       4 * MB,   True,  1.0,   1.0,   1.0),
+    'backfill':   (1,       4 * MB,   True,  1.0,   1.0,   1.0),
+    'compaction': (63,      1 * MB,   True,  1.0,   1.0,   0.0),
+}
+
+
+def makeBackground(dict):
+    """ instantiate the background work described by a configuration dict
+        dict -- of background work parameters
+            scrub_bw, recovery_bw, backfill_bw, compaction_bw
+                -- bytes/sec (per disk) cap for each activity (if present)
+            scrub_prio, recovery_prio, ...
+                -- scheduling weight for each activity
+            scrub_io, recovery_io, ...
+                -- I/O size for each activity
+            client_prio -- scheduling weight of foreground requests
+    """
+
+    dflts = {
+        'client_prio': 63,
+    }
+
+    client = dict['client_prio'] if 'client_prio' in dict \
+        else dflts['client_prio']
+
+    activities = []
+    for name in ('scrub', 'recovery', 'backfill', 'compaction'):
+        if name + '_bw' not in dict:
+            continue
+        (prio, io, seq, reads, writes, net) = ACTIVITIES[name]
+        if name + '_prio' in dict:
+            prio = dict[name + '_prio']
+        if name + '_io' in dict:
+            io = dict[name + '_io']
+        activities.append(Activity(name, dict[name + '_bw'], priority=prio,
+                                   io=io, seq=seq, reads=reads,
+                                   writes=writes, net=net))
+
+    return Background(activities, client_priority=client)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+
+    fs = makefs(makedisk({'device': 'disk'}), {})
+    scrub = 1 * TB
+    print("Server (4 disks), 1TB scrub per disk, under background work")
+    print("\tbackground                4K rd IOPS  lat(us)  128K wr MB/s" +
+          "  disk   scrub (idle/busy)")
+    for d in ({}, {'scrub_bw': 10 * MEG}, {'scrub_bw': 40 * MEG},
+              {'scrub_bw': 10 * MEG, 'recovery_bw': 20 * MEG},
+              {'scrub_bw': 10 * MEG, 'recovery_bw': 20 * MEG,
+               'recovery_prio': 63}):
+        d['disks'] = 4
+        s = makeServer(fs, d)
+        (t1, b1, l1) = s.read(4096, depth=16)
+        (t2, b2, l2) = s.write(128 * KB, depth=16, seq=True)
+        desc = "none"
+        done = ""
+        if s.background is not None:
+            desc = ", ".join(["%s %d%s" % (a.name, a.cap / MEG,
+                                           "!" if a.priority > 5 else "")
+                              for a in s.background.activities])
+            (idle, busy) = s.background.completion('scrub', scrub, fs)
+            done = "%4.1fh/%5.1fh" % (idle / SECOND / 3600,
+                                      busy / SECOND / 3600)
+        print("\t%-24s %10d %8d %13.1f %5.2f   %s" %
+              (desc, b1 / 4096, t1, b2 / MEG, l1.get('bg', 0), done))
+    print("\t(caps in MB/s per disk, ! = client priority)")
+    print("")
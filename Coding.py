@@ -0,0 +1,375 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of the data protection schemes (replication,
+Reed-Solomon and Locally Repairable erasure codes) that a Gateway
+can use to spread a stripe of data across multiple storage servers.
+
+A scheme does not do any I/O of its own.  It merely tells its caller:
+    how many data and redundancy strips make up a stripe
+    how many strips must be read/written for full, partial
+        and degraded operations
+    how much CPU it takes to encode, update and decode the data
+    how many bytes those operations put on the network
+"""
+
+import math
+from units import *
+
+
+class Code:
+    """ Performance Modeling Data Protection Scheme. """
+
+    # CPU calibration constants ... expect these to be over-ridden
+    encode_x = 5        # FIX - instructions per byte per parity computed
+    xor_x = 1           # FIX - instructions per byte for XOR parity
+
+    def __init__(self, n, m):
+        """ create a data protection scheme simulation
+            n -- number of data strips in a stripe
+            m -- number of redundancy strips in a stripe
+        """
+        self.n = n
+        self.m = m
+        self.width = n + m
+        self.tolerates = m      # concurrent strip losses we survive
+        self.desc = "%d+%d" % (n, m)
+
+    def efficiency(self):
+        """ fraction of the raw capacity that holds user data """
+        return float(self.n) / self.width
+
+    def read_strips(self, strips, degraded=False):
+        """ number of strips we must read to obtain data strips
+            strips -- number of data strips wanted (from one stripe)
+            degraded -- one of the wanted strips has been lost
+        """
+        return strips
+
+    def write_strips(self, strips, degraded=False):
+        """ (reads, writes) required to update data strips
+            strips -- number of data strips updated (in one stripe)
+            degraded -- one of the strips to be written has been lost
+        """
+        writes = self.width
+        if degraded:
+            writes -= 1
+        return (0, writes)
+
+    def reconstructs(self, strips, degraded=False):
+        """ does a partial stripe write recompute (rather than update)
+            the redundancy from the whole stripe
+            strips -- number of data strips updated (in one stripe)
+            degraded -- one of the strips to be written has been lost
+        """
+        return False
+
+    def encode_cpu(self, cpu, bytes):
+        """ CPU time to compute redundancy for a full stripe
+            cpu -- SimCPU for the processor doing the work
+            bytes -- data bytes in the stripe
+        """
+        return 0
+
+    def update_cpu(self, cpu, bytes):
+        """ CPU time to update redundancy for a partial stripe write
+            cpu -- SimCPU for the processor doing the work
+            bytes -- data bytes being overwritten
+        """
+        return 0
+
+    def decode_cpu(self, cpu, bytes):
+        """ CPU time to reconstruct lost data
+            cpu -- SimCPU for the processor doing the work
+            bytes -- bytes of data to be reconstructed
+        """
+        return 0
+
+    def offloaded(self, cpu):
+        """ is the redundancy computation done by an accelerator """
+        return cpu.offloaded('ec')
+
+    def encode_time(self, cpu, bytes):
+        """ elapsed time to compute redundancy for a full stripe """
+        t = self.encode_cpu(cpu, bytes)
+        if t == 0 or not self.offloaded(cpu):
+            return t
+        return cpu.accel.time(bytes, self.m * bytes / self.n)
+
+    def update_time(self, cpu, bytes):
+        """ elapsed time to update redundancy for a partial stripe """
+        t = self.update_cpu(cpu, bytes)
+        if t == 0 or not self.offloaded(cpu):
+            return t
+        return cpu.accel.time((2 + self.m) * bytes, self.m * bytes)
+
+    def decode_time(self, cpu, bytes):
+        """ elapsed time to reconstruct lost data """
+        t = self.decode_cpu(cpu, bytes)
+        if t == 0 or not self.offloaded(cpu):
+            return t
+        return cpu.accel.time(self.n * bytes, bytes)
+
+    def data_strips(self, bytes, strip):
+        """ number of data strips some data spans
+            bytes -- data bytes
+            strip -- bytes per strip
+        """
+        return min(self.n, max(1, int(math.ceil(float(bytes) / strip))))
+
+    def read_bytes(self, bytes, strip, degraded=False):
+        """ bytes we must fetch over the network to read some data
+            bytes -- data bytes wanted (within one stripe)
+            strip -- bytes per strip
+            degraded -- one of the wanted strips has been lost
+        """
+        strips = self.data_strips(bytes, strip)
+        return self.read_strips(strips, degraded) * min(bytes, strip)
+
+    def write_bytes(self, bytes, strip, degraded=False):
+        """ bytes we must move over the network to write some data
+            bytes -- data bytes written (within one stripe)
+            strip -- bytes per strip
+            degraded -- one of the strips to be written has been lost
+        """
+        strips = self.data_strips(bytes, strip)
+        (reads, writes) = self.write_strips(strips, degraded)
+        return (reads + writes) * min(bytes, strip)
+
+
+class Replication(Code):
+    """ k-way replication """
+
+    def __init__(self, copies=3):
+        """ create a replication simulation
+            copies -- number of copies of each strip
+        """
+        Code.__init__(self, 1, copies - 1)
+        self.desc = "%dx rep" % (copies)
+
+    # (the base class read/write/cpu costs are exactly replication)
+
+
+class ReedSolomon(Code):
+    """ Reed-Solomon(n, m) erasure code """
+
+    def __init__(self, n=6, m=2):
+        """ create a Reed-Solomon simulation
+            n -- number of data strips in a stripe
+            m -- number of parity strips in a stripe
+        """
+        Code.__init__(self, n, m)
+        self.desc = "RS(%d,%d)" % (n, m)
+
+    def read_strips(self, strips, degraded=False):
+        """ number of strips we must read to obtain data strips """
+        # reconstruction requires any n of the surviving strips
+        return self.n if degraded else strips
+
+    def write_strips(self, strips, degraded=False):
+        """ (reads, writes) required to update data strips """
+        if strips >= self.n:
+            return Code.write_strips(self, strips, degraded)
+
+        # partial stripes use the cheaper of read-modify-write
+        # (old data and parity) or reconstruct-write (the other data)
+        rmw = strips + self.m
+        rcw = self.n - strips
+        reads = rcw if self.reconstructs(strips, degraded) else rmw
+        writes = strips + self.m
+        if degraded:
+            writes -= 1
+        return (reads, writes)
+
+    def reconstructs(self, strips, degraded=False):
+        """ does a partial stripe write recompute the parity """
+        if strips >= self.n:
+            return False
+        # (we cannot read-modify-write a strip we have lost)
+        return degraded or (self.n - strips) < (strips + self.m)
+
+    def encode_cpu(self, cpu, bytes):
+        """ CPU time to compute parity for a full stripe """
+        if self.offloaded(cpu):
+            return cpu.accel.submit_cpu()
+        t_cpu = cpu.execute(self.encode_x * self.m * bytes)
+        t_cpu += cpu.mem_read(bytes)
+        t_cpu += cpu.mem_write(self.m * bytes / self.n)
+        return t_cpu
+
+    def update_cpu(self, cpu, bytes):
+        """ CPU time to compute parity deltas for a partial write """
+        if self.offloaded(cpu):
+            return cpu.accel.submit_cpu()
+        # delta between old and new data, applied to each parity
+        t_cpu = cpu.execute(self.xor_x * bytes)
+        t_cpu += cpu.execute(self.encode_x * self.m * bytes)
+        t_cpu += cpu.mem_read((2 + self.m) * bytes)
+        t_cpu += cpu.mem_write(self.m * bytes)
+        return t_cpu
+
+    def decode_cpu(self, cpu, bytes):
+        """ CPU time to reconstruct lost data from n survivors """
+        if self.offloaded(cpu):
+            return cpu.accel.submit_cpu()
+        t_cpu = cpu.execute(self.encode_x * self.n * bytes)
+        t_cpu += cpu.mem_read(self.n * bytes)
+        t_cpu += cpu.mem_write(bytes)
+        return t_cpu
+
+
+class LRC(Code):
+    """ Locally Repairable Code: k data, l local and g global parities """
+
+    def __init__(self, k=12, l=2, g=2):
+        """ create an LRC simulation
+            k -- number of data strips in a stripe
+            l -- number of local groups (each with one XOR parity)
+            g -- number of global (Reed-Solomon) parities
+        """
+        Code.__init__(self, k, l + g)
+        self.l = l
+        self.g = g
+        self.group = k / l          # data strips per local group
+        self.tolerates = g + 1      # guaranteed, some patterns do better
+        self.desc = "LRC(%d,%d,%d)" % (k, l, g)
+
+    def read_strips(self, strips, degraded=False):
+        """ number of strips we must read to obtain data strips """
+        if not degraded:
+            return strips
+        # a lost strip is rebuilt from the rest of its local group
+        return min(self.n, strips - 1 + self.group)
+
+    def write_strips(self, strips, degraded=False):
+        """ (reads, writes) required to update data strips """
+        if strips >= self.n:
+            return Code.write_strips(self, strips, degraded)
+
+        # read-modify-write of data, affected local and all global parities
+        groups = min(self.l, int(math.ceil(float(strips) / self.group)))
+        reads = strips + groups + self.g
+        writes = strips + groups + self.g
+        if degraded:
+            reads += self.group - 1     # rebuild old data from its group
+            writes -= 1
+        return (reads, writes)
+
+    def encode_cpu(self, cpu, bytes):
+        """ CPU time to compute local and global parities for a stripe """
+        if self.offloaded(cpu):
+            return cpu.accel.submit_cpu()
+        t_cpu = cpu.execute(self.xor_x * bytes)
+        t_cpu += cpu.execute(self.encode_x * self.g * bytes)
+        t_cpu += cpu.mem_read(bytes)
+        t_cpu += cpu.mem_write(self.m * bytes / self.n)
+        return t_cpu
+
+    def update_cpu(self, cpu, bytes):
+        """ CPU time to compute parity deltas for a partial write """
+        if self.offloaded(cpu):
+            return cpu.accel.submit_cpu()
+        t_cpu = cpu.execute(2 * self.xor_x * bytes)
+        t_cpu += cpu.execute(self.encode_x * self.g * bytes)
+        t_cpu += cpu.mem_read((3 + self.g) * bytes)
+        t_cpu += cpu.mem_write((1 + self.g) * bytes)
+        return t_cpu
+
+    def decode_cpu(self, cpu, bytes):
+        """ CPU time to reconstruct lost data from its local group """
+        if self.offloaded(cpu):
+            return cpu.accel.submit_cpu()
+        t_cpu = cpu.execute(self.xor_x * self.group * bytes)
+        t_cpu += cpu.mem_read(self.group * bytes)
+        t_cpu += cpu.mem_write(bytes)
+        return t_cpu
+
+
+def makeCode(dict):
+    """ instantiate the protection scheme described by a configuration dict
+        dict -- of scheme parameters
+            code -- 'rs', 'lrc', or 'rep' (default rs)
+            n, m -- Reed-Solomon data and parity strips
+            k, l, g -- LRC data strips, local groups, global parities
+            copies -- number of replicas
+    """
+
+    dflts = {
+        'code': 'rs',
+        'n': 6,
+        'm': 2,
+        'k': 12,
+        'l': 2,
+        'g': 2,
+        'copies': 3,
+    }
+
+    code = dict['code'] if 'code' in dict else dflts['code']
+    if code == 'rep':
+        copies = dict['copies'] if 'copies' in dict else dflts['copies']
+        return Replication(copies)
+    elif code == 'lrc':
+        k = dict['k'] if 'k' in dict else dflts['k']
+        l = dict['l'] if 'l' in dict else dflts['l']
+        g = dict['g'] if 'g' in dict else dflts['g']
+        return LRC(k, l, g)
+    else:
+        n = dict['n'] if 'n' in dict else dflts['n']
+        m = dict['m'] if 'm' in dict else dflts['m']
+        return ReedSolomon(n, m)
+
+
+def codetest(codes, cpu, strip=128 * KB):
+    """ compare the costs of a list of protection schemes
+        codes -- list of schemes to be compared
+        cpu -- SimCPU on which the coding is done
+        strip -- bytes per strip
+    """
+
+    print("    scheme         eff  fail  full r/w  part r/w  degr rd")
+    for c in codes:
+        (pr, pw) = c.write_strips(1)
+        print("    %-12s %4.2f  %4d  %4d/%-4d %4d/%-4d %7d" %
+              (c.desc, c.efficiency(), c.tolerates,
+               c.read_strips(c.n), c.width, pr, pw, c.read_strips(1, True)))
+    print("")
+
+    print("    scheme       encode    update    decode   net wr(4K)")
+    for c in codes:
+        stripe = c.n * strip
+        print("    %-12s %6dus  %6dus  %6dus  %8d" %
+              (c.desc, c.encode_cpu(cpu, stripe),
+               c.update_cpu(cpu, strip), c.decode_cpu(cpu, strip),
+               c.write_bytes(4096, strip)))
+    print("")
+
+
+#
+# compare the standard schemes at (roughly) equal durability
+#
+if __name__ == '__main__':
+
+    import SimCPU
+    cpu = SimCPU.makeCPU({})
+
+    schemes = [{'code': 'rep', 'copies': 3},
+               {'code': 'rs', 'n': 6, 'm': 2},
+               {'code': 'lrc', 'k': 12, 'l': 2, 'g': 1}]
+    codes = [makeCode(d) for d in schemes]
+    print("Protection schemes tolerating two failures on %s" % (cpu.desc))
+    codetest(codes, cpu)
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+    from Dlm import makeDLM
+    from Gateway import makeGateway, gatewaytest
+    s = makeServer(makefs(makedisk({}), {}), {})
+    dlm = makeDLM({})
+    for d in schemes:
+        d['servers'] = 8
+        gw = makeGateway(s, dlm, d)
+        gatewaytest(gw, {'SioCdepth': [16]}, descr=gw.code.desc)
@@ -5,10 +5,14 @@
 
 """
 This is intended to be able to simulate the performance of
-a distributed lock manager
+a distributed lock manager, either a single lock server or
+a cluster of lock servers, each responsible for the stripes
+that hash to it.
 """
 
+import math
 from units import *
+from Poisson import Pn, PnPlus
 
 
 class DLM:
@@ -20,24 +24,31 @@ class DLM:
                  nic,
                  cpu,
                  num_nics=1,
-                 num_cpus=1):
+                 num_cpus=1,
+                 journal=None):
 
         """ create an object server simulation
             nic -- SimIFC for the network interface
             cpu -- SimCPU for the processor
             num_nic -- number of NICs per server (for our use)
             num_cpus -- number of processors per server (for our use)
+            journal -- SimDisk on which lock state is persisted (or None)
         """
         self.nic = nic
         self.cpu = cpu
         self.num_nics = num_nics
         self.num_cpus = num_cpus
+        self.journal = journal
 
         # sizing performance parameters
         self.min_msg = 128	    # minimum request/response
 
         # magic performance tuning constants
         self.lock_us = 1        # time (us) to handle a lock
+        self.release_us = 10    # time (us) for a holder to release a lock
+        self.max_queue = 100    # longest conflict queue we consider
+        self.lock_rec = 64      # bytes of journal per lock update
+        self.jrnl_batch = 32    # max lock updates per journal write
 
     def warn(self, msg):
         """ add a warning to our accumulated warnings list """
@@ -46,8 +57,81 @@ class DLM:
         if (self.warnings.find(msg) < 0):
             self.warnings += msg
 
-    def lock(self):
-        """ expected performance for an uncontested lock
+    def conflict(self, rate, hold, gateways=1):
+        """ probability of and expected wait for lock conflicts
+            rate -- lock requests per second (for this stripe)
+            hold -- (us) time each holder keeps the lock
+            gateways -- number of gateways competing for the lock
+
+            returns (probability of conflict, expected wait, revokes)
+        """
+        if gateways <= 1 or rate <= 0 or hold <= 0:
+            return (0.0, 0.0, 0.0)
+
+        # only requests from other gateways conflict with ours
+        others = float(rate) * (gateways - 1) / gateways
+        interval = float(hold) / SECOND
+        p_conflict = PnPlus(others, interval, 1)
+
+        # each conflicting holder must be called back, and then finish
+        t_msg = self.nic.min_write_latency + \
+            self.nic.write_time(self.min_msg)
+        t_revoke = 2 * t_msg + self.release_us
+
+        # sum the waits over the number of queued conflicting holders
+        #   (on average, we arrive half way through the current holder's
+        #   hold time, but each holder queued ahead of us holds it fully)
+        wait = 0.0
+        revokes = 0.0
+        n = 1
+        tail = p_conflict
+        while n <= self.max_queue and tail > 0.000001:
+            p = Pn(others, interval, n)
+            wait += p * (n * t_revoke + (hold / 2.0) + (n - 1) * hold)
+            revokes += p * n
+            tail -= p
+            n += 1
+        return (p_conflict, wait, revokes)
+
+    def journal_time(self, offered=0):
+        """ time to persist a lock update (and the updates per write)
+            offered -- lock requests per second to this server
+        """
+        if self.journal is None:
+            return (0, 1)
+
+        # updates that arrive during a journal write share the next one
+        t = self.journal.avgWrite(self.lock_rec, self.journal.size, seq=True)
+        batch = min(self.jrnl_batch, max(1, float(offered) * t / SECOND))
+        t = self.journal.avgWrite(batch * self.lock_rec,
+                                  self.journal.size, seq=True)
+        return (t, batch)
+
+    def capacity(self):
+        """ maximum sustainable lock requests per second """
+
+        # each lock costs one request receipt and one response
+        t_net_w = self.nic.min_write_latency + \
+            self.nic.write_time(self.min_msg)
+        cpu_per_lock = self.nic.read_cpu(self.min_msg)
+        cpu_per_lock += self.nic.write_cpu(self.min_msg)
+        cpu_per_lock += self.lock_us
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'lock')
+
+        bw_n = self.num_nics * SECOND / t_net_w     # responses limit the bw
+        bw_cpu = avail_cores * SECOND / cpu_per_lock
+        bw = min(bw_n, bw_cpu)
+        if self.journal is not None:
+            (t_j, batch) = self.journal_time(bw)
+            bw = min(bw, batch * SECOND / t_j)
+        return bw
+
+    def lock(self, rate=0, hold=0, gateways=1, offered=0):
+        """ expected performance for a (possibly contested) lock
+            rate -- lock requests per second (for this stripe)
+            hold -- (us) time each holder keeps the lock
+            gateways -- number of gateways competing for the lock
+            offered -- total lock requests per second to this server
         """
 
         load = {}
@@ -63,14 +147,86 @@ class DLM:
         cpu_lock = self.lock_us
         cpu_msg += self.nic.write_cpu(self.min_msg)
 
-        # FIX - we do not model persisting of lock status
+        # the new lock state must be persisted before we respond
+        (t_jrnl, batch) = self.journal_time(offered)
+
+        # conflicts cost callbacks to (and releases from) the holders
+        (p_conflict, t_wait, revokes) = self.conflict(rate, hold, gateways)
+        cpu_revoke = self.nic.write_cpu(self.min_msg)
+        cpu_revoke += self.nic.read_cpu(self.min_msg)
+        cpu_revoke += self.lock_us
+        cpu_lock += revokes * cpu_revoke
 
-        latency = cpu_msg + cpu_lock + t_net_w
-        bw = SECOND / latency
+        # concurrent lock requests contend for the cores
+        #   (Little's law: offered rate x time in the server)
+        bw = self.capacity()
+        depth = float(offered) * (cpu_msg + cpu_lock) / SECOND
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'lock')
+
+        # the wait for other holders does not keep us busy
+        t_busy = (cpu_msg + cpu_lock) * x_cpu + t_net_w + t_jrnl
+
+        # queueing delay on our busiest resource
+        rho = float(offered) / bw
+        if rho >= 1:
+            self.warn("DLM saturated by %d locks/s (max %d)\n" %
+                      (offered, bw))
+        q_delay = t_busy * self.cpu.queue_length(rho)
+
+        latency = t_busy + t_wait + q_delay
         load['cpu'] = float(cpu_msg + cpu_lock) / SECOND
         return (latency, bw, load)
 
 
+class DLMCluster:
+    """ Performance Modeling Sharded Lock Server Cluster Simulation. """
+
+    def __init__(self, shard, shards=1, stripes=1000000):
+        """ create a lock server cluster simulation
+            shard -- DLM simulation for each lock server
+            shards -- number of lock servers
+            stripes -- number of (hashed) stripes being locked
+        """
+        self.shard = shard
+        self.shards = shards
+        self.stripes = stripes
+        self.warnings = ""
+
+    def imbalance(self):
+        """ ratio of busiest shard load to average shard load """
+        if self.shards <= 1:
+            return 1.0
+
+        # max of (uniformly) hashed balls in bins (for stripes >> shards)
+        k = float(self.shards)
+        return 1 + math.sqrt(2 * k * math.log(k) / self.stripes)
+
+    def capacity(self):
+        """ maximum sustainable lock requests per second """
+        # we saturate when the busiest shard does
+        return self.shards * self.shard.capacity() / self.imbalance()
+
+    def conflict(self, rate, hold, gateways=1):
+        """ probability of and expected wait for lock conflicts """
+        return self.shard.conflict(rate, hold, gateways)
+
+    def lock(self, rate=0, hold=0, gateways=1, offered=0):
+        """ expected performance for a (possibly contested) lock
+            rate -- lock requests per second (for this stripe)
+            hold -- (us) time each holder keeps the lock
+            gateways -- number of gateways competing for the lock
+            offered -- total lock requests per second to the cluster
+        """
+        # the busiest shard gets more than its share of the requests
+        busiest = float(offered) * self.imbalance() / self.shards
+        (latency, bw, load) = self.shard.lock(rate, hold, gateways, busiest)
+        self.warnings = self.shard.warnings
+        for k in load:
+            load[k] *= self.imbalance()
+        return (latency, self.capacity(), load)
+
+
 def makeDLM(dict):
     """ instantiate the DLM described by a configuration dict
         dict -- of DLM parameters
@@ -83,6 +239,8 @@ def makeDLM(dict):
         'cores': 1,
         'nics': 1,
         'nic':  10 * GIG,
+        'shards': 1,
+        'stripes': 1000000,
     }
 
     # collect the parameters
@@ -92,15 +250,23 @@ def makeDLM(dict):
     cores = dict['cores'] if 'cores' in dict else dflts['cores']
     nics = dict['nics'] if 'nics' in dict else dflts['nics']
     nic_bw = dict['nic'] if 'nic' in dict else dflts['nic']
+    shards = dict['shards'] if 'shards' in dict else dflts['shards']
+    stripes = dict['stripes'] if 'stripes' in dict else dflts['stripes']
 
     # instantiate the parts
     import SimCPU
     myCpu = SimCPU.makeCPU(dict)
     import SimIFC
     myNic = SimIFC.NIC("eth", processor=myCpu, bw=nic_bw)
+    myJrnl = None
+    if 'journal' in dict:
+        import SimDisk
+        myJrnl = SimDisk.makedisk({'device': dict['journal']})
 
     # instantiate the DLM
-    dlm = DLM(myNic, myCpu, nics, cpus)
+    dlm = DLM(myNic, myCpu, nics, cpus, journal=myJrnl)
+    if shards > 1:
+        dlm = DLMCluster(dlm, shards, stripes)
     return dlm
 
 
@@ -114,3 +280,29 @@ if __name__ == '__main__':
     (tl, bw, ll) = dlm.lock()
     print("\tlock = %dus" % (tl))
     print("")
+
+    print("\tcontended locks (1ms hold time)")
+    print("\t    rate   gateways   conflict     latency")
+    for rate in (10, 100, 1000):
+        for g in (2, 8):
+            (tl, bw, ll) = dlm.lock(rate, 1000, g)
+            (p, w, r) = dlm.conflict(rate, 1000, g)
+            print("\t%8d   %8d     %5.3f   %7dus" % (rate, g, p, tl))
+    print("")
+
+    for jrnl in (None, 'ssd'):
+        print("\tlock cluster scaling (%s)" %
+              ("no journal" if jrnl is None else "journal on " + jrnl))
+        print("\t  shards   max locks/s    @10K/s    @30K/s   @100K/s")
+        for k in (1, 2, 4, 8, 16):
+            d = {'shards': k}
+            if jrnl is not None:
+                d['journal'] = jrnl
+            dlm = makeDLM(d)
+            lat = ()
+            for rate in (10000, 30000, 100000):
+                (t, bw, l) = dlm.lock(offered=rate)
+                lat += (t,)
+            print("\t%8d   %11d  %7dus  %7dus  %7dus" %
+                  ((k, dlm.capacity()) + lat))
+        print("")
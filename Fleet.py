@@ -0,0 +1,283 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of a heterogeneous fleet of storage servers: a mix
+of server SKUs, each with disks of (possibly different) drive generations
+and fill levels.  A Server simulation describes a single node (with N
+identical disks), and a Gateway multiplies that by the number of servers.
+Here we describe every disk and server in the fleet, group identical
+nodes together, simulate each group once, and combine the results.
+
+ACTIVE INGREDIENTS IN MODEL:
+    tables ....... the fleet is stored as parallel (stdlib) arrays, one
+                   entry per disk (model, server, fill) and one per server
+                   (model), which costs about ten bytes per disk
+    models ....... disk and server models are configuration dicts (as
+                   for makedisk/makefs and makeServer), referred to by
+                   their index in the fleet's list of models
+    fill ......... is passed to the server model (where it determines
+                   the number of objects competing for the object cache),
+                   rounded to the nearest 10%
+    groups ....... servers with the same model, number of disks and mix of
+                   (disk model, fill) are identical, and are simulated once
+    slow disks ... data is spread uniformly over a server's disks, so a
+                   server with mixed disks runs at the pace of its slowest
+    slow servers . each stripe is spread over 'width' servers, and each
+                   stripe operation waits for its slowest member.  For
+                   randomly placed stripes, the fleet throughput is the
+                   number of servers times the expected minimum throughput
+                   of 'width' servers drawn from the fleet.
+"""
+
+from array import array
+from units import *
+
+FILL_STEP = 0.1     # fill levels are grouped in steps of this size
+
+
+class Fleet:
+    """ Performance Modeling Heterogeneous Server Fleet. """
+
+    def __init__(self, disk_models, server_models, width=1):
+        """ create an (empty) fleet
+            disk_models -- list of disk/file system configuration dicts
+            server_models -- list of server configuration dicts
+            width -- number of servers across which each stripe is spread
+        """
+        self.disk_models = disk_models
+        self.server_models = server_models
+        self.width = width
+
+        # struct-of-arrays descriptions of each disk and server
+        self.d_model = array('B')       # index into disk_models
+        self.d_server = array('I')      # index of the containing server
+        self.d_fill = array('f')        # fraction of the disk in use
+        self.s_model = array('B')       # index into server_models
+
+        self.sims = {}      # group -> Server simulation
+        self.memo = {}      # (group, bsize, depth, seq, write) -> bw
+
+    def add_server(self, model):
+        """ add a (diskless) server to the fleet, returning its index
+            model -- index into server_models
+        """
+        self.s_model.append(model)
+        return len(self.s_model) - 1
+
+    def add_disk(self, server, model, fill=0.5):
+        """ add a disk to a server in the fleet
+            server -- index of the server
+            model -- index into disk_models
+            fill -- fraction of the disk that is in use
+        """
+        self.d_model.append(model)
+        self.d_server.append(server)
+        self.d_fill.append(fill)
+
+    def add_servers(self, count, model, disk_model, disks, fill=0.5):
+        """ add a number of identical servers to the fleet
+            count -- number of servers to add
+            model -- index into server_models
+            disk_model -- index into disk_models
+            disks -- number of disks in each server
+            fill -- fraction of each disk that is in use
+        """
+        for i in range(count):
+            s = self.add_server(model)
+            for j in range(disks):
+                self.add_disk(s, disk_model, fill)
+
+    def groups(self):
+        """ group the servers into identical configurations
+
+            returns {(server model, disks, ((disk model, fill), ...)):
+                     number of servers}
+        """
+        n = len(self.s_model)
+        counts = array('I', [0] * n)
+        mixes = [None] * n
+        for i in range(len(self.d_model)):
+            s = self.d_server[i]
+            fill = round(self.d_fill[i] / FILL_STEP) * FILL_STEP
+            key = (self.d_model[i], round(fill, 2))
+            counts[s] += 1
+            if mixes[s] is None:
+                mixes[s] = (key,)
+            elif key not in mixes[s]:
+                mixes[s] = tuple(sorted(mixes[s] + (key,)))
+
+        groups = {}
+        for s in range(n):
+            if counts[s] == 0:
+                continue
+            g = (self.s_model[s], counts[s], mixes[s])
+            groups[g] = groups.get(g, 0) + 1
+        return groups
+
+    def server(self, model, disks, disk_model, fill):
+        """ (remembered) simulation of a homogeneous server
+            model -- index into server_models
+            disks -- number of disks in the server
+            disk_model -- index into disk_models
+            fill -- fraction of each disk that is in use
+        """
+        key = (model, disks, disk_model, fill)
+        if key not in self.sims:
+            from SimDisk import makedisk
+            from SimFS import makefs
+            from Server import makeServer
+            dd = self.disk_models[disk_model]
+            sd = dict(self.server_models[model])
+            sd['disks'] = disks
+            sd['fill'] = fill
+            self.sims[key] = makeServer(makefs(makedisk(dd), dd), sd)
+        return self.sims[key]
+
+    def throughput(self, group, bsize, depth=1, seq=False, write=False):
+        """ (remembered) bytes/second of one server in a group
+            group -- (server model, disks, ((disk model, fill), ...))
+            bsize -- size of each request
+            depth -- number of concurrent requests per server
+            seq -- sequential (vs random) requests
+            write -- writes (vs reads)
+        """
+        key = (group, bsize, depth, seq, write)
+        if key in self.memo:
+            return self.memo[key]
+
+        # a server with mixed disks runs at the pace of its slowest
+        (model, disks, mix) = group
+        bw = None
+        for (disk_model, fill) in mix:
+            s = self.server(model, disks, disk_model, fill)
+            op = s.write if write else s.read
+            (t, b, l) = op(bsize, depth=depth, seq=seq)
+            bw = b if bw is None else min(bw, b)
+        self.memo[key] = bw
+        return bw
+
+    def expected_min(self, dist, width):
+        """ expected minimum of width random draws from a distribution
+            dist -- {value: number of members with that value}
+            width -- number of draws
+        """
+        total = float(sum(dist.values()))
+        result = 0.0
+        above = 1.0     # P(a draw is >= the current value)
+        for v in sorted(dist):
+            p = dist[v] / total
+            rest = max(0.0, above - p)
+            result += v * (above ** width - rest ** width)
+            above = rest
+        return result
+
+    def aggregate(self, bsize, depth=1, seq=False, write=False):
+        """ aggregate fleet throughput
+            bsize -- size of each request
+            depth -- number of concurrent requests per server
+            seq -- sequential (vs random) requests
+            write -- writes (vs reads)
+
+            returns (striped bytes/sec, sum of server bytes/sec,
+                     [(group, servers, bytes/sec per server), ...])
+        """
+        groups = self.groups()
+        dist = {}
+        table = []
+        ideal = 0
+        servers = 0
+        for g in groups:
+            bw = self.throughput(g, bsize, depth, seq, write)
+            dist[bw] = dist.get(bw, 0) + groups[g]
+            ideal += groups[g] * bw
+            servers += groups[g]
+            table.append((g, groups[g], bw))
+        striped = servers * self.expected_min(dist, self.width)
+        return (striped, ideal, table)
+
+
+def makeFleet(dict):
+    """ instantiate the fleet described by a configuration dict
+        dict -- of fleet parameters
+            disk_models -- list of disk/file system configuration dicts
+            server_models -- list of server configuration dicts
+            nodes -- list of (count, server model, disk model, disks,
+                     fill) tuples describing groups of servers
+            width -- number of servers across which stripes are spread
+    """
+
+    dflts = {
+        'disk_models': [{'device': 'disk'}],
+        'server_models': [{}],
+        'nodes': [],
+        'width': 1,
+    }
+
+    disk_models = dict['disk_models'] if 'disk_models' in dict \
+        else dflts['disk_models']
+    server_models = dict['server_models'] if 'server_models' in dict \
+        else dflts['server_models']
+    nodes = dict['nodes'] if 'nodes' in dict else dflts['nodes']
+    width = dict['width'] if 'width' in dict else dflts['width']
+
+    fleet = Fleet(disk_models, server_models, width=width)
+    for (count, model, disk_model, disks, fill) in nodes:
+        fleet.add_servers(count, model, disk_model, disks, fill)
+    return fleet
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    import time
+
+    old = {'device': 'disk', 'size': 4 * TERA, 'speed': 120 * MEG}
+    new = {'device': 'disk', 'size': 16 * TERA, 'speed': 250 * MEG,
+           'rpm': 7200}
+    small = {'cores': 8, 'nic': 10 * GIG}
+    big = {'cores': 16, 'nic': 25 * GIG, 'hba': 24 * GIG}
+
+    start = time.time()
+    fleet = makeFleet({
+        'disk_models': [old, new],
+        'server_models': [small, big],
+        'nodes': [(4000, 0, 0, 12, 0.8),
+                  (3000, 1, 1, 12, 0.3),
+                  (1000, 1, 1, 12, 0.6)],
+        'width': 8,
+    })
+    # a few of the old servers have had failed drives replaced
+    for s in range(0, 4000, 10):
+        fleet.d_model[12 * s] = 1
+        fleet.d_fill[12 * s] = 0.1
+    elapsed = time.time() - start
+    print("Fleet of %d servers, %d disks (%d bytes, built in %3.1fs)" %
+          (len(fleet.s_model), len(fleet.d_model),
+           fleet.d_model.itemsize * len(fleet.d_model) +
+           fleet.d_server.itemsize * len(fleet.d_server) +
+           fleet.d_fill.itemsize * len(fleet.d_fill) +
+           fleet.s_model.itemsize * len(fleet.s_model), elapsed))
+
+    tests = (("128K seq reads", 128 * KB, True, False),
+             ("128K seq writes", 128 * KB, True, True),
+             ("4K random reads", 4 * KB, False, False))
+    for (name, bsize, seq, write) in tests:
+        start = time.time()
+        (striped, ideal, table) = fleet.aggregate(bsize, depth=16,
+                                                  seq=seq, write=write)
+        elapsed = time.time() - start
+        print("\t%s (d=16, %d-wide stripes, %3.1fs)" %
+              (name, fleet.width, elapsed))
+        print("\t    sku  disks  mix                        servers" +
+              "    MB/s")
+        for ((model, disks, mix), n, bw) in sorted(table):
+            print("\t    %3d  %5d  %-25s  %7d  %6.1f" %
+                  (model, disks, str(mix), n, bw / MEG))
+        print("\t    fleet: %8.1f GB/s (%4.1f%% of sum of servers)" %
+              (striped / GIG, 100 * striped / ideal))
+    print("")
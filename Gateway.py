@@ -8,10 +8,11 @@ This is a simulation of a single protocol gateway server that
 stripes (and erasure codes) its data across multiple storage
 servers.
 """
-# HELP: I implemented pre-fetch in the Server, should it be in Gateway:read?
 
 from Dlm import DLM
 from units import *
+import Coding
+import Prefetch
 
 # constants to control queue length warnings
 WARN_LOAD = 0.8             # warn if load goes above this level
@@ -31,44 +32,90 @@ class Gateway:
                  back_nic,
                  cpu,
                  num_servers=1,
+                 num_gateways=1,
+                 stripes=1000000,
                  num_front=1,
                  num_back=1,
                  num_cpus=1,
                  n=5,
                  m=2,
-                 strip=128 * KB):
+                 strip=128 * KB,
+                 code=None,
+                 wbuf=None,
+                 lcache=None,
+                 mds=None,
+                 reduce=None,
+                 zero_copy=False,
+                 prefetch=None,
+                 arrival_scv=1.0,
+                 placement=None):
 
         """ create a Gateway server simulation
             server -- simulation for the file server nodes
             nic -- SimIFC for the network interface
             cpu -- SimCPU for the processor
             num_servers -- number of file servers
+            num_gateways -- number of gateways sharing the same files
+            stripes -- number of stripes those gateways are sharing
             num_nic -- number of NICs per server
             num_cpus -- number of processors per server
             n -- number of data blocks in a stripe
             m -- number of parity blocks in a stripe
             strip -- width of stripe we write to one server
+            code -- Coding scheme (default Reed-Solomon n+m)
+            wbuf -- WriteBuffer for NVRAM stripe coalescing (or None)
+            lcache -- LockCache for stripe lock reuse (or None)
+            mds -- MDS simulation for the metadata server (or None)
+            reduce -- Reduction for inline compression/dedup (or None)
+            zero_copy -- use sendfile/splice rather than copying data
+            prefetch -- Prefetch read-ahead model (default 1MB window)
+            arrival_scv -- burstiness (SCV) of request inter-arrival times
+            placement -- Placement of stripes over the servers (or None)
         """
+        if code is None:
+            code = Coding.ReedSolomon(n, m)
+        if prefetch is None:
+            prefetch = Prefetch.Prefetch()
         self.server = server
         self.dlm = dlm
         self.front = front_nic
         self.back = back_nic
         self.cpu = cpu
         self.num_servers = num_servers
+        self.num_gateways = num_gateways
+        self.stripes = stripes
         self.num_fronts = num_front
         self.num_backs = num_back
         self.num_cpus = num_cpus
-        self.n = n
-        self.m = m
+        self.code = code
+        self.n = code.n
+        self.m = code.m
         self.width = strip
+        self.wbuf = wbuf
+        self.lcache = lcache
+        self.mds = mds
+        self.reduce = reduce
+        self.prefetch = prefetch
+        self.arrival_scv = arrival_scv
+        self.placement = placement
         self.read_ahead = True
 
         # magic constants
+        #   (memory multipliers are per request byte: the n (or n+m)
+        #    strips of a request add up to the request (plus redundancy,
+        #    which is charged by the coding scheme), not n copies of it)
         self.min_msg = 128      # size of a minimal request/rsponse
         self.read_mult = 2      # multipler on read request processing
-        self.read_mem_x = n     # multiplier on memory read processing
+        self.read_mem_x = 1     # multiplier on memory read processing
         self.write_mult = 3     # multipler on write request processing
-        self.write_mem_x = n + m     # multiplier on memory write processing
+        self.write_mem_x = 1    # multiplier on memory write processing
+        self.splice_us = 2      # FIX - (us) to set up a splice
+
+        # zero-copy moves data between the NICs w/o copying it
+        self.zero_copy = zero_copy
+        if zero_copy:
+            self.read_mem_x = 0
+            self.write_mem_x = 0
 
     def warn(self, msg):
         """ add a warning to our accumulated warnings list """
@@ -77,11 +124,117 @@ class Gateway:
         if (self.warnings.find(msg) < 0):
             self.warnings += msg
 
-    def read(self, bsize, depth=1, seq=False):
+    def coding(self, cpu_time, elapsed, bytes):
+        """ split a coding computation into CPU and (offloaded) parts
+            cpu_time -- CPU time for the computation
+            elapsed -- elapsed time for the computation
+            bytes -- data bytes being coded
+
+            returns (CPU time, additional wait, accelerator busy time)
+        """
+        if not self.code.offloaded(self.cpu) or elapsed == cpu_time:
+            return (cpu_time, 0, 0)
+        return (cpu_time, elapsed - cpu_time,
+                self.cpu.accel.service(bytes))
+
+    def accel_load(self, t_acc, iops, depth, latency, descr, load):
+        """ add accelerator load (and its queueing delay)
+            t_acc -- accelerator busy time per operation
+            iops -- operations per second
+            depth -- number of parallel requests
+            latency -- operation latency (for warnings)
+            descr -- description of the operation (for warnings)
+            load -- load dict to be updated
+
+            returns the expected queueing delay
+        """
+        if t_acc <= 0:
+            return 0
+        acc_load = t_acc * iops / float(SECOND)
+        if (acc_load >= 0.99):
+            self.warn("Gateway accelerator saturated by %dus x %d IOPS "
+                      "for %s\n" % (t_acc, iops, descr))
+        delay = t_acc * self.cpu.accel.queue_length(acc_load, depth,
+                                                    self.arrival_scv)
+        delta = 100 * float(delay) / latency
+        if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+            self.warn("Gateway accel load (%4.2f) adds %dus (%d%%) to %s\n" %
+                      (acc_load, delay, delta, descr))
+        load['accel'] = acc_load
+        return delay
+
+    def mem_load(self, mem_bytes, iops, depth, latency, descr, load):
+        """ add memory bandwidth load (and its queueing delay)
+            mem_bytes -- bytes of memory traffic (copies and DMA) per op
+            iops -- operations per second
+            depth -- number of parallel requests
+            latency -- operation latency (for warnings)
+            descr -- description of the operation (for warnings)
+            load -- load dict to be updated
+
+            returns the expected queueing delay
+        """
+        t_mem = self.cpu.mem_busy(mem_bytes) / self.num_cpus
+        mem_load = t_mem * iops / float(SECOND)
+        if (mem_load >= 0.99):
+            self.warn("Gateway memory saturated by %dus x %d IOPS for %s\n" %
+                      (t_mem, iops, descr))
+        delay = t_mem * self.cpu.queue_length(mem_load, depth,
+                                              self.arrival_scv)
+        delta = 100 * float(delay) / latency
+        if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+            self.warn("Gateway memory load (%4.2f) adds %dus (%d%%) to %s\n" %
+                      (mem_load, delay, delta, descr))
+        load['mem'] = mem_load
+        return delay
+
+    def locks(self, bsize, depth, seq, t_op):
+        """ expected DLM traffic for each request
+            bsize -- size of each request
+            depth -- number of parallel requests
+            seq -- is this sequential I/O
+            t_op -- (us) time for each request (w/o locking)
+
+            returns (lock requests, lease renewals) per request
+        """
+        if seq:
+            # we only need a new lock for each new stripe
+            return (float(bsize) / (self.width * self.n), 0)
+        if self.lcache is None:
+            return (1, 0)
+
+        # random I/O reuses the locks it still has cached
+        rate = depth * SECOND / float(t_op)
+        reuse = self.lcache.reuse(rate, self.stripes, self.num_gateways)
+        renew = self.lcache.renewals(rate, self.stripes) / rate
+        return (1 - reuse, renew)
+
+    def contention(self, P_lock, depth, hold):
+        """ expected lock waits caused by other gateways sharing our stripes
+            P_lock -- number of locks obtained per request
+            depth -- number of parallel requests (from each gateway)
+            hold -- (us) time we hold each lock
+
+            returns (added latency per request,
+                     DLM work per contended lock / per uncontended lock)
+        """
+        # lock requests per second, per stripe, from all gateways
+        rate = self.num_gateways * P_lock * depth * SECOND / float(hold)
+        rate /= self.stripes
+
+        (t_c, bw_c, l_c) = self.dlm.lock(rate, hold, self.num_gateways)
+        (t_u, bw_u, l_u) = self.dlm.lock()
+
+        # callbacks to (and releases from) the holders keep the DLM busy
+        x_dlm = l_c['cpu'] / l_u['cpu'] if l_u['cpu'] > 0 else 1.0
+        return (P_lock * (t_c - t_u), x_dlm)
+
+    def read(self, bsize, depth=1, seq=False, degraded=False):
         """ expected read performance
             bsize -- size of each request
             depth -- number of parallel requests (multiple objects)
             seq -- is this sequential I/O (subsequent reads from cache)
+            degraded -- one of the strips we read has been lost
         """
 
         descr = "%dK, d=%d %s reads" % \
@@ -108,24 +261,14 @@ class Gateway:
         t_front_r = Lfr + self.front.read_time(req)
         t_cpu = self.front.read_cpu(req)
 
-        # cost of obtaining full stripe locks
-        #   (assume no conflicts and no explicit releases)
-        if (seq):
-            P_lock = float(bsize) / (self.width * self.n)
-        else:
-            P_lock = 1      # LATER: even random I/O gets lock reuse
-        t_back_w = P_lock * (Lbw + self.back.write_time(req))
-        (t, bw, l) = self.dlm.lock()
-        t_lock = P_lock * t
-        t_back_r = P_lock * (Lbw + self.back.read_time(req))
-        t_cpu += P_lock * (self.back.read_cpu(req))
-        t_cpu += P_lock * (self.back.write_cpu(req))
-        bw_dlm = bsize * SECOND / t_lock
+        # (lock costs are added once we know how often we need them)
+        t_back_w = 0
+        t_back_r = 0
 
         # figure out what I/O we will actually do
         stripe = self.width * self.n    # we do all reads in full stripes
         s = seq
-        prefetch = 1
+        prefetching = False
         if bsize > stripe:
             # large reads get broken up
             req_per_read = float(stripe) / bsize
@@ -136,42 +279,110 @@ class Gateway:
             req_per_read = stripe / bsize
             d = max(1, depth / req_per_read)
             if self.read_ahead:
-                # FIX - crude prefetch modeling
-                # it is not obvious how to model pre-fetch in steady-state ...
-                #    it starts out as deeper reads, but then drops to 1/1
-                #    it has the potential to eliminate much response waiting
-                # I'm thinking that the right modeling is:
-                #   add up all of the send/server/receive/process time
-                #   compare this with the average inter-request time (/depth)
-                #   the wait time becomes max(0, inter_req_time - service_time)
-                #   but there is no savings in CPU/network or any other cost
-                d *= 2          # and queue an extra pre-fetch read too
-                prefetch = 2    # say it eliminates half of the server delay
+                # and we keep the read-ahead window in flight too
+                d += self.prefetch.ahead(stripe)
+                prefetching = True
         else:
             # we are reading too much
             req_per_read = 1
             d = depth
 
         # compute the (amortized) costs of those read requests
+        reads = self.code.read_strips(self.n, degraded)
         (t_svr, bw_svr, l_svr) = self.server.read(self.width, d, s)
-        t_svr /= prefetch * req_per_read
-        t_cpu += self.n * self.back.write_cpu(req) / req_per_read
-        t_cpu += self.n * self.back.read_cpu(rsp) / req_per_read
-        t_back_w += self.n * (Lbw + self.back.write_time(req)) / req_per_read
-        t_back_r += self.n * (Lbr + self.back.read_time(rsp)) / req_per_read
+
+        # each server returns one (compressed) strip, which we must expand
+        strip_b = float(self.code.read_bytes(stripe, self.width,
+                                             degraded)) / reads
+        if self.reduce is not None:
+            strip_b /= self.reduce.comp
+        rsp_b = self.min_msg + strip_b
+        t_svr /= req_per_read
+        t_cpu += reads * self.back.write_cpu(req) / req_per_read
+        t_cpu += reads * self.back.read_cpu(rsp_b) / req_per_read
+        t_back_w += reads * (Lbw + self.back.write_time(req)) / req_per_read
+        t_back_r += reads * (Lbr + self.back.read_time(rsp_b)) / req_per_read
+        t_ec = 0
+        t_acc = 0
+        if degraded:
+            (c, t, a) = self.coding(
+                self.code.decode_cpu(self.cpu, self.width),
+                self.code.decode_time(self.cpu, self.width), self.width)
+            t_cpu += c / req_per_read
+            t_ec += t / req_per_read
+            t_acc += a / req_per_read
 
         # scale the returned server bandwidth for the entire cluster
         #   NOTE: this is a highly theoretical number
-        bw_svr *= self.num_servers
+        bw_svr *= self.num_servers * float(self.n) / reads
+        if self.placement is not None:
+            # the busiest server limits the cluster (and if the servers
+            #   replicate, reads from any replica spread over every copy)
+            pgs = self.placement.pgs
+            if self.server.read_any:
+                pgs *= self.server.replicas
+            bw_svr /= self.placement.imbalance(self.num_servers, pgs=pgs)
+
+        # read-ahead that is never used still costs server and network
+        if self.read_ahead and bsize <= stripe:
+            waste = self.prefetch.wasted(stripe, seq)
+            t_back_r *= 1 + waste
+            bw_svr /= 1 + waste
 
         # CPU time to process actually process the data
-        t_cpu = self.read_mult * self.cpu.process(bsize)
+        t_cpu += self.read_mult * self.cpu.process(bsize)
         t_cpu += self.read_mem_x * self.cpu.mem_read(bsize)
+        if self.zero_copy:
+            t_cpu += self.splice_us
+        t_red = 0
+        if self.reduce is not None:
+            cpu_red = self.reduce.read_cpu(self.cpu, bsize)
+            t_red = self.reduce.read_time(self.cpu, bsize) - cpu_red
+            t_acc += self.reduce.read_accel(self.cpu, bsize)
+            t_cpu += cpu_red
+
+            # and a compressed stripe holds more client data
+            if s:
+                t_svr /= self.reduce.comp
+                bw_svr *= self.reduce.comp
 
         # cost of sending the response back to the client
         t_front_w = Lfw + self.front.write_time(rsp)          # send response
         t_cpu += self.front.write_cpu(rsp)
 
+        # read-ahead overlaps the server reads with our other work,
+        #   so we only wait for what isn't done by the time we need it
+        if prefetching:
+            t_read = t_svr * req_per_read   # per stripe read
+            inter = req_per_read * (t_front_w + t_back_w + t_cpu) / depth
+            t_svr = self.prefetch.time(t_read, inter, stripe) / req_per_read
+
+        # memory traffic: front and back DMA, copies, decode, expansion
+        mem_bytes = req + rsp
+        mem_bytes += reads * float(req + rsp_b) / req_per_read
+        mem_bytes += 2 * self.read_mem_x * bsize
+        if degraded:
+            mem_bytes += (self.n + 1) * float(self.width) / req_per_read
+        if self.reduce is not None and self.reduce.comp > 1:
+            mem_bytes += bsize / self.reduce.comp + bsize
+        bw_mem = bsize * self.num_cpus * self.cpu.mem_bw / mem_bytes
+
+        # cost of obtaining full stripe locks and renewing their leases
+        #   (assume no explicit releases)
+        t_op = t_front_w + t_back_w + t_cpu + t_svr
+        (P_lock, renew) = self.locks(bsize, depth, seq, t_op)
+        t_back_w += (P_lock + renew) * (Lbw + self.back.write_time(req))
+        rate = self.num_gateways * (P_lock + renew) * depth * SECOND / t_op
+        (t, bw, l) = self.dlm.lock(offered=rate)
+        t_lock = P_lock * t
+        t_back_r += (P_lock + renew) * (Lbw + self.back.read_time(req))
+        t_cpu += (P_lock + renew) * (self.back.read_cpu(req))
+        t_cpu += (P_lock + renew) * (self.back.write_cpu(req))
+
+        # all of the gateways share the DLM (cluster) capacity
+        t_dlm = self.num_gateways * (P_lock + renew)
+        bw_dlm = bsize * bw / t_dlm if t_dlm > 0 else float('inf')
+
         # compute available network bandwidth
         #	NICs are full duplex, but we only look at the side that
         #	sees the most traffic for the simulated operation
@@ -180,19 +391,38 @@ class Gateway:
         bw_nb = self.num_backs * bsize * SECOND / t_back_r
 
         # compute available CPU bandwidth
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'read', depth)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'read')
         bw_cpu = avail_cores * bsize * SECOND / t_cpu
+        bw_acc = float('inf')
+        if t_acc > 0:
+            bw_acc = bsize * SECOND / t_acc
 
         # compute the request latency and throughputs
-        latency = t_front_w + t_back_w + t_cpu + t_lock + t_svr
+        #   (CPU time is inflated by contention with the other cores)
+        t_wait = t_red + t_ec
+        latency = t_front_w + t_back_w + t_cpu * x_cpu + t_wait + t_lock + \
+            t_svr
+
+        # other gateways sharing these stripes may hold the locks we need
+        #   (and calling them back costs the DLM more per lock)
+        if self.num_gateways > 1 and P_lock > 0:
+            (t_c, x_dlm) = self.contention(P_lock, depth, latency)
+            latency += t_c
+            t_dlm = self.num_gateways * (P_lock * x_dlm + renew)
+            bw_dlm = bsize * bw / t_dlm
         bw_base = depth * bsize * SECOND / latency
-        bandwidth = min(bw_base, bw_dlm, bw_svr, bw_nf, bw_nb, bw_cpu)
+        bandwidth = min(bw_base, bw_dlm, bw_svr, bw_nf, bw_nb, bw_cpu,
+                        bw_acc, bw_mem)
         iops = bandwidth / bsize
         q_delay = 0
 
         load = {}
         load['server'] = bandwidth / bw_svr
         load['dlm'] = bandwidth / bw_dlm
+        q_delay += self.accel_load(t_acc, iops, depth, latency, descr, load)
+        q_delay += self.mem_load(mem_bytes, iops, depth, latency, descr, load)
 
         # see what this means for front NIC load and queue
         if (bw_nf < bw_base):
@@ -202,7 +432,8 @@ class Gateway:
         if (nic_load >= 0.99):
             self.warn("Gateway front saturated by %dus x %d IOPS for %s\n" %
                       (t_front_w, iops, descr))
-        delay = t_front_w * self.front.queue_length(nic_load, depth)
+        delay = t_front_w * self.front.queue_length(nic_load, depth,
+                                                    self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -215,7 +446,8 @@ class Gateway:
             self.warn("Gateway back saturated by %dus x %d IOPS for %s\n" %
                       (t_back_r, iops, descr))
         nic_load = t_back_w * iops / float(self.num_backs * SECOND)
-        delay = t_back_w * self.back.queue_length(nic_load, depth)
+        delay = t_back_w * self.back.queue_length(nic_load, depth,
+                                                  self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -224,12 +456,13 @@ class Gateway:
         load['back'] = nic_load
 
         # see what this means for CPU load and queue
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'read', depth)
         core_load = t_cpu * iops / float(avail_cores * SECOND)
         if (bw_cpu < bw_base):
             self.warn("Gateway CPUs saturated by %dus x %d IOPS for %s\n" %
                       (t_cpu, iops, descr))
-        delay = t_cpu * self.cpu.queue_length(core_load, depth)
+        delay = t_cpu * self.cpu.queue_length(core_load, depth,
+                                              self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -239,11 +472,12 @@ class Gateway:
 
         return (latency + q_delay, bandwidth, load)
 
-    def write(self, bsize, depth=1, seq=False):
+    def write(self, bsize, depth=1, seq=False, degraded=False):
         """ expected write performance
             bsize -- size of each request
             depth -- number of parallel requests (multiple objects)
             seq -- is this sequential I/O (subsequent writest to same objs)
+            degraded -- one of the strips we write has been lost
         """
 
         descr = "%dK, d=%d %s writes" % \
@@ -261,34 +495,45 @@ class Gateway:
         #
         small = self.min_msg
         large = self.min_msg + bsize
+
+        # (reduced) data is all that goes to the servers
+        stored = bsize
+        if self.reduce is not None:
+            stored = self.reduce.stored(bsize)
+        large_b = self.min_msg + stored
+
         LfR = self.front.min_read_latency + self.front.read_time(large)
         Lfw = self.front.min_read_latency + self.front.read_time(small)
         Lbr = self.front.min_read_latency + self.front.read_time(small)
         Lbw = self.front.min_read_latency + self.front.read_time(small)
-        LbR = self.front.min_read_latency + self.front.read_time(large)
-        LbW = self.front.min_read_latency + self.front.read_time(large)
 
         # cost of receiving and processing original request
         t_front_r = LfR
         t_cpu = self.front.read_cpu(large)
 
-        # cost of obtaining full stripe locks
-        #   (assume no conflicts and no explicit releases)
-        if (seq):
-            P_lock = float(bsize) / (self.width * self.n)
-        else:
-            P_lock = 1      # LATER: even random I/O gets some lock reuse
-        t_back_w = P_lock * Lbw
-        (t, bw, l) = self.dlm.lock()
-        t_lock = P_lock * t
-        t_back_r = P_lock * Lbr
-        t_cpu += P_lock * (self.back.read_cpu(small))
-        t_cpu += P_lock * (self.back.write_cpu(small))
-        bw_dlm = bsize * SECOND / t_lock
+        # (lock costs are added once we know how often we need them)
+        t_back_w = 0
+        t_back_r = 0
 
         # CPU time to process/check-sum/etc this write
-        t_cpu = self.write_mult * self.cpu.process(bsize)
+        t_cpu += self.write_mult * self.cpu.process(bsize)
         t_cpu += self.write_mem_x * self.cpu.mem_write(bsize)
+        if self.zero_copy:
+            t_cpu += self.splice_us
+
+        # inline reduction (fingerprint, dedup lookup, compress)
+        t_red = 0
+        if self.reduce is not None:
+            cpu_red = self.reduce.write_cpu(self.cpu, bsize)
+            t_red = self.reduce.write_time(self.cpu, bsize) - cpu_red
+            t_cpu += cpu_red
+
+        # redundancy computations may be offloaded to an accelerator
+        (c_enc, t_enc, a_enc) = self.coding(
+            self.code.encode_cpu(self.cpu, bsize),
+            self.code.encode_time(self.cpu, bsize), bsize)
+        t_ec = 0
+        t_acc = 0
 
         # figure out what I/O we will actually do
         #   NOTE: we only wait one server read/write time because all
@@ -302,10 +547,15 @@ class Gateway:
             t_s_w *= bsize / stripe
             t_s_r = 0   # no reads
             t_s_s = 0   # no setattrs
-            reads = 0
-            writes = (self.n + self.m) * bsize / stripe
-            commits = self.n + self.m
+            (reads, writes) = self.code.write_strips(self.n, degraded)
+            writes *= bsize / stripe
+            commits = self.code.width
             setattrs = 0
+
+            # cost of computing the redundancy for those stripes
+            t_cpu += c_enc
+            t_ec += t_enc
+            t_acc += a_enc
         elif seq:
             # small sequential writes get aggregated into stripes
             d = max(1, depth * bsize / stripe)
@@ -313,38 +563,98 @@ class Gateway:
             t_s_w /= stripe / bsize
             t_s_r = 0   # no reads
             t_s_s = 0   # no setattrs
-            reads = 0
-            writes = self.n + self.m
-            commits = self.n + self.m
+            (reads, writes) = self.code.write_strips(self.n, degraded)
+            commits = writes
             setattrs = 0
+
+            # cost of computing the redundancy for (our share of) a stripe
+            t_cpu += c_enc
+            t_ec += t_enc
+            t_acc += a_enc
         else:
             # small random writes require read/modify/write!
-            reads = self.n
-            writes = 1 + self.m
-            commits = 1 + self.m
-            setattrs = self.n - 1
+            strips = self.code.data_strips(stored, self.width)
+            (reads, writes) = self.code.write_strips(strips, degraded)
+            commits = writes
+            setattrs = self.code.width - writes
             (t_s_s, bw_svr, l_svr) = self.server.setattr()
             (t_s_r, bw_svr, l_svr) = self.server.read(self.width, depth, seq)
             (t_s_w, bw_svr, l_svr) = self.server.write(self.width, depth, seq)
 
-            # cost of additional checksum computation
-            t_cpu += (self.n - 1) * self.write_mult * self.cpu.process(bsize)
-
-        # the time for a server to handle a commit is the same in all cases
-        (t_s_c, bw_c, l) = self.server.commit()
+            # each strip we read or write carries (at most) a strip
+            large_b = self.min_msg + \
+                self.code.write_bytes(stored, self.width, degraded) / \
+                float(reads + writes)
+
+            # cost of updating (or recomputing) the redundancy
+            if self.code.reconstructs(strips, degraded):
+                (t_update, t_ec, t_acc) = self.coding(
+                    self.code.encode_cpu(self.cpu, stripe),
+                    self.code.encode_time(self.cpu, stripe), stripe)
+            else:
+                (t_update, t_ec, t_acc) = self.coding(
+                    self.code.update_cpu(self.cpu, bsize),
+                    self.code.update_time(self.cpu, bsize), bsize)
+
+            # NVRAM may coalesce some of these writes into full stripes
+            f = 0
+            if self.wbuf is not None:
+                t_gap = t_front_r + self.wbuf.write_time(bsize)
+                f = self.wbuf.full_fraction(bsize, stripe, depth, t_gap)
+                d = max(1, depth * bsize / stripe)
+                (t_f_w, bw_f, l_f) = self.server.write(self.width, d, True)
+                t_f_w /= stripe / bsize
+                (f_r, f_w) = self.code.write_strips(self.n, degraded)
+                f_w *= float(bsize) / stripe
+
+                # the full-stripe writes avoid the reads and setattrs
+                reads *= (1 - f)
+                writes = (f * f_w) + ((1 - f) * writes)
+                commits = writes
+                setattrs *= (1 - f)
+                t_s_s *= (1 - f)
+                t_s_r *= (1 - f)
+                t_s_w = (f * t_f_w) + ((1 - f) * t_s_w)
+                bw_svr = 1 / ((f / bw_f) + ((1 - f) / bw_svr))
+                t_update = (f * c_enc) + ((1 - f) * t_update)
+                t_ec = (f * t_enc) + ((1 - f) * t_ec)
+                t_acc = (f * a_enc) + ((1 - f) * t_acc)
+            t_cpu += t_update
+
+        # offloaded reduction also keeps the accelerator busy
+        if self.reduce is not None:
+            t_acc += self.reduce.write_accel(self.cpu, bsize)
+
+        # reduced data means less server write time per client byte
+        if stored < bsize:
+            t_s_w *= float(stored) / bsize
+            bw_svr *= float(bsize) / stored
+
+        # concurrent commits (to each server) share journal flushes
+        c_depth = max(1, depth * commits / float(self.num_servers))
+        (t_s_c, bw_c, l) = self.server.commit(c_depth)
         t_svr = t_s_r + t_s_w + t_s_s + t_s_c
 
         # what does this, in principle tell us about the cluster bandwidth
         #   NOTE: this is a highly theoretical number
-        bw_svr *= self.num_servers * self.n / (self.n + self.m)
+        bw_svr *= self.num_servers * self.code.efficiency()
+        if commits > 0:
+            bw_svr = min(bw_svr, bsize * bw_c * self.num_servers / commits)
+        if self.placement is not None:
+            # the busiest server limits the cluster (and if the servers
+            #   replicate, every copy is written)
+            pgs = self.placement.pgs * self.server.replicas
+            bw_svr /= self.placement.imbalance(self.num_servers, pgs=pgs)
 
         # figure out the messages we will exchange with the servers
         t_back_w += reads * Lbw     # reads for strips to update
         t_cpu += reads * self.back.write_cpu(small)
+        LbR = self.front.min_read_latency + self.front.read_time(large_b)
+        LbW = self.front.min_read_latency + self.front.read_time(large_b)
         t_back_r += reads * LbR     # read responses to reads
-        t_cpu += reads * self.back.read_cpu(large)
+        t_cpu += reads * self.back.read_cpu(large_b)
         t_back_w += writes * LbW    # writes of updated strips
-        t_cpu += writes * self.back.write_cpu(large)
+        t_cpu += writes * self.back.write_cpu(large_b)
         t_back_r += writes * LbR    # read responses to writes
         t_cpu += writes * self.back.read_cpu(small)
         t_back_w += commits * Lbw   # writes of commits
@@ -356,6 +666,32 @@ class Gateway:
         t_front_w = Lfw
         t_cpu += self.front.write_cpu(small)
 
+        # memory traffic: front and back DMA, copies, reduction, coding
+        mem_bytes = large + small
+        mem_bytes += (reads + writes) * (small + large_b)
+        mem_bytes += (commits + setattrs) * small
+        mem_bytes += 2 * self.write_mem_x * bsize
+        if self.reduce is not None:
+            mem_bytes += bsize + stored
+        mem_bytes += stored     # redundancy computation reads the data
+        bw_mem = bsize * self.num_cpus * self.cpu.mem_bw / mem_bytes
+
+        # cost of obtaining full stripe locks and renewing their leases
+        #   (assume no explicit releases)
+        t_op = t_front_w + t_back_w + t_cpu + t_svr
+        (P_lock, renew) = self.locks(bsize, depth, seq, t_op)
+        t_back_w += (P_lock + renew) * Lbw
+        rate = self.num_gateways * (P_lock + renew) * depth * SECOND / t_op
+        (t, bw, l) = self.dlm.lock(offered=rate)
+        t_lock = P_lock * t
+        t_back_r += (P_lock + renew) * Lbr
+        t_cpu += (P_lock + renew) * (self.back.read_cpu(small))
+        t_cpu += (P_lock + renew) * (self.back.write_cpu(small))
+
+        # all of the gateways share the DLM (cluster) capacity
+        t_dlm = self.num_gateways * (P_lock + renew)
+        bw_dlm = bsize * bw / t_dlm if t_dlm > 0 else float('inf')
+
         # compute available network bandwidth
         #	NICs are full duplex, but we only look at the side that
         #	sees the most traffic for the simulated operation
@@ -364,26 +700,59 @@ class Gateway:
         bw_nb = self.num_backs * bsize * SECOND / t_back_w
 
         # compute the available CPU bandwidth
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'write', depth)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'write')
         bw_cpu = avail_cores * bsize * SECOND / t_cpu
+        bw_acc = float('inf')
+        if t_acc > 0:
+            bw_acc = bsize * SECOND / t_acc
 
         # compute the request latency and throughputs
-        latency = t_front_w + t_back_w + t_cpu + t_lock + t_svr
+        #   (CPU time is inflated by contention with the other cores)
+        t_wait = t_red + t_ec
+        latency = t_front_w + t_back_w + t_cpu * x_cpu + t_wait + t_lock + \
+            t_svr
+        if self.wbuf is not None:
+            # clients only wait for the NVRAM ... unless it is full
+            t_nvram = self.wbuf.write_time(bsize)
+            t_flush = t_back_w + t_svr
+            latency = t_front_w + t_cpu * x_cpu + t_wait + t_lock + t_nvram
+            rho = (depth * bsize * SECOND / latency) / min(bw_svr, bw_nb)
+            p_stall = self.wbuf.stall(rho, bsize)
+            latency += p_stall * t_flush
+
+        # other gateways sharing these stripes may hold the locks we need
+        #   (and calling them back costs the DLM more per lock)
+        if self.num_gateways > 1 and P_lock > 0:
+            (t_c, x_dlm) = self.contention(P_lock, depth, latency)
+            latency += t_c
+            t_dlm = self.num_gateways * (P_lock * x_dlm + renew)
+            bw_dlm = bsize * bw / t_dlm
         bw_base = depth * bsize * SECOND / latency
-        bandwidth = min(bw_base, bw_dlm, bw_svr, bw_nf, bw_nb, bw_cpu)
+        bandwidth = min(bw_base, bw_dlm, bw_svr, bw_nf, bw_nb, bw_cpu,
+                        bw_acc, bw_mem)
         iops = bandwidth / bsize
         q_delay = 0
 
         load = {}
         load['server'] = bandwidth / bw_svr
         load['dlm'] = bandwidth / bw_dlm
+        q_delay += self.accel_load(t_acc, iops, depth, latency, descr, load)
+        q_delay += self.mem_load(mem_bytes, iops, depth, latency, descr, load)
+        if self.wbuf is not None:
+            load['nvram'] = bandwidth / self.wbuf.bw
+            if p_stall >= 0.01:
+                self.warn("Gateway NVRAM full %d%% of the time for %s\n" %
+                          (100 * p_stall, descr))
 
         # see what this means for front NIC load and queue
         if (bw_nf < bw_base):
             self.warn("Gateway front saturated by %dus x %d IOPS for %s\n" %
                       (t_front_r, iops, descr))
         nic_load = t_front_w * iops / float(self.num_fronts * SECOND)
-        delay = t_front_w * self.front.queue_length(nic_load, depth)
+        delay = t_front_w * self.front.queue_length(nic_load, depth,
+                                                    self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -396,7 +765,8 @@ class Gateway:
             self.warn("Gateway back saturated by %dus x %d IOPS for %s\n" %
                       (t_back_w, iops, descr))
         nic_load = t_back_w * iops / float(self.num_backs * SECOND)
-        delay = t_back_w * self.back.queue_length(nic_load, depth)
+        delay = t_back_w * self.back.queue_length(nic_load, depth,
+                                                  self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -409,7 +779,8 @@ class Gateway:
             self.warn("Gateway CPUs saturated by %dus x %d IOPS for %s\n" %
                       (t_cpu, iops, descr))
         core_load = t_cpu * iops / float(avail_cores * SECOND)
-        delay = t_cpu * self.cpu.queue_length(core_load, depth)
+        delay = t_cpu * self.cpu.queue_length(core_load, depth,
+                                              self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -419,26 +790,105 @@ class Gateway:
 
         return (latency + q_delay, bandwidth, load)
 
-    def create(self):
-        """ creation one new data containing object on the data file system """
+    def metaop(self, descr, op, depth, *args):
+        """ common modeling for metadata operations forwarded to the MDS
+            descr -- description of the operation (for warnings)
+            op -- name of the MDS operation (e.g. 'create')
+            depth -- number of concurrent requests
+            args -- additional parameters for the MDS operation
+        """
+        assert self.mds is not None, "%s require an MDS" % (descr)
+        small = self.min_msg
+
+        # receive the request, forward it to the MDS, relay the response
+        t_front_w = self.front.min_write_latency + self.front.write_time(small)
+        t_back_w = self.back.min_write_latency + self.back.write_time(small)
+        t_cpu = self.front.read_cpu(small) + self.back.write_cpu(small)
+        t_cpu += self.back.read_cpu(small) + self.front.write_cpu(small)
+
+        # the MDS is shared by all of the gateways (and its latency
+        #   includes queueing behind all of their requests)
+        mds_op = getattr(self.mds, op)
+        (t_mds, iops_mds, l_mds) = mds_op(self.num_gateways * depth, *args)
+        iops_mds /= self.num_gateways
+
+        # compute the request latency and throughputs
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'meta', depth)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'meta')
+        iops_cpu = avail_cores * SECOND / t_cpu
+        iops_nf = self.num_fronts * SECOND / t_front_w
+        iops_nb = self.num_backs * SECOND / t_back_w
+        latency = t_front_w + t_back_w + t_cpu * x_cpu + t_mds
+        iops_base = depth * SECOND / latency
+        iops = min(iops_base, iops_mds, iops_cpu, iops_nf, iops_nb)
+        if (iops_mds < iops_base):
+            self.warn("Gateway MDS caps throughput at %d IOPS for %s\n" %
+                      (iops_mds, descr))
+
+        load = {}
+        load['mds'] = iops / iops_mds
+        load['front'] = iops / iops_nf
+        load['back'] = iops / iops_nb
+        core_load = t_cpu * iops / float(avail_cores * SECOND)
+        load['cpu'] = core_load
+        q_delay = t_cpu * self.cpu.queue_length(core_load, depth,
+                                                self.arrival_scv)
 
-        return(1)   # LATER - implement create
+        # requests wait (somewhere) until they drain at the capped rate
+        return (max(latency + q_delay, depth * SECOND / iops), iops, load)
 
-    def delete(self):
-        """ delete a data containing object from the data file system """
+    def create(self, depth=1, dir_size=1000):
+        """ create a new file
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the parent directory
+        """
+        # (data objects are created on the servers by the first write)
+        return self.metaop("d=%d creates" % depth, 'create', depth,
+                           dir_size)
+
+    def delete(self, depth=1, dir_size=1000):
+        """ delete a file
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the parent directory
+        """
+        # (data objects are reclaimed from the servers asynchronously)
+        return self.metaop("d=%d deletes" % depth, 'delete', depth,
+                           dir_size)
+
+    def open(self, depth=1, dir_size=1000):
+        """ open an existing file
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the parent directory
+        """
+        return self.metaop("d=%d opens" % depth, 'open', depth, dir_size)
 
-        return(1)   # LATER - implement delete
+    def getattr(self, depth=1):
+        """ get the attributes of an open file
+            depth -- number of concurrent requests
+        """
+        return self.metaop("d=%d getattrs" % depth, 'getattr', depth)
+
+    def setattr(self, depth=1):
+        """ set the attributes of an open file
+            depth -- number of concurrent requests
+        """
+        return self.metaop("d=%d setattrs" % depth, 'setattr', depth)
 
 
-def makeGateway(ds, dlm, dict):
+def makeGateway(ds, dlm, dict, mds=None):
     """ instantiate the server node described by a configuration dict
         ds -- simulation for the Data Servers
         dlm -- simulation for the Lock Manager
         dict -- of server parameters
+        mds -- simulation for the Metadata Server
+               (default: a generic MDS on its own disk)
     """
 
     dflts = {
         'servers': 1,
+        'gateways': 1,
+        'stripes': 1000000,
         'cpus': 1,
         'cpu': 'generic',
         'speed': 2.7 * GIG,
@@ -450,10 +900,14 @@ def makeGateway(ds, dlm, dict):
         'n': 6,
         'm': 2,
         'strip': 128 * KB,
+        'zero_copy': False,
+        'arrival_scv': 1.0,
     }
 
     # collect the parameters
     servers = dict['servers'] if 'servers' in dict else dflts['servers']
+    gws = dict['gateways'] if 'gateways' in dict else dflts['gateways']
+    stripes = dict['stripes'] if 'stripes' in dict else dflts['stripes']
     cpus = dict['cpus'] if 'cpus' in dict else dflts['cpus']
     fronts = dict['fronts'] if 'fronts' in dict else dflts['fronts']
     front_bw = dict['front'] if 'front' in dict else dflts['front']
@@ -462,6 +916,32 @@ def makeGateway(ds, dlm, dict):
     n = dict['n'] if 'n' in dict else dflts['n']
     m = dict['m'] if 'm' in dict else dflts['m']
     strip = dict['strip'] if 'strip' in dict else dflts['strip']
+    zero_copy = dict['zero_copy'] if 'zero_copy' in dict \
+        else dflts['zero_copy']
+    scv = dict['arrival_scv'] if 'arrival_scv' in dict \
+        else dflts['arrival_scv']
+
+    # instantiate the data protection scheme and write buffer
+    code = Coding.makeCode(dict) if 'code' in dict else None
+    wbuf = None
+    if 'nvram' in dict:
+        import WriteBuffer
+        wbuf = WriteBuffer.makeWriteBuffer(dict)
+    lcache = None
+    if 'lock_cache' in dict:
+        import LockCache
+        lcache = LockCache.makeLockCache(dict)
+    reduce = None
+    if 'compress' in dict or 'dedup' in dict:
+        import Reduction
+        reduce = Reduction.makeReduction(dict)
+    prefetch = Prefetch.makePrefetch(dict)
+    placement = None
+    if 'pgs' in dict:
+        # each placement group is spread across a stripe of servers
+        import Placement
+        width = n + m if code is None else code.width
+        placement = Placement.makePlacement(dict, replicas=width)
 
     # instantiate my own devices
     import SimCPU
@@ -471,12 +951,23 @@ def makeGateway(ds, dlm, dict):
     myFront = SimIFC.NIC("eth", processor=myCpu, bw=front_bw)
     myBack = SimIFC.NIC("eth", processor=myCpu, bw=back_bw)
 
+    # metadata operations need somebody to forward them to
+    if mds is None:
+        import SimDisk
+        import SimFS
+        import Mds
+        mds = Mds.makeMDS(SimFS.makefs(SimDisk.makedisk({}), {}), {})
+
     gateway = Gateway(ds, dlm,
                       num_servers=servers,
+                      num_gateways=gws, stripes=stripes,
                       cpu=myCpu, num_cpus=cpus,
                       front_nic=myFront, num_front=fronts,
                       back_nic=myBack, num_back=backs,
-                      n=n, m=m, strip=strip)
+                      n=n, m=m, strip=strip, code=code, wbuf=wbuf,
+                      lcache=lcache, mds=mds, reduce=reduce,
+                      zero_copy=zero_copy, prefetch=prefetch,
+                      arrival_scv=scv, placement=placement)
     return gateway
 
 
@@ -490,7 +981,7 @@ def gatewaytest(gw, dict, descr=""):
         dict --
             SioCdepth ... list of request depths
             SioCbs ... list of block sizes
-            SioCmisc ... do create/delete ops too?
+            SioCmisc ... do metadata (create/delete/open/attr) ops too?
     """
 
     dflt = {        # default throughput test parameters
@@ -507,13 +998,17 @@ def gatewaytest(gw, dict, descr=""):
     r = Report(("seq read", "seq write", "rnd read", "rnd write"))
     for d in depths:
         if misc:
-            tc = gw.create(depth=d)
-            td = gw.delete(depth=d)
-
-            r = Report(("create", "delete"))
+            (tc, bc, lc) = gw.create(depth=d)
+            (td, bd, ld) = gw.delete(depth=d)
+            (to, bo, lo) = gw.open(depth=d)
+            (tg, bg, lg) = gw.getattr(depth=d)
+            (ts, bs, ls) = gw.setattr(depth=d)
+
+            print("Gateway metadata ops: %s, depth=%d" % (descr, d))
+            r = Report(("create", "delete", "open", "getattr", "setattr"))
             r.printHeading()
-            r.printIOPS(1, (SECOND / tc, SECOND / td))
-            r.printLatency(1, (tc, td))
+            r.printIOPS(1, (bc, bd, bo, bg, bs))
+            r.printLatency(1, (tc, td, to, tg, ts))
             print("")
 
         print("Gateway throughput: %s, depth=%d" % (descr, d))
@@ -550,11 +1045,40 @@ if __name__ == '__main__':
         s = makeServer(fs, {})
         from Dlm import makeDLM
         dlm = makeDLM({})
+        from Mds import makeMDS
+        mds = makeMDS(makefs(makedisk({'device': 'disk'}), {}),
+                      {'journal': 'ssd'})
 
-        gw = makeGateway(s, dlm, {})
+        gw = makeGateway(s, dlm, {}, mds=mds)
         msg = "%dx%s, front=%dx%s, back=%dx%s" % (
             gw.num_cpus, gw.cpu.desc,
             gw.num_fronts, gw.front.desc,
             gw.num_backs, gw.front.desc)
 
-        gatewaytest(s, {}, descr=msg)
+        gatewaytest(gw, {'SioCmisc': True}, descr=msg)
+
+        # replication vs erasure coding on identical hardware
+        print("Gateway 4 x 12 disk servers, 25Gb client and cluster NICs")
+        print("\tprotection              1MB seq write      4K rand write" +
+              "      1MB seq read")
+        schemes = (
+            ("4+2 EC", {'n': 4, 'm': 2}, {}),
+            ("3x (gateway)", {'code': 'rep', 'copies': 3}, {}),
+            ("3x (primary, all)", {'code': 'rep', 'copies': 1},
+             {'replicas': 3}),
+            ("3x (primary, quorum)", {'code': 'rep', 'copies': 1},
+             {'replicas': 3, 'quorum': True}),
+        )
+        for (name, gd, sd) in schemes:
+            sd.update({'disks': 12, 'cores': 16, 'nic': 25 * GIG,
+                       'back': 25 * GIG})
+            s = makeServer(fs, sd)
+            gd.update({'servers': 4, 'cores': 16, 'front': 25 * GIG,
+                       'back': 25 * GIG})
+            gw = makeGateway(s, dlm, gd)
+            (t1, b1, l1) = gw.write(1 * MB, depth=16, seq=True)
+            (t2, b2, l2) = gw.write(4096, depth=16, seq=False)
+            (t3, b3, l3) = gw.read(1 * MB, depth=16, seq=True)
+            print("\t%-20s %6dMB/s %6dus %5dIOPS %6dus %6dMB/s %6dus" %
+                  (name, b1 / MEG, t1, b2 / 4096, t2, b3 / MEG, t3))
+        print("")
@@ -0,0 +1,152 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of group (batched) commit, where concurrent commits
+share a single journal flush, so that commit throughput grows with the
+number of concurrent committers (up to the journal bandwidth) rather
+than being limited to one commit per journal write.
+
+ACTIVE INGREDIENTS IN MODEL:
+    journal ...... commit records are appended (sequentially) to a
+                   journal device.  There may be one per data disk, or
+                   a single (faster) journal device for the server.
+                   A flush must reach the media (not just the drive's
+                   write-back cache).
+    batching ..... commits that arrive while a flush is in progress (or
+                   during the batching window that precedes a flush) are
+                   written by the next flush, up to a maximum batch
+    window ....... waiting (after the previous flush) for more commits
+                   to arrive makes each flush carry more commits, at
+                   the cost of adding the window to every commit
+    closed loop .. each of 'depth' committers issues its next commit
+                   some time (t_other) after its previous one completes,
+                   so the arrival rate depends on the commit latency.
+                   We iterate to find a consistent batch size.
+"""
+
+from units import *
+
+
+class GroupCommit:
+    """ Performance Modeling Group Commit Simulation. """
+
+    def __init__(self, journal, devices=1, window=0, max_batch=64,
+                 record=512):
+        """ create a group commit simulation
+            journal -- SimDisk to which commit records are written
+            devices -- number of such journals (sharing the commits)
+            window -- (us) time to wait for more commits before a flush
+            max_batch -- maximum commits per flush
+            record -- bytes of journal per commit
+        """
+        self.journal = journal
+        self.devices = devices
+        self.window = window
+        self.max_batch = max_batch
+        self.record = record
+        self.desc = "group commit (%dus window)" % (window)
+
+        # number of iterations to find a consistent batch size
+        self.iterations = 8
+
+    def flush_time(self, batch):
+        """ (us) time to write a batch of commit records to the journal
+            batch -- number of commits in the flush
+        """
+        t = self.journal.avgWrite(int(batch * self.record),
+                                  self.journal.size, seq=True)
+
+        # a flush cannot complete in the drive's write-back cache, so a
+        #   spinning journal must wait (on average) half a rotation
+        if self.journal.rpm > 0:
+            t += (SECOND / (self.journal.rpm / 60.0)) / 2
+        return t
+
+    def latency(self, batch, depth):
+        """ (us) time from commit request to completion
+            batch -- number of commits in each flush
+            depth -- number of concurrent committers (per journal)
+        """
+        t_flush = self.flush_time(batch)
+        # (if others are committing, we wait for a flush in progress)
+        wait = t_flush / 2 if depth > 1 else 0
+        return wait + self.window + t_flush
+
+    def batch(self, depth, t_other=0):
+        """ expected number of commits per flush
+            depth -- number of concurrent committers (per journal)
+            t_other -- (us) time each committer spends between commits
+        """
+        limit = min(depth, self.max_batch)
+        batch = 1
+        for i in range(self.iterations):
+            t_cycle = t_other + self.latency(batch, depth)
+            arrivals = depth * (self.flush_time(batch) + self.window) / \
+                t_cycle
+            batch = max(1, min(limit, arrivals))
+        return batch
+
+    def commit(self, depth=1, t_other=0):
+        """ expected group commit performance
+            depth -- number of concurrent committers (for all journals)
+            t_other -- (us) time each committer spends between commits
+
+            returns (latency, commits/second, commits per flush)
+        """
+        d = max(1, float(depth) / self.devices)
+        batch = self.batch(d, t_other)
+        t_flush = self.flush_time(batch)
+        rate = self.devices * batch * SECOND / (t_flush + self.window)
+        return (self.latency(batch, d), rate, batch)
+
+
+def makeGroupCommit(dict, journal, devices=1):
+    """ instantiate the group commit described by a configuration dict
+        dict -- of group commit parameters
+            commit_window -- (us) time to wait for more commits
+            commit_batch -- maximum commits per journal flush
+            commit_record -- bytes of journal per commit
+        journal -- SimDisk to which commit records are written
+        devices -- number of such journals
+    """
+
+    dflts = {
+        'commit_window': 0,
+        'commit_batch': 64,
+        'commit_record': 512,
+    }
+
+    window = dict['commit_window'] if 'commit_window' in dict \
+        else dflts['commit_window']
+    batch = dict['commit_batch'] if 'commit_batch' in dict \
+        else dflts['commit_batch']
+    record = dict['commit_record'] if 'commit_record' in dict \
+        else dflts['commit_record']
+
+    return GroupCommit(journal, devices=devices, window=window,
+                       max_batch=batch, record=record)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    from SimDisk import makedisk
+
+    for dev in ('disk', 'ssd'):
+        disk = makedisk({'device': dev})
+        print("Group commit to a %s journal (%dus between commits)" %
+              (disk.desc, 100))
+        print("\twindow   depth    batch   latency   commits/s")
+        for window in (0, 500, 2000):
+            gc = GroupCommit(disk, window=window)
+            for depth in (1, 8, 64):
+                (t, rate, batch) = gc.commit(depth, t_other=100)
+                iops = min(rate, depth * SECOND / (t + 100))
+                print("\t%5dus %6d %8.1f %8dus %10d" %
+                      (window, depth, batch, t, iops))
+        print("")
@@ -0,0 +1,191 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of the stripe lock cache in a Gateway.  Rather
+than releasing the stripe locks it obtains from the DLM, a Gateway
+keeps them (under a lease) so that later requests for the same stripe
+do not need another DLM round trip.
+
+ACTIVE INGREDIENTS IN MODEL:
+    capacity ... we can cache at most this many stripe locks
+    skew ....... stripe popularity follows a Zipf distribution with this
+                 exponent (0 = uniform), and we (optimistically) assume
+                 that the cache holds the most popular stripes
+    lease ...... a cached lock is only good if it is used again before
+                 its lease expires.  Leases on held locks are renewed
+                 in batches (one message per batch of locks).
+    sharing .... when several gateways share the same stripes, the
+                 last user of a stripe is (on average) us only 1/g of
+                 the time.  Otherwise our lock will have been revoked.
+"""
+
+import math
+from units import *
+
+
+def zeta(n, s):
+    """ (approximate) generalized harmonic number: sum(i^-s, i=1..n) """
+    if n < 1:
+        return 0.0
+    if s == 0:
+        return float(n)
+    if abs(s - 1) < 0.000001:
+        return math.log(n) + 0.5772156649 + 1 / (2.0 * n)
+    # Euler-Maclaurin approximation
+    return ((n ** (1 - s)) - 1) / (1 - s) + 0.5 * (1 + n ** -s) + \
+        s * (1 - n ** (-s - 1)) / 12.0
+
+
+class LockCache:
+    """ Performance Modeling Gateway Lock Cache Simulation. """
+
+    def __init__(self, capacity=10000, lease=30 * SECOND, skew=0.0,
+                 batch=64):
+        """ create a lock cache simulation
+            capacity -- maximum number of cached stripe locks
+            lease -- (us) duration of a lock lease
+            skew -- Zipf exponent for stripe popularity (0 = uniform)
+            batch -- number of lease renewals per message
+        """
+        self.capacity = capacity
+        self.lease = lease
+        self.skew = skew
+        self.batch = batch
+        self.desc = "%d lock cache (%ds lease)" % (capacity, lease / SECOND)
+
+        # pseudo-magic numbers to approximate complex behavior
+        self.buckets = 32       # rank ranges we evaluate
+
+    def ranks(self, stripes):
+        """ break the cached ranks into ranges of similar popularity
+            stripes -- number of stripes being accessed
+
+            returns list of (#stripes, share of accesses to each)
+        """
+        cached = min(self.capacity, stripes)
+        total = zeta(stripes, self.skew)
+        ranges = []
+        lo = 0
+        b = 1
+        while lo < cached:
+            # logarithmically spaced rank ranges
+            hi = min(cached, int(math.ceil(
+                cached ** (float(b) / self.buckets))))
+            b += 1
+            if hi <= lo:
+                continue
+            share = (zeta(hi, self.skew) - zeta(lo, self.skew)) / total
+            ranges.append((hi - lo, share / (hi - lo)))
+            lo = hi
+        return ranges
+
+    def reuse(self, rate, stripes, gateways=1):
+        """ probability that a lock request is satisfied from the cache
+            rate -- lock requests per second from this gateway
+            stripes -- number of stripes being accessed
+            gateways -- number of gateways sharing those stripes
+        """
+        lease = float(self.lease) / SECOND
+        hits = 0.0
+        for (count, p) in self.ranks(stripes):
+            # fraction of references that come within a lease period
+            hits += count * p * (1 - math.exp(-rate * p * lease))
+        return hits / gateways
+
+    def held(self, rate, stripes):
+        """ expected number of locks with live leases
+            rate -- lock requests per second from this gateway
+            stripes -- number of stripes being accessed
+        """
+        lease = float(self.lease) / SECOND
+        locks = 0.0
+        for (count, p) in self.ranks(stripes):
+            locks += count * (1 - math.exp(-rate * p * lease))
+        return locks
+
+    def renewals(self, rate, stripes):
+        """ lease renewal messages per second
+            rate -- lock requests per second from this gateway
+            stripes -- number of stripes being accessed
+        """
+        renew = self.held(rate, stripes) * SECOND / float(self.lease)
+        return renew / self.batch
+
+
+def makeLockCache(dict):
+    """ instantiate the lock cache described by a configuration dict
+        dict -- of lock cache parameters
+            lock_cache -- maximum number of cached stripe locks
+            lease -- (us) duration of a lock lease
+            skew -- Zipf exponent for stripe popularity
+            renew_batch -- number of lease renewals per message
+    """
+
+    dflts = {
+        'lock_cache': 10000,
+        'lease': 30 * SECOND,
+        'skew': 0.0,
+        'renew_batch': 64,
+    }
+
+    cap = dict['lock_cache'] if 'lock_cache' in dict else dflts['lock_cache']
+    lease = dict['lease'] if 'lease' in dict else dflts['lease']
+    skew = dict['skew'] if 'skew' in dict else dflts['skew']
+    batch = dict['renew_batch'] if 'renew_batch' in dict \
+        else dflts['renew_batch']
+
+    return LockCache(cap, lease=lease, skew=skew, batch=batch)
+
+
+def locktest(lc, stripes, rates=(100, 1000, 10000), gateways=(1, 4, 16)):
+    """ tabulate lock reuse for a lock cache
+        lc -- lock cache to be tested
+        stripes -- number of stripes being accessed
+        rates -- list of request rates (per gateway)
+        gateways -- list of gateway counts
+    """
+    print("%s, %d stripes, skew=%3.1f" %
+          (lc.desc, stripes, lc.skew))
+    print("\t    rate  gateways   reuse     held  renew/s")
+    for r in rates:
+        for g in gateways:
+            print("\t%8d  %8d   %5.3f  %7d  %7.1f" %
+                  (r, g, lc.reuse(r, stripes, g), lc.held(r, stripes),
+                   lc.renewals(r, stripes)))
+    print("")
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    for skew in (0.0, 1.0):
+        lc = makeLockCache({'skew': skew})
+        locktest(lc, 100000)
+
+    # how much DLM do we need as we add gateways
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+    from Dlm import makeDLM
+    from Gateway import makeGateway
+    s = makeServer(makefs(makedisk({}), {}), {'disks': 4})
+    dlm = makeDLM({})
+    print("DLM load for 4K random I/O (d=32) to 100000 stripes")
+    print("\tgateways    cache     read    write")
+    for g in (1, 2, 4, 8, 16, 32):
+        for cache in (0, 10000):
+            d = {'gateways': g, 'stripes': 100000, 'servers': 8,
+                 'skew': 1.0}
+            if cache > 0:
+                d['lock_cache'] = cache
+            gw = makeGateway(s, dlm, d)
+            (tr, br, lr) = gw.read(4096, depth=32)
+            (tw, bw, lw) = gw.write(4096, depth=32)
+            print("\t%8d  %7d  %7.3f  %7.3f" %
+                  (g, cache, lr['dlm'], lw['dlm']))
+    print("")
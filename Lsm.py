@@ -0,0 +1,232 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is intended to be able to simulate the performance of an LSM-tree
+key-value store (of the LevelDB/RocksDB variety) used to hold the metadata
+that a SimFS would otherwise keep in metadata blocks.
+
+ACTIVE INGREDIENTS IN MODEL:
+    puts ...... go to a write-ahead log (concurrent puts share a log
+                write) and an in-memory memtable.  Full memtables are
+                flushed to level 0, and leveled compaction then rewrites
+                each byte roughly fanout/2 times per level.  That write
+                amplification (and the matching compaction reads) is
+                charged, as large sequential I/O, to the same device.
+    gets ...... check the memtable, then each level.  Bloom filters
+                eliminate most of the levels that do not contain the key,
+                but false positives still cost (uncached) block reads.
+    cache ..... the block cache holds a (uniformly chosen) fraction of the
+                data blocks.
+"""
+
+import math
+from units import *
+
+
+class LSM:
+    """ Performance Modeling LSM Key-Value Store Simulation. """
+
+    def __init__(self, disk, cpu=None, db_size=16 * GB, memtable=64 * MB,
+                 fanout=10, bloom_bits=10, cache=1 * GB):
+        """ create an LSM key-value store simulation
+            disk -- SimDisk on which the store (and its log) live
+            cpu -- SimCPU for the processor (or None)
+            db_size -- bytes of key-value data in the store
+            memtable -- bytes of memtable before a flush
+            fanout -- size ratio between successive levels
+            bloom_bits -- bloom filter bits per key (0 for none)
+            cache -- bytes of block cache
+        """
+        self.disk = disk
+        self.cpu = cpu
+        self.db_size = db_size
+        self.memtable = memtable
+        self.fanout = fanout
+        self.bloom_bits = bloom_bits
+        self.cache = cache
+        self.desc = "LSM(%dMB memtable, x%d)" % (memtable / MB, fanout)
+
+        # sizing performance parameters
+        self.entry = 256            # bytes per key-value pair
+        self.block = 4096           # bytes per data block
+        self.l0_files = 4           # level-0 files before compaction
+        self.log_batch = 32         # max puts per log write
+        self.compact_io = 1 * MB    # compaction read/write size
+
+        # magic performance tuning constants
+        self.merge_x = 20           # FIX - instructions per compacted byte
+        self.get_us = 3             # FIX - CPU (us) for a get
+        self.put_us = 2             # FIX - CPU (us) for a put
+
+    def levels(self):
+        """ number of (non-zero) levels in the tree """
+        ratio = float(self.db_size) / self.memtable
+        if ratio <= 1:
+            return 1
+        return max(1, int(math.ceil(math.log(ratio) / math.log(self.fanout))))
+
+    def write_amp(self):
+        """ bytes written to the device per byte put """
+        # log + level-0 flush + leveled compaction into each level
+        return 2 + self.levels() * (self.fanout + 1) / 2.0
+
+    def false_positive(self):
+        """ probability a bloom filter fails to exclude a level """
+        if self.bloom_bits <= 0:
+            return 1.0
+        return math.pow(0.6185, self.bloom_bits)
+
+    def hit_rate(self):
+        """ probability a data block read is satisfied from cache """
+        return min(1.0, float(self.cache) / self.db_size)
+
+    def get_reads(self):
+        """ expected device reads per get (of a key that exists) """
+        # one true read, plus false positives in each other run
+        runs = self.l0_files + self.levels() - 1
+        reads = 1 + runs * self.false_positive()
+
+        # (some keys are still in the memtable)
+        in_mem = min(1.0, float(self.memtable) / self.db_size)
+        return reads * (1 - in_mem) * (1 - self.hit_rate())
+
+    def compact_time(self):
+        """ device time (us) per byte of compaction read and write """
+        t = self.disk.avgRead(self.compact_io, self.db_size, seq=True)
+        t += self.disk.avgWrite(self.compact_io, self.db_size, seq=True)
+        return t / self.compact_io
+
+    def bg_time(self):
+        """ device time (us) per put for flushes and compaction """
+        # everything after the log is large sequential I/O
+        return self.entry * (self.write_amp() - 1) * self.compact_time()
+
+    def get_time(self, depth=1):
+        """ average device time (us) for a get
+            depth -- number of concurrent gets
+        """
+        t = self.disk.avgRead(self.block, self.db_size, depth=depth)
+        return self.get_reads() * t
+
+    def put_time(self, depth=1):
+        """ average device time (us) for a put, including its share
+            of log writes, memtable flushes and compaction
+            depth -- number of concurrent puts
+        """
+        # concurrent puts share a log write
+        batch = min(depth, self.log_batch)
+        t = self.disk.avgWrite(batch * self.entry, self.disk.size, seq=True)
+        return (t / batch) + self.bg_time()
+
+    def cpu_get(self):
+        """ CPU time (us) for a get """
+        return self.get_us
+
+    def cpu_put(self):
+        """ CPU time (us) for a put (including its share of compaction) """
+        t = self.put_us
+        if self.cpu is not None:
+            t += self.cpu.execute(self.merge_x * self.entry *
+                                  (self.write_amp() - 2))
+        return t
+
+    def get(self, depth=1):
+        """ expected get performance
+            depth -- number of concurrent gets
+        """
+        time = self.get_time(depth) + self.cpu_get()
+        loads = {}
+        loads['disk'] = 1.0
+        loads['cpu'] = float(self.cpu_get()) / SECOND
+        return (time, SECOND / time, loads)
+
+    def put(self, depth=1):
+        """ expected put performance
+            depth -- number of concurrent puts
+        """
+        time = self.put_time(depth) + self.cpu_put()
+        loads = {}
+        loads['disk'] = 1.0
+        loads['compaction'] = self.bg_time() / time
+        loads['cpu'] = float(self.cpu_put()) / SECOND
+        return (time, SECOND / time, loads)
+
+
+def makeLSM(disk, dict, cpu=None):
+    """ instantiate the LSM key-value store described by a configuration dict
+        disk -- device on which the store is to be created
+        dict -- of LSM parameters
+            md_db_size -- bytes of metadata in the store
+            memtable -- bytes of memtable
+            fanout -- size ratio between levels
+            bloom_bits -- bloom filter bits per key
+            block_cache -- bytes of block cache
+        cpu -- SimCPU for the processor (or None)
+    """
+
+    dflts = {
+        'md_db_size': 16 * GB,
+        'memtable': 64 * MB,
+        'fanout': 10,
+        'bloom_bits': 10,
+        'block_cache': 1 * GB,
+    }
+
+    size = dict['md_db_size'] if 'md_db_size' in dict \
+        else dflts['md_db_size']
+    mem = dict['memtable'] if 'memtable' in dict else dflts['memtable']
+    fanout = dict['fanout'] if 'fanout' in dict else dflts['fanout']
+    bloom = dict['bloom_bits'] if 'bloom_bits' in dict \
+        else dflts['bloom_bits']
+    cache = dict['block_cache'] if 'block_cache' in dict \
+        else dflts['block_cache']
+
+    return LSM(disk, cpu=cpu, db_size=size, memtable=mem, fanout=fanout,
+               bloom_bits=bloom, cache=cache)
+
+
+from Report import Report
+
+
+def lsmtest(kv, descr="", depths=(1, 32)):
+    """ display the key parameters and costs of an LSM store
+        kv -- LSM store to be tested
+        descr -- description of the configuration
+        depths -- list of request depths
+    """
+
+    print("%s on %s: %s" % (kv.desc, kv.disk.desc, descr))
+    print("\tlevels %d, write amp %.1f, bloom f/p %.4f, cache hit %.3f" %
+          (kv.levels(), kv.write_amp(), kv.false_positive(), kv.hit_rate()))
+    r = Report(("get", "put"))
+    r.printHeading()
+    for d in depths:
+        (tg, bg, lg) = kv.get(depth=d)
+        (tp, bp, lp) = kv.put(depth=d)
+        r.printIOPS(1, (bg, bp))
+        r.printLatency(1, (tg, tp))
+    print("")
+
+
+#
+# run a standard test series
+#
+if __name__ == '__main__':
+
+    from SimDisk import makedisk
+    for dev in ('disk', 'ssd'):
+        disk = makedisk({'device': dev})
+        for bits in (0, 10):
+            kv = makeLSM(disk, {'bloom_bits': bits})
+            lsmtest(kv, descr="%d bloom bits/key" % bits)
+
+    # compare FS metadata with LSM metadata under a file system
+    from SimFS import makefs, fstest
+    disk = makedisk({'device': 'ssd'})
+    for md in ('fs', 'lsm'):
+        fs = makefs(disk, {'metadata': md})
+        fstest(fs, {'FioFdepth': [1]},
+               descr="%s on %s, %s metadata" % (fs.desc, disk.desc, md))
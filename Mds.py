@@ -0,0 +1,349 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is intended to be able to simulate the performance of a
+metadata server, which keeps the namespace (directories and inodes)
+in its own metadata file system, and (optionally) logs updates to a
+journal so that they need not be synchronously written to that FS.
+
+ACTIVE INGREDIENTS IN MODEL:
+    directory size ... large directories are b-trees whose interior
+                       blocks may not be in cache (adding reads to
+                       every lookup) and which take longer to search
+    journal .......... mutations are acknowledged once they are in the
+                       journal (concurrent ones sharing a write), and
+                       the FS updates are flushed asynchronously.  With
+                       no journal, FS updates must be synchronous.
+"""
+
+import math
+from units import *
+from Arrivals import queue_length
+
+# constants to control queue length warnings
+WARN_LOAD = 0.8             # warn if load goes above this level
+WARN_DELAY = 100            # (us) only warn if queue delay goes above
+WARN_DELTA = 10             # (%) only warn if queue delay increases op time by
+
+
+class MDS:
+    """ Performance Modeling Metadata Server Simulation. """
+
+    warnings = ""           # I didn't want these to come out in mid test
+
+    def __init__(self,
+                 md_fs,
+                 nic,
+                 cpu,
+                 journal=None,
+                 num_nics=1,
+                 num_cpus=1,
+                 hot_dirs=100):
+        """ create a metadata server simulation
+            md_fs -- SimFS for the metadata file system
+            nic -- SimIFC for the network interface
+            cpu -- SimCPU for the processor
+            journal -- SimDisk for the metadata journal (or None)
+            num_nics -- number of NICs per server (for our use)
+            num_cpus -- number of processors per server (for our use)
+            hot_dirs -- number of directories being actively used
+        """
+        self.fs = md_fs
+        self.nic = nic
+        self.cpu = cpu
+        self.journal = journal
+        self.num_nics = num_nics
+        self.num_cpus = num_cpus
+        self.hot_dirs = hot_dirs
+
+        # sizing performance parameters
+        self.min_msg = 128          # minimum request/response
+        self.dirent = 64            # bytes per directory entry
+        self.fanout = 128           # directory b-tree fan-out
+        self.jrnl_rec = 512         # bytes of journal per update
+        self.jrnl_batch = 64        # max updates per journal write
+        self.cache = cpu.mem_size / 2   # memory for caching metadata
+
+        # magic performance tuning constants
+        self.lookup_us = 2          # time (us) to search one dir block
+        self.op_us = 20             # time (us) to process a request
+
+    def warn(self, msg):
+        """ add a warning to our accumulated warnings list """
+
+        # only if it is not already there
+        if (self.warnings.find(msg) < 0):
+            self.warnings += msg
+
+    def lookup(self, dir_size):
+        """ (time, CPU time) to find an entry in a directory
+            dir_size -- number of entries in the directory
+        """
+        blocks = max(1, float(dir_size) * self.dirent / self.fs.md_size)
+        levels = 1 + int(math.log(blocks) / math.log(self.fanout))
+
+        # the FS ops already read one directory block (if not cached)
+        #   so only deeper levels of big directories cost extra reads
+        dir_bytes = self.hot_dirs * blocks * self.fs.md_size
+        cached = min(1.0, float(self.cache) / dir_bytes)
+        reads = (levels - 1) * (1 - cached)
+        t_read = reads * self.fs.md_read_time()
+        cpu = levels * self.lookup_us
+        return (t_read + cpu, cpu)
+
+    def journal_time(self, depth=1):
+        """ (time, updates per write) to journal a metadata update
+            depth -- number of concurrent updates
+        """
+        if self.journal is None:
+            return (0, 1)
+        batch = min(depth, self.jrnl_batch)
+        t = self.journal.avgWrite(batch * self.jrnl_rec,
+                                  self.journal.size, seq=True)
+        return (t, batch)
+
+    def metaop(self, descr, fs_op, depth, dir_size, update):
+        """ common modeling for all metadata operations
+            descr -- description of the operation (for warnings)
+            fs_op -- (time, bw, load) of the underlying SimFS operation
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the directory
+            update -- does this operation change the metadata
+        """
+
+        # basic wire times for message receipt, dispatch and response
+        t_net_w = self.nic.min_write_latency + \
+            self.nic.write_time(self.min_msg)
+        bw_n = self.num_nics * SECOND / t_net_w
+
+        # CPU time to process the received packet, and send response
+        t_dsp = self.nic.read_cpu(self.min_msg) + self.op_us
+        t_rsp = self.nic.write_cpu(self.min_msg)
+
+        # find the directory entry
+        (t_dir, cpu_dir) = self.lookup(dir_size)
+
+        # the FS operation (only waited for if not journaled)
+        (t_fs, bw_fs, l_fs) = fs_op
+        cpu_fs = l_fs['cpu'] * SECOND
+        # (deep directory lookups also use the metadata FS)
+        bw_fs = SECOND / (SECOND / bw_fs + t_dir - cpu_dir)
+
+        # updates must be persisted before we respond
+        t_jrnl = 0
+        bw_j = 0
+        if update and self.journal is not None:
+            (t_jrnl, batch) = self.journal_time(depth)
+            bw_j = batch * SECOND / t_jrnl
+            t_fs = 0
+
+        # compute the request latency and throughputs
+        cpu_per_op = t_dsp + cpu_dir + cpu_fs + t_rsp
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'meta', depth)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'meta')
+        bw_cpu = avail_cores * SECOND / cpu_per_op
+        #   (CPU time is inflated by contention with the other cores)
+        latency = (t_dsp + cpu_dir + t_rsp) * x_cpu + (t_dir - cpu_dir) + \
+            t_fs + t_jrnl + t_net_w
+        iops_base = depth * SECOND / latency
+        iops = min(iops_base, bw_n, bw_fs, bw_cpu)
+        if bw_j > 0:
+            iops = min(iops, bw_j)
+
+        load = {}
+        q_delay = 0
+
+        # see what this means for FS (and journal) load and queue
+        #   (at most depth - 1 of our requests can be ahead of us)
+        fs_load = iops / bw_fs
+        delay = (SECOND / bw_fs) * queue_length(fs_load, depth - 1)
+        q_delay += delay
+        delta = 100 * float(delay) / latency
+        if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+            self.warn("MDS FS load (%4.2f) adds %dus (%d%%) to %s\n" %
+                      (fs_load, delay, delta, descr))
+        load['fs'] = fs_load
+        if bw_j > 0:
+            j_load = iops / bw_j
+            delay = (SECOND / bw_j) * queue_length(j_load, depth - 1)
+            q_delay += delay
+            delta = 100 * float(delay) / latency
+            if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+                self.warn("MDS journal load (%4.2f) adds %dus (%d%%) to %s\n"
+                          % (j_load, delay, delta, descr))
+            load['journal'] = j_load
+
+        # see what this means for NIC load and queue
+        nic_load = t_net_w * iops / float(self.num_nics * SECOND)
+        if (bw_n < iops_base):
+            self.warn("MDS NIC saturated by %dus x %d IOPS for %s\n" %
+                      (t_net_w, iops, descr))
+        delay = t_net_w * self.nic.queue_length(nic_load, depth)
+        q_delay += delay
+        load['net'] = nic_load
+
+        # see what this means for CPU load and queue
+        core_load = cpu_per_op * iops / float(avail_cores * SECOND)
+        if (bw_cpu < iops_base):
+            self.warn("MDS CPUs saturated by %dus x %d IOPS for %s\n" %
+                      (cpu_per_op, iops, descr))
+        delay = cpu_per_op * self.cpu.queue_length(core_load, depth)
+        q_delay += delay
+        delta = 100 * float(delay) / latency
+        if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+            self.warn("MDS CPU load (%4.2f) adds %dus (%d%%) to %s\n" %
+                      (core_load, delay, delta, descr))
+        load['cpu'] = core_load
+
+        # did we run out of metadata FS
+        if (bw_fs < iops_base):
+            self.warn("MDS FS caps throughput at %d IOPS for %s\n" %
+                      (bw_fs, descr))
+
+        # requests wait (somewhere) until they drain at the capped rate
+        return (max(latency + q_delay, depth * SECOND / iops), iops, load)
+
+    def create(self, depth=1, dir_size=1000):
+        """ expected file creation performance
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the parent directory
+        """
+        sync = self.journal is None
+        return self.metaop("d=%d creates" % depth,
+                           self.fs.create(sync=sync),
+                           depth, dir_size, True)
+
+    def delete(self, depth=1, dir_size=1000):
+        """ expected file deletion performance
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the parent directory
+        """
+        sync = self.journal is None
+        return self.metaop("d=%d deletes" % depth,
+                           self.fs.delete(sync=sync),
+                           depth, dir_size, True)
+
+    def open(self, depth=1, dir_size=1000):
+        """ expected file open performance
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the parent directory
+        """
+        return self.metaop("d=%d opens" % depth, self.fs.open(),
+                           depth, dir_size, False)
+
+    def stat(self, depth=1, dir_size=1000):
+        """ expected file stat performance
+            depth -- number of concurrent requests
+            dir_size -- number of entries in the parent directory
+        """
+        return self.metaop("d=%d stats" % depth, self.fs.stat(),
+                           depth, dir_size, False)
+
+    def getattr(self, depth=1):
+        """ expected getattr performance (for an open file)
+            depth -- number of concurrent requests
+        """
+        return self.metaop("d=%d getattrs" % depth, self.fs.getattr(),
+                           depth, 1, False)
+
+    def setattr(self, depth=1):
+        """ expected setattr performance (for an open file)
+            depth -- number of concurrent requests
+        """
+        sync = self.journal is None
+        return self.metaop("d=%d setattrs" % depth,
+                           self.fs.setattr(sync=sync),
+                           depth, 1, True)
+
+
+def makeMDS(fs, dict):
+    """ instantiate the metadata server described by a configuration dict
+        fs -- file system on which metadata is stored
+        dict -- of MDS parameters
+    """
+
+    dflts = {
+        'cpus': 1,
+        'cpu': 'generic',
+        'speed': 2.7 * GIG,
+        'cores': 1,
+        'nics': 1,
+        'nic':  10 * GIG,
+        'hot_dirs': 100,
+    }
+
+    # collect the parameters
+    cpus = dict['cpus'] if 'cpus' in dict else dflts['cpus']
+    nics = dict['nics'] if 'nics' in dict else dflts['nics']
+    nic_bw = dict['nic'] if 'nic' in dict else dflts['nic']
+    dirs = dict['hot_dirs'] if 'hot_dirs' in dict else dflts['hot_dirs']
+
+    # instantiate the parts
+    import SimCPU
+    myCpu = SimCPU.makeCPU(dict)
+    import SimIFC
+    myNic = SimIFC.NIC("eth", processor=myCpu, bw=nic_bw)
+    myJrnl = None
+    if 'journal' in dict:
+        import SimDisk
+        myJrnl = SimDisk.makedisk({'device': dict['journal']})
+
+    mds = MDS(fs, myNic, myCpu, journal=myJrnl,
+              num_nics=nics, num_cpus=cpus, hot_dirs=dirs)
+    return mds
+
+
+from Report import Report
+
+
+def mdstest(mds, dict, descr=""):
+    """
+    exercise a metadata server with tests described in a dict
+        mds -- metadata server to be tested
+        dict --
+            MdsDepth ... list of request depths
+            MdsDirs ... list of directory sizes
+    """
+
+    dflt = {        # default throughput test parameters
+        'MdsDepth': [1, 32],
+        'MdsDirs': [1000, 1000000],
+    }
+
+    depths = dict['MdsDepth'] if 'MdsDepth' in dict else dflt['MdsDepth']
+    dirs = dict['MdsDirs'] if 'MdsDirs' in dict else dflt['MdsDirs']
+
+    r = Report(("create", "delete", "open", "getattr", "setattr"))
+    for d in depths:
+        for n in dirs:
+            print("MDS metadata ops: %s, depth=%d, dir=%d" % (descr, d, n))
+            r.printHeading()
+            (tc, bc, lc) = mds.create(depth=d, dir_size=n)
+            (td, bd, ld) = mds.delete(depth=d, dir_size=n)
+            (to, bo, lo) = mds.open(depth=d, dir_size=n)
+            (tg, bg, lg) = mds.getattr(depth=d)
+            (ts, bs, ls) = mds.setattr(depth=d)
+            r.printIOPS(1, (bc, bd, bo, bg, bs))
+            r.printLatency(1, (tc, td, to, tg, ts))
+            print("")
+
+
+#
+# run a standard test series
+#
+if __name__ == '__main__':
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    for jrnl in (None, 'ssd'):
+        fs = makefs(makedisk({'device': 'disk'}), {})
+        d = {} if jrnl is None else {'journal': jrnl}
+        mds = makeMDS(fs, d)
+        msg = "%s on %s, %s" % (fs.desc, fs.disk.desc,
+                                "no journal" if jrnl is None
+                                else "journal on " + jrnl)
+        mdstest(mds, {}, descr=msg)
@@ -0,0 +1,167 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of the object (inode) cache in a Server.  A random
+read or write only has to open (or create) its object if that object's
+node (and extent map) is not already in memory.
+
+ACTIVE INGREDIENTS IN MODEL:
+    working set .. the number of objects is the used capacity divided
+                   by the (mix weighted) average object size
+    entry size ... each cached object costs a node, plus an extent map
+                   entry for each extent in the object (so larger
+                   objects cost more memory to cache)
+    capacity ..... the cache is a fraction of the server's memory
+    skew ......... object popularity follows a Zipf distribution with
+                   this exponent (0 = uniform), and we (optimistically)
+                   assume that the cache holds the most popular objects
+"""
+
+import math
+from units import *
+from LockCache import zeta
+
+
+class ObjectCache:
+    """ Performance Modeling Server Object Cache Simulation. """
+
+    def __init__(self, mem=512 * MB, sizes=None, skew=0.0, fill=0.5):
+        """ create an object cache simulation
+            mem -- bytes of memory for cached object nodes
+            sizes -- map from object size to fraction of objects
+            skew -- Zipf exponent for object popularity (0 = uniform)
+            fill -- fraction of the storage capacity that is in use
+        """
+        if sizes is None:
+            sizes = {4 * MB: 1.0}
+        self.mem = mem
+        self.sizes = sizes
+        self.skew = skew
+        self.fill = fill
+        self.desc = "%dMB object cache" % (mem / MB)
+
+        # sizing performance parameters
+        self.node = 512             # bytes per cached object node
+        self.extent = 16            # bytes per cached extent map entry
+        self.extent_size = 1 * MB   # bytes per extent
+
+    def avg_size(self):
+        """ average object size (bytes) """
+        total = 0.0
+        weight = 0.0
+        for size in self.sizes:
+            total += size * self.sizes[size]
+            weight += self.sizes[size]
+        return total / weight
+
+    def entry(self):
+        """ average bytes of memory to cache one object """
+        total = 0.0
+        weight = 0.0
+        for size in self.sizes:
+            extents = int(math.ceil(float(size) / self.extent_size))
+            total += (self.node + extents * self.extent) * self.sizes[size]
+            weight += self.sizes[size]
+        return total / weight
+
+    def objects(self, capacity):
+        """ number of objects stored
+            capacity -- bytes of storage behind this cache
+        """
+        return max(1, int(capacity * self.fill / self.avg_size()))
+
+    def cached(self, mem=None):
+        """ number of objects the cache can hold
+            mem -- bytes of cache memory (default: ours)
+        """
+        if mem is None:
+            mem = self.mem
+        return int(mem / self.entry())
+
+    def hit_ratio(self, objects, mem=None):
+        """ probability that a random access finds its object cached
+            objects -- number of objects being accessed
+            mem -- bytes of cache memory (default: ours)
+        """
+        cached = min(objects, self.cached(mem))
+        if cached >= objects:
+            return 1.0
+        return zeta(cached, self.skew) / zeta(objects, self.skew)
+
+    def size_for(self, target, objects):
+        """ bytes of cache memory needed to achieve a hit ratio
+            target -- desired hit ratio
+            objects -- number of objects being accessed
+        """
+        if target >= 1:
+            return objects * self.entry()
+
+        # hit ratio is monotonic in cached objects, so binary search
+        total = zeta(objects, self.skew)
+        lo = 0
+        hi = objects
+        while lo < hi:
+            mid = int((lo + hi) / 2)
+            if zeta(mid, self.skew) / total >= target:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo * self.entry()
+
+
+def makeObjectCache(dict, mem):
+    """ instantiate the object cache described by a configuration dict
+        dict -- of object cache parameters
+            obj_cache -- fraction of server memory used for object cache
+            obj_sizes -- map from object size to fraction of objects
+            obj_skew -- Zipf exponent for object popularity
+            fill -- fraction of storage capacity in use
+        mem -- bytes of server memory
+    """
+
+    dflts = {
+        'obj_cache': 0.25,
+        'obj_sizes': {4 * MB: 1.0},
+        'obj_skew': 0.0,
+        'fill': 0.5,
+    }
+
+    frac = dict['obj_cache'] if 'obj_cache' in dict else dflts['obj_cache']
+    sizes = dict['obj_sizes'] if 'obj_sizes' in dict else dflts['obj_sizes']
+    skew = dict['obj_skew'] if 'obj_skew' in dict else dflts['obj_skew']
+    fill = dict['fill'] if 'fill' in dict else dflts['fill']
+
+    return ObjectCache(mem * frac, sizes=sizes, skew=skew, fill=fill)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    objects = 100 * 1000 * 1000
+    for sizes in ({4 * MB: 1.0}, {64 * KB: 0.9, 16 * MB: 0.1}):
+        oc = ObjectCache(sizes=sizes)
+        print("%d objects, avg size %dKB, %d bytes/cached object" %
+              (objects, oc.avg_size() / KB, oc.entry()))
+        print("\tskew      256MB       1GB       4GB      16GB")
+        for skew in (0.0, 0.5, 0.8, 1.0, 1.2):
+            oc.skew = skew
+            hits = ()
+            for mem in (256 * MB, 1 * GB, 4 * GB, 16 * GB):
+                hits += (oc.hit_ratio(objects, mem),)
+            print("\t%4.1f  %9.3f %9.3f %9.3f %9.3f" % ((skew,) + hits))
+        print("")
+
+        print("\tcache required for a target hit ratio")
+        print("\tskew     50%       90%       99%")
+        for skew in (0.0, 0.8, 1.2):
+            oc.skew = skew
+            need = ()
+            for target in (0.5, 0.9, 0.99):
+                need += (oc.size_for(target, objects) / MB,)
+            print("\t%4.1f  %6dMB  %6dMB  %6dMB" % ((skew,) + need))
+        print("")
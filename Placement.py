@@ -0,0 +1,246 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of the load imbalance caused by pseudo-random
+(CRUSH-style) data placement.  Objects are hashed into placement groups,
+and each placement group is mapped to 'replicas' distinct devices, chosen
+with probability proportional to device weight.  The devices do not get
+exactly equal numbers of placement groups, and whichever device has the
+most (relative to its weight) fills first and saturates first.  If the
+placement groups are equally busy, the cluster throughput is the ideal
+throughput divided by the max/mean load ratio.
+
+ACTIVE INGREDIENTS IN MODEL:
+    analytic ..... the number of placement group shards on a device is
+                   (approximately) Poisson, with a mean proportional to
+                   its weight.  The expected maximum (over all devices)
+                   of shards/mean is computed from the product of the
+                   (per device) Poisson CDFs.
+    monte carlo .. (optional) place the placement groups a number of
+                   times and average the observed max/mean ratios.  This
+                   captures the requirement that each placement group's
+                   replicas be on distinct devices.
+    recommend .... the smallest power of two placement groups that keeps
+                   the expected max/mean ratio under a target
+"""
+
+import math
+import random
+import bisect
+from array import array
+from Poisson import cdf
+from units import *
+
+
+class Placement:
+    """ Performance Modeling Data Placement Imbalance Simulation. """
+
+    def __init__(self, pgs=1024, replicas=3, trials=0, seed=None):
+        """ create a placement simulation
+            pgs -- number of placement groups
+            replicas -- devices to which each placement group is mapped
+            trials -- number of Monte Carlo trials (0 = analytic)
+            seed -- random number seed (for repeatable trials)
+        """
+        self.pgs = pgs
+        self.replicas = replicas
+        self.trials = trials
+        self.seed = seed
+        self.desc = "%d PGs x %d" % (pgs, replicas)
+        self.memo = {}
+
+    def expected(self, weights, pgs=None):
+        """ expected placement group shards on each device
+            weights -- list of device weights
+            pgs -- number of placement groups (default: ours)
+        """
+        if pgs is None:
+            pgs = self.pgs
+        shards = pgs * min(self.replicas, len(weights))
+        total = float(sum(weights))
+        return [shards * w / total for w in weights]
+
+    def analytic(self, weights, pgs=None):
+        """ expected max/mean load ratio (Poisson approximation)
+            weights -- list of device weights
+            pgs -- number of placement groups (default: ours)
+        """
+        # devices of equal weight have identical distributions
+        classes = {}
+        for l in self.expected(weights, pgs):
+            classes[l] = classes.get(l, 0) + 1
+
+        # the CDF of each class, out to where it is (effectively) one
+        events = []
+        cdfs = {}
+        log_g = 0.0     # log P(every device is under the current ratio)
+        for l in classes:
+            top = int(l + 10 * math.sqrt(l) + 10)
+            cdfs[l] = [max(p, 1e-300) for p in cdf(l, 1, range(top + 1))]
+            log_g += classes[l] * math.log(cdfs[l][0])
+            for k in range(1, top + 1):
+                events.append((k / l, l, k))
+        events.sort()
+
+        # E[max ratio] = integral of P(max ratio > x), which only
+        # changes where some device's count reaches another integer
+        result = 0.0
+        x = 0.0
+        for (r, l, k) in events:
+            result += (1 - math.exp(log_g)) * (r - x)
+            x = r
+            log_g += classes[l] * (math.log(cdfs[l][k]) -
+                                   math.log(cdfs[l][k - 1]))
+        return result
+
+    def simulate(self, weights, pgs=None, trials=None):
+        """ average max/mean load ratio over Monte Carlo placements
+            weights -- list of device weights
+            pgs -- number of placement groups (default: ours)
+            trials -- number of placements (default: ours)
+        """
+        if pgs is None:
+            pgs = self.pgs
+        if trials is None:
+            trials = self.trials
+        n = len(weights)
+        r = min(self.replicas, n)
+        cum = array('d')
+        total = 0.0
+        for w in weights:
+            total += w
+            cum.append(total)
+        means = self.expected(weights, pgs)
+
+        rng = random.Random(self.seed)
+        result = 0.0
+        for trial in range(trials):
+            shards = array('l', [0] * n)
+            for pg in range(pgs):
+                chosen = []
+                while len(chosen) < r:
+                    d = bisect.bisect(cum, rng.random() * total)
+                    if d < n and d not in chosen:
+                        chosen.append(d)
+                for d in chosen:
+                    shards[d] += 1
+            result += max([shards[i] / means[i] for i in range(n)])
+        return result / trials
+
+    def imbalance(self, devices, weights=None, pgs=None):
+        """ (remembered) expected max/mean load ratio
+            devices -- number of devices
+            weights -- list of device weights (default: all equal)
+            pgs -- number of placement groups (default: ours)
+        """
+        if weights is None:
+            weights = [1.0] * devices
+        key = (tuple(weights), pgs)
+        if key not in self.memo:
+            if devices <= 1:
+                self.memo[key] = 1.0
+            elif self.trials > 0:
+                self.memo[key] = self.simulate(weights, pgs)
+            else:
+                self.memo[key] = self.analytic(weights, pgs)
+        return self.memo[key]
+
+    def derate(self, devices, weights=None):
+        """ fraction of the ideal throughput (or capacity) we can use
+            devices -- number of devices
+            weights -- list of device weights (default: all equal)
+        """
+        return 1.0 / self.imbalance(devices, weights)
+
+    def recommend(self, devices, target=1.1, weights=None, most=1048576):
+        """ smallest power of two placement groups meeting a target
+            devices -- number of devices
+            target -- desired max/mean load ratio
+            weights -- list of device weights (default: all equal)
+            most -- largest number of placement groups to consider
+        """
+        pgs = 1
+        while pgs < most and \
+                self.imbalance(devices, weights, pgs) > target:
+            pgs *= 2
+        return pgs
+
+
+def makePlacement(dict, replicas=1):
+    """ instantiate the placement described by a configuration dict
+        dict -- of placement parameters
+            pgs -- number of placement groups
+            pg_trials -- number of Monte Carlo trials (0 = analytic)
+        replicas -- devices to which each placement group is mapped
+    """
+
+    dflts = {
+        'pgs': 1024,
+        'pg_trials': 0,
+    }
+
+    pgs = dict['pgs'] if 'pgs' in dict else dflts['pgs']
+    trials = dict['pg_trials'] if 'pg_trials' in dict \
+        else dflts['pg_trials']
+
+    return Placement(pgs, replicas=replicas, trials=trials, seed=1)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    print("Expected max/mean placement group shards (3 replicas)")
+    print("\t devices    PGs   per dev   analytic  monte carlo  derate")
+    for devices in (12, 100, 1000):
+        for pgs in (devices * 100 / 3, devices * 300 / 3):
+            pgs = int(pgs)
+            p = Placement(pgs, replicas=3, trials=10, seed=1)
+            a = p.analytic([1.0] * devices)
+            m = p.simulate([1.0] * devices)
+            print("\t%7d %7d %8d %10.3f %10.3f  %8.1f%%" %
+                  (devices, pgs, pgs * 3 / devices, a, m, 100.0 / a))
+    print("")
+
+    # half of the devices are twice as big (and get twice the weight)
+    p = Placement(4096, replicas=3, trials=10, seed=1)
+    weights = [1.0] * 50 + [2.0] * 50
+    print("Mixed weights (50 x 1, 50 x 2), 4096 PGs: " +
+          "analytic %5.3f, monte carlo %5.3f" %
+          (p.analytic(weights), p.simulate(weights)))
+    print("")
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+    from Dlm import makeDLM
+    from Gateway import makeGateway
+
+    s = makeServer(makefs(makedisk({'device': 'disk'}), {}), {'disks': 12})
+    print("Gateway 1MB sequential writes (d=64) to 24 x 12 disk servers")
+    print("\t    PGs   derate   MB/s  server load")
+    for pgs in (0, 64, 256, 1024, 4096):
+        d = {'servers': 24, 'cores': 16, 'back': 100 * GIG,
+             'front': 100 * GIG, 'n': 4, 'm': 2}
+        if pgs > 0:
+            d['pgs'] = pgs
+        gw = makeGateway(s, makeDLM({}), d)
+        (t, bw, l) = gw.write(1 * MB, depth=64, seq=True)
+        print("\t%7s %7.1f%% %6.1f %12.3f" %
+              (pgs if pgs > 0 else "ideal",
+               100 * gw.placement.derate(24) if pgs > 0 else 100,
+               bw / MEG, l['server']))
+    print("")
+
+    print("Recommended PGs (3 replicas, power of two)")
+    print("\t devices    <= 1.2     <= 1.1    <= 1.05")
+    for devices in (12, 100, 1000):
+        p = Placement(replicas=3)
+        print("\t%7d %9d %10d %10d" %
+              (devices, p.recommend(devices, 1.2),
+               p.recommend(devices, 1.1), p.recommend(devices, 1.05)))
+    print("")
@@ -16,18 +16,26 @@ probabilities of Poisson-distributed events
 import math
 
 
+def log_pn(expect, n):
+    """ natural log of the probability of exactly N events
+        expect -- expected number of events
+        n -- number of desired events
+
+        NOTE: computed with log-gamma, so it neither overflows for
+              large N nor underflows for large expected counts
+    """
+    if expect <= 0:
+        return 0.0 if n == 0 else float('-inf')
+    return n * math.log(expect) - expect - math.lgamma(n + 1)
+
+
 def Pn(rate, interval, n=1):
     """ probability of exactly N events during an interval
         rate -- average event rate
         interval -- sample period of interest
         n -- number of desired events
     """
-    expect = float(rate) * interval
-    p = math.exp(-expect)
-    if n > 0:
-        p *= (expect ** n)
-        p /= math.factorial(n)
-    return p
+    return math.exp(log_pn(float(rate) * interval, n))
 
 
 def PnPlus(rate, interval, n=1):
@@ -36,9 +44,43 @@ def PnPlus(rate, interval, n=1):
         interval -- sample period of interest
         n -- number of desired events
     """
-    p = 1.0
-    i = 0
-    while i < n:
-        p -= Pn(rate, interval, i)
-        i += 1
-    return p
+    if n <= 0:
+        return 1.0
+    return max(0.0, 1.0 - cdf(rate, interval, [n - 1])[0])
+
+
+def pmf(rate, interval, ns):
+    """ probabilities of exactly N events, for each N in a list
+        rate -- average event rate
+        interval -- sample period of interest
+        ns -- list of numbers of events
+    """
+    expect = float(rate) * interval
+    return [math.exp(log_pn(expect, n)) for n in ns]
+
+
+def cdf(rate, interval, ns):
+    """ probabilities of N or fewer events, for each N in a list
+        rate -- average event rate
+        interval -- sample period of interest
+        ns -- list of numbers of events
+    """
+    expect = float(rate) * interval
+    if len(ns) == 0:
+        return []
+
+    # accumulate the terms once (each from the last, in log space)
+    top = max(ns)
+    sums = []
+    total = 0.0
+    if expect <= 0:
+        sums = [1.0] * (top + 1)
+    else:
+        log_e = math.log(expect)
+        log_p = -expect
+        for i in range(0, top + 1):
+            if i > 0:
+                log_p += log_e - math.log(i)
+            total += math.exp(log_p)
+            sums.append(min(1.0, total))
+    return [sums[n] if n >= 0 else 0.0 for n in ns]
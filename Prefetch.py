@@ -0,0 +1,157 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of read-ahead (prefetching) for sequential reads,
+usable by both a Server (reading ahead from its disks) and a Gateway
+(reading ahead from its Servers).
+
+ACTIVE INGREDIENTS IN MODEL:
+    window ....... we try to keep this many bytes of read-ahead in flight
+                   for each detected stream, so the next read was issued
+                   window/unit inter-request times ago, and the reader
+                   only waits max(0, service time - that lead time)
+    detection .... a stream must make this many sequential reads before
+                   we start prefetching for it, so the first reads of
+                   each sequential run still pay the full service time
+    streams ...... we can only track this many concurrent streams.
+                   Beyond that, streams evict one another and only a
+                   fraction of them are prefetched.
+    waste ........ each sequential run ends with a window's worth of
+                   prefetched data that is never read, and random reads
+                   occasionally look sequential and trigger a prefetch.
+                   Wasted reads consume disk and network bandwidth.
+"""
+
+from units import *
+
+
+class Prefetch:
+    """ Performance Modeling Read-Ahead Simulation. """
+
+    def __init__(self, window=1 * MB, streams=16, threshold=2,
+                 run=64 * MB):
+        """ create a read-ahead simulation
+            window -- bytes of read-ahead to keep in flight per stream
+            streams -- number of concurrent streams we can track
+            threshold -- sequential reads before a stream is detected
+            run -- average length (bytes) of a sequential run
+        """
+        self.window = window
+        self.streams = streams
+        self.threshold = threshold
+        self.run = run
+        self.desc = "%dKB read-ahead" % (window / KB)
+
+        # magic performance tuning constants
+        self.p_adjacent = 0.01  # FIX - P(random read follows the last)
+
+    def ahead(self, unit):
+        """ number of reads (of a given size) kept in flight per stream
+            unit -- bytes per read
+
+            (a window smaller than a read only prefetches part of it,
+            so it hides only that fraction of the next read)
+        """
+        return float(self.window) / unit
+
+    def coverage(self, unit, active=1):
+        """ fraction of sequential reads that are prefetched
+            unit -- bytes per read
+            active -- number of concurrent sequential streams
+        """
+        tracked = min(1.0, float(self.streams) / active)
+        detected = max(0.0, 1 - float(self.threshold * unit) / self.run)
+        return tracked * detected
+
+    def stall(self, service, inter, unit):
+        """ time a reader waits for a prefetched read
+            service -- (us) time to perform the read
+            inter -- (us) time between successive reads in the stream
+            unit -- bytes per read
+        """
+        return max(0, service - self.ahead(unit) * inter)
+
+    def time(self, service, inter, unit, active=1):
+        """ expected wait for a read in a sequential stream
+            service -- (us) time to perform the read
+            inter -- (us) time between successive reads in the stream
+            unit -- bytes per read
+            active -- number of concurrent sequential streams
+        """
+        c = self.coverage(unit, active)
+        return c * self.stall(service, inter, unit) + (1 - c) * service
+
+    def wasted(self, unit, seq):
+        """ extra bytes read (per byte used) for prefetches never used
+            unit -- bytes per read
+            seq -- sequential (vs random) reads
+        """
+        if seq:
+            # the read-ahead beyond the end of each run
+            return float(self.window) / self.run
+
+        # random reads that happen to look like the start of a stream
+        p = 1.0 if self.threshold <= 1 \
+            else self.p_adjacent ** (self.threshold - 1)
+        return p * float(self.window) / unit
+
+
+def makePrefetch(dict):
+    """ instantiate the read-ahead described by a configuration dict
+        dict -- of read-ahead parameters
+            ra_window -- bytes of read-ahead to keep in flight per stream
+            ra_streams -- number of concurrent streams we can track
+            ra_threshold -- sequential reads before a stream is detected
+            ra_run -- average length (bytes) of a sequential run
+    """
+
+    dflts = {
+        'ra_window': 1 * MB,
+        'ra_streams': 16,
+        'ra_threshold': 2,
+        'ra_run': 64 * MB,
+    }
+
+    window = dict['ra_window'] if 'ra_window' in dict else dflts['ra_window']
+    streams = dict['ra_streams'] if 'ra_streams' in dict \
+        else dflts['ra_streams']
+    threshold = dict['ra_threshold'] if 'ra_threshold' in dict \
+        else dflts['ra_threshold']
+    run = dict['ra_run'] if 'ra_run' in dict else dflts['ra_run']
+
+    return Prefetch(window, streams=streams, threshold=threshold, run=run)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+    from Dlm import makeDLM
+    from Gateway import makeGateway
+
+    # how big a window do sequential reads need
+    s = makeServer(makefs(makedisk({'device': 'disk'}), {}),
+                   {'disks': 4, 'nic': 40 * GIG})
+    dlm = makeDLM({})
+    print("Gateway sequential reads (d=1), 8 x %s" % (s.data_fs.disk.desc))
+    print("\twindow         16K MB/s   128K MB/s   random read waste")
+    for window in (0, 256 * KB, 1 * MB, 4 * MB, 16 * MB):
+        d = {'servers': 8, 'back': 40 * GIG, 'front': 40 * GIG}
+        if window > 0:
+            d['ra_window'] = window
+        gw = makeGateway(s, dlm, d)
+        gw.read_ahead = window > 0
+        (t1, b1, l1) = gw.read(16 * 1024, depth=1, seq=True)
+        (t2, b2, l2) = gw.read(128 * 1024, depth=1, seq=True)
+        waste = gw.prefetch.wasted(gw.width * gw.n, False) \
+            if window > 0 else 0
+        print("\t%5dK   %12.1f %11.1f   %17.1f%%" %
+              (window / KB, b1 / MEG, b2 / MEG, 100 * waste))
+    print("")
@@ -0,0 +1,192 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of an inline data reduction stage (compression
+and de-duplication) that a Server or Gateway can apply to the data
+it writes, trading CPU time for disk and network bytes.
+
+ACTIVE INGREDIENTS IN MODEL:
+    hashing ...... every chunk written is fingerprinted (SHA)
+    index ........ every fingerprint is looked up in a dedup index.
+                   The part of the index that does not fit in memory
+                   costs a (metadata) read for each lookup that misses.
+    dedup ........ only 1/dedup of the chunks are new, and need to
+                   be compressed and stored
+    compression .. unique chunks are compressed before they are
+                   stored, and decompressed whenever they are read
+"""
+
+import math
+from units import *
+
+
+class Reduction:
+    """ Performance Modeling Inline Data Reduction Simulation. """
+
+    def __init__(self, comp=1, dedup=1, chunk=4 * KB, index_mem=1 * GB):
+        """ create a data reduction simulation
+            comp -- expected compression ratio (1 = no compression)
+            dedup -- expected dedup ratio (1 = no de-duplication)
+            chunk -- bytes per dedup chunk
+            index_mem -- bytes of memory for the dedup index
+        """
+        self.comp = comp
+        self.dedup = dedup
+        self.chunk = chunk
+        self.index_mem = index_mem
+        self.desc = "reduction(%3.1fx comp, %3.1fx dedup)" % (comp, dedup)
+
+        # sizing performance parameters
+        self.entry = 48             # bytes per dedup index entry
+
+        # magic performance tuning constants
+        self.lookup_us = 1          # FIX - time (us) for an index lookup
+
+    def ratio(self):
+        """ overall data reduction ratio """
+        return float(self.comp) * self.dedup
+
+    def stored(self, bytes):
+        """ bytes actually stored (or sent) for a write """
+        return bytes / self.ratio()
+
+    def chunks(self, bytes):
+        """ number of dedup chunks in a write """
+        if self.dedup <= 1:
+            return 0
+        return int(math.ceil(float(bytes) / self.chunk))
+
+    def index_misses(self, bytes, capacity):
+        """ dedup index lookups (per write) that have to go to disk
+            bytes -- bytes per write
+            capacity -- (physical) bytes of stored data
+        """
+        if self.dedup <= 1:
+            return 0
+        entries = float(capacity) * self.comp / self.chunk
+        hit = min(1.0, self.index_mem / (entries * self.entry))
+        return self.chunks(bytes) * (1 - hit)
+
+    def write_cpu(self, cpu, bytes):
+        """ CPU time to reduce a write
+            cpu -- SimCPU doing the work
+            bytes -- bytes per write
+        """
+        t = 0
+        if self.dedup > 1:
+            t += cpu.sha_cpu(bytes)
+            t += self.chunks(bytes) * self.lookup_us
+        if self.comp > 1:
+            t += cpu.compress_cpu(bytes / self.dedup, self.comp)
+        return t
+
+    def write_time(self, cpu, bytes):
+        """ elapsed time to reduce a write
+            cpu -- SimCPU doing the work
+            bytes -- bytes per write
+        """
+        t = 0
+        if self.dedup > 1:
+            t += cpu.sha_time(bytes)
+            t += self.chunks(bytes) * self.lookup_us
+        if self.comp > 1:
+            t += cpu.compress_time(bytes / self.dedup, self.comp)
+        return t
+
+    def write_accel(self, cpu, bytes):
+        """ accelerator busy time to reduce a write (if offloaded)
+            cpu -- SimCPU doing the work
+            bytes -- bytes per write
+        """
+        t = 0
+        if self.dedup > 1 and cpu.offloaded('sha'):
+            t += cpu.accel.service(bytes)
+        if self.comp > 1 and cpu.offloaded('compress'):
+            t += cpu.accel.service(bytes / self.dedup)
+        return t
+
+    def read_cpu(self, cpu, bytes):
+        """ CPU time to re-expand a read
+            cpu -- SimCPU doing the work
+            bytes -- bytes per read
+        """
+        if self.comp <= 1:
+            return 0
+        return cpu.decompress_cpu(bytes, self.comp)
+
+    def read_time(self, cpu, bytes):
+        """ elapsed time to re-expand a read
+            cpu -- SimCPU doing the work
+            bytes -- bytes per read
+        """
+        if self.comp <= 1:
+            return 0
+        return cpu.decompress_time(bytes, self.comp)
+
+    def read_accel(self, cpu, bytes):
+        """ accelerator busy time to re-expand a read (if offloaded)
+            cpu -- SimCPU doing the work
+            bytes -- bytes per read
+        """
+        if self.comp <= 1 or not cpu.offloaded('decompress'):
+            return 0
+        return cpu.accel.service(bytes / self.comp)
+
+
+def makeReduction(dict):
+    """ instantiate the data reduction stage described by a configuration dict
+        dict -- of data reduction parameters
+            compress -- expected compression ratio
+            dedup -- expected dedup ratio
+            chunk -- bytes per dedup chunk
+            dedup_mem -- bytes of memory for the dedup index
+    """
+
+    dflts = {
+        'compress': 1,
+        'dedup': 1,
+        'chunk': 4 * KB,
+        'dedup_mem': 1 * GB,
+    }
+
+    comp = dict['compress'] if 'compress' in dict else dflts['compress']
+    dedup = dict['dedup'] if 'dedup' in dict else dflts['dedup']
+    chunk = dict['chunk'] if 'chunk' in dict else dflts['chunk']
+    mem = dict['dedup_mem'] if 'dedup_mem' in dict else dflts['dedup_mem']
+
+    return Reduction(comp, dedup, chunk=chunk, index_mem=mem)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+
+    # does reduction help or hurt, as a function of cores per disk
+    for dev in ('disk', 'ssd'):
+        fs = makefs(makedisk({'device': dev}), {})
+        print("Server 128K random I/O (d=32), 4 x %s" % (fs.disk.desc))
+        print("\tcores  reduction        write MB/s     read MB/s")
+        for cores in (1, 4, 16):
+            for (c, d) in ((1, 1), (2, 1), (2, 2)):
+                dict = {'disks': 4, 'cores': cores}
+                if c > 1:
+                    dict['compress'] = c
+                if d > 1:
+                    dict['dedup'] = d
+                s = makeServer(fs, dict)
+                (tw, bw, lw) = s.write(128 * 1024, depth=32)
+                (tr, br, lr) = s.read(128 * 1024, depth=32)
+                print("\t%5d  %3.1fx/%3.1fx   %9.1f %s  %9.1f %s" %
+                      (cores, c, d, bw / MEG,
+                       "(cpu)" if lw['cpu'] >= 0.99 else "     ",
+                       br / MEG,
+                       "(cpu)" if lr['cpu'] >= 0.99 else "     "))
+        print("")
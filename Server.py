@@ -47,7 +47,21 @@ class Server:
                  num_nics=1,
                  num_hbas=1,
                  num_cpus=1,
-                 writeback=32 * MB):
+                 writeback=32 * MB,
+                 reduce=None,
+                 threads=None,
+                 zero_copy=False,
+                 ocache=None,
+                 prefetch=None,
+                 arrival_scv=1.0,
+                 placement=None,
+                 background=None,
+                 replicas=1,
+                 quorum=False,
+                 read_any=False,
+                 back_nic=None,
+                 num_backs=1,
+                 gcommit=None):
         """ create an object server simulation
             data_fs -- SimFS for the data file system
             nic -- SimIFC for the network interface
@@ -57,6 +71,21 @@ class Server:
             num_nic -- number of NICs per server (for our use)
             num_cpus -- number of processors per server (for our use)
             writeback -- size of writeback buffer
+            reduce -- Reduction for inline compression/dedup (or None)
+            threads -- ThreadPools for the server threads (or None)
+            zero_copy -- use sendfile/splice rather than copying data
+            ocache -- ObjectCache for open object nodes (or None)
+            prefetch -- Prefetch read-ahead from the disks (or None)
+            arrival_scv -- burstiness (SCV) of request inter-arrival times
+            placement -- Placement of data over the disks (or None)
+            background -- Background work sharing the disks (or None)
+            replicas -- number of copies of each object (on r servers)
+            quorum -- ack after a majority (rather than all) commit
+            read_any -- reads may be served by any replica
+            back_nic -- SimIFC for the back-side (cluster) network
+                        (default: share the client network)
+            num_backs -- number of back-side NICs per server
+            gcommit -- GroupCommit for commit journaling (or None)
         """
         self.data_fs = data_fs
         self.nic = nic
@@ -67,6 +96,19 @@ class Server:
         self.num_hbas = num_hbas
         self.num_cpus = num_cpus
         self.write_buf = writeback
+        self.reduce = reduce
+        self.threads = threads
+        self.ocache = ocache
+        self.prefetch = prefetch
+        self.arrival_scv = arrival_scv
+        self.placement = placement
+        self.background = background
+        self.replicas = replicas
+        self.quorum = quorum
+        self.read_any = read_any
+        self.back = nic if back_nic is None else back_nic
+        self.num_backs = num_nics if back_nic is None else num_backs
+        self.gcommit = gcommit
 
         # sizing performance parameters
         self.min_msg = 128                  # minimum request/response
@@ -79,6 +121,13 @@ class Server:
         self.r_mem_x = 0.5  # scaling factor for read memory fetches
         self.w_mem_x = 1.0  # scaling factor for write memory fetches
         self.commit_us = 1  # time (us) to handle a commit FIX bogus
+        self.splice_us = 2  # time (us) to set up a splice FIX bogus
+
+        # zero-copy moves data between the NIC and page cache w/o copying
+        self.zero_copy = zero_copy
+        if zero_copy:
+            self.r_mem_x = 0
+            self.w_mem_x = 0
 
     def warn(self, msg):
         """ add a warning to our accumulated warnings list """
@@ -87,7 +136,107 @@ class Server:
         if (self.warnings.find(msg) < 0):
             self.warnings += msg
 
-    def read(self, bsize, depth=1, seq=False):
+    def obj_miss(self):
+        """ fraction of random operations that must open their object """
+        if self.ocache is None:
+            return 1.0
+        capacity = self.num_disks * self.data_fs.size
+        return 1 - self.ocache.hit_ratio(self.ocache.objects(capacity))
+
+    def interference(self):
+        """ disk, HBA and NIC capacity consumed by background work
+
+            returns (fraction of disk time, HBA bytes/sec, NIC bytes/sec,
+                     (us) expected wait behind a background I/O)
+        """
+        if self.background is None:
+            return (0, 0, 0, 0)
+        return self.background.interference(self.data_fs, self.num_disks)
+
+    def handoffs(self, stages, avail_cores, depth):
+        """ CPU time for hand-offs between thread pools
+            stages -- number of hand-offs per operation
+            avail_cores -- number of available cores
+            depth -- number of parallel requests
+        """
+        if self.threads is None:
+            return 0
+        t = stages * self.threads.handoff_cpu(self.cpu)
+        t += self.threads.switch_cpu(self.cpu, avail_cores, depth, stages)
+        return t
+
+    def pool_delay(self, holds, iops, depth, latency, descr, load):
+        """ thread pool queueing delay (and load on each pool)
+            holds -- map from stage name to (us) per-op holding time
+            iops -- operations per second
+            depth -- number of parallel requests
+            latency -- operation latency (for warnings)
+            descr -- description of the operation (for warnings)
+            load -- load dict to be updated
+        """
+        if self.threads is None:
+            return 0
+        (delay, loads) = self.threads.delay(holds, iops, depth,
+                                              self.num_disks)
+        for name in loads:
+            load[name + '_threads'] = loads[name]
+            if loads[name] >= 0.99:
+                self.warn("Server %s threads saturated for %s\n" %
+                          (name, descr))
+        delta = 100 * float(delay) / latency
+        if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+            self.warn("Server thread pools add %dus (%d%%) to %s\n" %
+                      (delay, delta, descr))
+        return delay
+
+    def accel_delay(self, t_acc, iops, depth, latency, descr, load):
+        """ offload accelerator queueing delay (and accelerator load)
+            t_acc -- accelerator busy time per operation
+            iops -- operations per second
+            depth -- number of parallel requests
+            latency -- operation latency (for warnings)
+            descr -- description of the operation (for warnings)
+            load -- load dict to be updated
+        """
+        if t_acc <= 0:
+            return 0
+        acc_load = t_acc * iops / float(SECOND)
+        if (acc_load >= 0.99):
+            self.warn("Server accelerator saturated by %dus x %d IOPS "
+                      "for %s\n" % (t_acc, iops, descr))
+        delay = t_acc * self.cpu.accel.queue_length(acc_load, depth,
+                                                    self.arrival_scv)
+        delta = 100 * float(delay) / latency
+        if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+            self.warn("Server accel load (%4.2f) adds %dus (%d%%) to %s\n" %
+                      (acc_load, delay, delta, descr))
+        load['accel'] = acc_load
+        return delay
+
+    def mem_delay(self, mem_bytes, iops, depth, latency, descr, load):
+        """ memory bandwidth queueing delay (and memory load)
+            mem_bytes -- bytes of memory traffic (copies and DMA) per op
+            iops -- operations per second
+            depth -- number of parallel requests
+            latency -- operation latency (for warnings)
+            descr -- description of the operation (for warnings)
+            load -- load dict to be updated
+        """
+        t_mem = self.cpu.mem_busy(mem_bytes) / self.num_cpus
+        mem_load = t_mem * iops / float(SECOND)
+        if (mem_load >= 0.99):
+            self.warn("Server memory saturated by %dus x %d IOPS for %s\n" %
+                      (t_mem, iops, descr))
+        delay = t_mem * self.cpu.queue_length(mem_load, depth,
+                                              self.arrival_scv)
+        delta = 100 * float(delay) / latency
+        if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+            self.warn("Server memory load (%4.2f) adds %dus (%d%%) to %s\n" %
+                      (mem_load, delay, delta, descr))
+        load['mem'] = mem_load
+        return delay
+
+    def read(self, bsize, depth=1, seq=False, streams=1):
         """ expected read performance
             bsize -- size of each request
             depth -- number of parallel requests
@@ -96,9 +245,12 @@ class Server:
                     or random (distributed over many objects). The
                     RAID striping across relatively small objects
                     makes random within an object less important.
+            streams -- number of (sequential) objects per disk, whose
+                    requests are interleaved on that disk
 
             NOTE: it is assumed that these requests are spread across
-                  all of the available disks
+                  all of the available disks (but if we have a placement
+                  model, the busiest disk gets more than its share)
 
             NOTE: we try to simulate what the server would do, even
                   for requests that its clients do not currently generate.
@@ -118,10 +270,22 @@ class Server:
         bw_n = self.num_nics * bsize * SECOND / t_net_w
 
         # CPU time to process the received packet and response
-        cpu_msg = self.nic.read_cpu(self.min_msg)
+        cpu_net = self.nic.read_cpu(self.min_msg)
+        cpu_net += self.nic.write_cpu(self.min_msg + bsize)
+        cpu_msg = cpu_net
         cpu_msg += self.r_cpu_x * self.cpu.process(bsize)
         cpu_msg += self.r_mem_x * self.cpu.mem_read(bsize)
-        cpu_msg += self.nic.write_cpu(self.min_msg + bsize)
+        if self.zero_copy:
+            cpu_msg += self.splice_us
+
+        # stored data must be decompressed before we can return it
+        t_red = 0
+        t_acc = 0
+        if self.reduce is not None:
+            cpu_red = self.reduce.read_cpu(self.cpu, bsize)
+            t_red = self.reduce.read_time(self.cpu, bsize) - cpu_red
+            t_acc = self.reduce.read_accel(self.cpu, bsize)
+            cpu_msg += cpu_red
 
         # figure out the cost of finding the object we read from
         (t_open, bw, l) = self.data_fs.open()
@@ -132,8 +296,10 @@ class Server:
                 t_open /= blk_per_read
                 cpu_open /= blk_per_read
             else:
-                obj_reuse = 1   # FIX estimate random I/O object reuse
-                t_open /= obj_reuse
+                # we only open objects that are not already cached
+                miss = self.obj_miss()
+                t_open *= miss
+                cpu_open *= miss
 
         # figure out what I/O we are actually going to do
         w = self.data_width     # the fundamental unit of file I/O
@@ -148,7 +314,9 @@ class Server:
                 # split this request over multiple reads
                 d = depth * bsize / w
                 req_per_read = float(w) / bsize
-            (t_fr, bw, l) = self.data_fs.read(w, sz, seq=s, depth=d)
+            if self.prefetch is not None:
+                # keep the read-ahead window in flight too
+                d += self.prefetch.ahead(w)
         else:
             # figure out how many requests are for each disk
             disks = min(depth, self.num_disks)
@@ -160,31 +328,105 @@ class Server:
                 req_per_read = float(w) / bsize
                 d *= bsize / w
 
+        # compressed strips take less of the disk to read
+        r_sz = w
+        if self.reduce is not None and self.reduce.comp > 1:
+            if s:
+                # each sequential strip read returns more data
+                req_per_read *= self.reduce.comp
+            else:
+                # a random read only fetches the compressed strip
+                r_sz = int(w / self.reduce.comp)
+
         # figure out how long it will take to do that I/O
-        (t_fr, bw, l) = self.data_fs.read(w, sz, seq=s, depth=d)
+        (t_fr, bw, l) = self.data_fs.read(r_sz, sz, seq=s, depth=d,
+                                          streams=streams if seq else 1)
         t_fr /= req_per_read
         cpu_fs = l['cpu'] * SECOND / req_per_read
         t_dsk = t_open + t_fr
         bw_fs = SECOND * bsize * self.num_disks / t_dsk
+        if self.placement is not None:
+            # the busiest disk limits the server (and if we replicate,
+            #   reads from any replica spread over every copy)
+            pgs = self.placement.pgs
+            if self.read_any:
+                pgs *= self.replicas
+            bw_fs /= self.placement.imbalance(self.num_disks, pgs=pgs)
+
+        # background work takes disk time, and HBA and NIC bandwidth
+        (f_bg, hba_bg, net_bg, t_bg) = self.interference()
+        bw_fs *= 1 - f_bg
+        bw_n *= 1 - net_bg / float(self.num_nics * self.nic.max_write_bw)
+
+        # read-ahead overlaps disk reads with message processing, but
+        #   reads that are never used still cost disk bandwidth
+        if self.prefetch is not None:
+            if seq:
+                inter = req_per_read * (cpu_msg + t_net_w) / depth
+                t_fr = self.prefetch.time(t_fr * req_per_read, inter, w,
+                                          self.num_disks) / req_per_read
+            bw_fs /= 1 + self.prefetch.wasted(w, seq)
 
         # now that we have all the CPU costs, add up the utilization
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'read', depth)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'read')
         tot_cpu = cpu_msg + cpu_fs + cpu_open
+
+        # memory traffic: disk DMA in, copies, request/response DMA
+        mem_bytes = float(r_sz) / req_per_read
+        mem_bytes += 2 * self.r_mem_x * bsize
+        mem_bytes += 2 * self.min_msg + bsize
+        if self.reduce is not None and self.reduce.comp > 1:
+            mem_bytes += bsize / self.reduce.comp + bsize
+        bw_mem = bsize * self.num_cpus * self.cpu.mem_bw / mem_bytes
+
+        # messenger -> worker -> disk thread -> messenger
+        t_hand = self.handoffs(3, avail_cores, depth)
+        tot_cpu += t_hand
         bw_cpu = avail_cores * bsize * SECOND / tot_cpu
+        holds = {'msgr': cpu_net, 'worker': tot_cpu - cpu_net,
+                 'disk': t_dsk}
+        bw_thr = float('inf')
+        if self.threads is not None:
+            bw_thr = bsize * self.threads.capacity(holds, self.num_disks)
 
         # the HBA could become a throughput bottleneck
-        bw_hba = self.num_hbas * self.hba.max_read_bw
+        bw_hba = self.num_hbas * self.hba.max_read_bw - hba_bg
+
+        # so could an offload accelerator
+        bw_acc = float('inf')
+        if t_acc > 0:
+            bw_acc = bsize * SECOND / t_acc
 
         # compute the request latency and throughputs
         #   (we don't count t_net_r because the client pays for that)
-        latency = cpu_msg + t_open + t_fr + t_net_w
+        #   (CPU time is inflated by contention with the other cores)
+        latency = (cpu_msg + t_hand) * x_cpu + t_red + t_open + t_fr + \
+            t_net_w
         bw_base = depth * bsize * SECOND / latency
-        bandwidth = min(bw_base, bw_n, bw_fs, bw_cpu, bw_hba)
+        bandwidth = min(bw_base, bw_n, bw_fs, bw_cpu, bw_hba, bw_thr,
+                        bw_mem, bw_acc)
         iops = bandwidth / bsize
-        q_delay = 0
+        q_delay = self.pool_delay(holds, iops, depth, latency,
+                                  descr, load)
+        q_delay += self.accel_delay(t_acc, iops, depth, latency,
+                                    descr, load)
+        q_delay += self.mem_delay(mem_bytes, iops, depth, latency,
+                                  descr, load)
         load['fs'] = bandwidth / bw_fs
         load['hba'] = bandwidth / bw_hba
 
+        # see what this means for waiting behind background disk I/O
+        if self.background is not None:
+            delay = t_bg / req_per_read
+            q_delay += delay
+            delta = 100 * float(delay) / latency
+            if (delay >= WARN_DELAY and delta >= WARN_DELTA):
+                self.warn("Server background work (%4.2f) adds %dus " %
+                          (f_bg, delay) + "(%d%%) to %s\n" % (delta, descr))
+            load['bg'] = f_bg
+
         # did we run out of HBA
         if (bw_hba < bw_base):
             self.warn("Server HBA caps throughput at %dMB/s for %s\n" %
@@ -195,7 +437,8 @@ class Server:
         if (bw_n < bw_base):
             self.warn("Server NIC saturated by %dus x %d IOPS for %s\n" %
                       (t_net_w, iops, descr))
-        delay = t_net_w * self.nic.queue_length(nic_load, depth)
+        delay = t_net_w * self.nic.queue_length(nic_load, depth,
+                                                self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -208,7 +451,8 @@ class Server:
         if (bw_cpu < bw_base):
             self.warn("Server CPUs saturated by %dus x %d IOPS for %s\n" %
                       (tot_cpu, iops, descr))
-        delay = tot_cpu * self.cpu.queue_length(core_load, depth)
+        delay = tot_cpu * self.cpu.queue_length(core_load, depth,
+                                                self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -216,9 +460,15 @@ class Server:
                       (core_load, delay, delta, descr))
         load['cpu'] = core_load
 
-        return (latency + q_delay, bandwidth, load)
+        # once something saturates, the (closed loop) requests queue
+        #   behind it, so adding up the delays at every resource would
+        #   count them more than once: Little's law bounds the latency
+        latency += q_delay
+        if bandwidth < bw_base:
+            latency = min(latency, depth * bsize * SECOND / bandwidth)
+        return (latency, bandwidth, load)
 
-    def write(self, bsize, depth=1, seq=False):
+    def write(self, bsize, depth=1, seq=False, local=False, streams=1):
         """ expected write performance
             bsize -- size of each request
             depth -- number of parallel requests (multiple objects)
@@ -226,6 +476,9 @@ class Server:
                     or random (distributed over many objects). The
                     RAID striping across relatively small objects
                     makes random within an object less important.
+            local -- only our own copy (even if we have replicas)
+            streams -- number of (sequential) objects per disk, whose
+                    writes are interleaved on that disk
 
             NOTE: we try to simulate what the server would do, even
                   for requests that its clients do not currently generate.
@@ -233,6 +486,9 @@ class Server:
                   and simulate results for a wider range of benchmarks.
         """
 
+        if self.replicas > 1 and not local:
+            return self.replicate(bsize, depth, seq, streams)
+
         load = {}
 
         descr = "%dK, d=%d %s writes" % \
@@ -251,6 +507,21 @@ class Server:
         t_cpu = self.w_cpu_x * self.cpu.process(bsize)
         t_cpu += self.w_mem_x * self.cpu.mem_write(bsize)
         t_rsp = self.nic.write_cpu(self.min_msg)
+        if self.zero_copy:
+            t_cpu += self.splice_us
+
+        # inline reduction (fingerprint, dedup lookup, compress)
+        stored = bsize
+        t_red = 0
+        t_index = 0
+        if self.reduce is not None:
+            cpu_red = self.reduce.write_cpu(self.cpu, bsize)
+            t_red = self.reduce.write_time(self.cpu, bsize) - cpu_red
+            t_cpu += cpu_red
+            stored = self.reduce.stored(bsize)
+            capacity = self.num_disks * self.data_fs.size
+            misses = self.reduce.index_misses(bsize, capacity)
+            t_index = misses * self.data_fs.md_read_time()
 
         # figure out the cost of open/creating the object we write to
         # HELP ... work out the stat/open/create scenarios
@@ -262,38 +533,88 @@ class Server:
                 t_crt /= blk_per_write
                 cpu_crt /= blk_per_write
             else:
-                obj_reuse = 1   # FIX estimate random I/O object reuse
-                t_crt /= obj_reuse
+                # we only create/open objects that are not already cached
+                miss = self.obj_miss()
+                t_crt *= miss
+                cpu_crt *= miss
 
         # figure out how long it will take to flush the NVRAM to disk
         w = self.data_width
         d = self.write_buf / (w * self.num_disks)
         sz = self.data_fs.size  # FIX ... is this right?
-        (t_fw, bw, l) = self.data_fs.write(w, sz, seq=seq, sync=False, depth=d)
-        t_fw = (t_fw * bsize) / w
-        t_disk = t_crt + t_fw
+        (t_fw, bw, l) = self.data_fs.write(w, sz, seq=seq, sync=False, depth=d,
+                                           streams=streams)
+        t_fw = (t_fw * stored) / w
+        t_disk = t_crt + t_fw + t_index
         t_async = l['cpu'] * SECOND
         bw_fs = SECOND * bsize * self.num_disks / t_disk
+        if self.placement is not None:
+            # the busiest disk limits the server (and if we replicate,
+            #   every copy is written)
+            pgs = self.placement.pgs * self.replicas
+            bw_fs /= self.placement.imbalance(self.num_disks, pgs=pgs)
+
+        # background work takes disk time, and HBA and NIC bandwidth
+        #   (but writes only wait for it if they fill the buffer)
+        (f_bg, hba_bg, net_bg, t_bg) = self.interference()
+        bw_fs *= 1 - f_bg
+        bw_n *= 1 - net_bg / float(self.num_nics * self.nic.max_read_bw)
 
         # the HBA could become a throughput bottleneck
-        bw_hba = self.num_hbas * self.hba.max_read_bw
+        bw_hba = self.num_hbas * self.hba.max_read_bw - hba_bg
+
+        # memory traffic: request/response DMA, copies, reduction,
+        #   and disk DMA out when the write-back buffer is flushed
+        mem_bytes = 2 * self.min_msg + bsize
+        mem_bytes += 2 * self.w_mem_x * bsize
+        if self.reduce is not None:
+            mem_bytes += bsize + stored
+        mem_bytes += stored
+        bw_mem = bsize * self.num_cpus * self.cpu.mem_bw / mem_bytes
 
         # compute the overall CPU load
-        t_sync = t_dsp + t_rsp + t_cpu
+        #   (messenger -> worker -> messenger, worker -> disk thread)
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'write', depth)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'write')
+        t_hand = self.handoffs(3, avail_cores, depth)
+        t_sync = t_dsp + t_rsp + t_cpu + t_hand
         cpu_per_op = t_sync + t_async + cpu_crt
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
         bw_cpu = avail_cores * SECOND * bsize / cpu_per_op
+        holds = {'msgr': t_dsp + t_rsp,
+                 'worker': cpu_per_op - (t_dsp + t_rsp),
+                 'disk': t_disk}
+        bw_thr = float('inf')
+        if self.threads is not None:
+            bw_thr = bsize * self.threads.capacity(holds, self.num_disks)
+
+        # as could an offload accelerator
+        t_acc = 0
+        bw_acc = float('inf')
+        if self.reduce is not None:
+            t_acc = self.reduce.write_accel(self.cpu, bsize)
+        if t_acc > 0:
+            bw_acc = bsize * SECOND / t_acc
 
         # compute the request latency and throughputs
         #   (we don't count t_net_r because the caller pays for that)
-        latency = t_net_w + t_sync
+        #   (CPU time is inflated by contention with the other cores)
+        latency = t_net_w + t_sync * x_cpu + t_red + t_index
         bw_base = depth * bsize * SECOND / latency
-        bandwidth = min(bw_base, bw_n, bw_fs, bw_cpu, bw_hba)
+        bandwidth = min(bw_base, bw_n, bw_fs, bw_cpu, bw_hba, bw_thr,
+                        bw_mem, bw_acc)
         iops = bandwidth / bsize
-        q_delay = 0
+        q_delay = self.pool_delay(holds, iops, depth, latency,
+                                  descr, load)
+        q_delay += self.accel_delay(t_acc, iops, depth, latency,
+                                    descr, load)
+        q_delay += self.mem_delay(mem_bytes, iops, depth, latency,
+                                  descr, load)
 
         load['fs'] = bandwidth / bw_fs
         load['hba'] = bandwidth / bw_hba
+        if self.background is not None:
+            load['bg'] = f_bg
 
         # did we run out of HBA
         if (bw_hba < bw_base):
@@ -305,7 +626,8 @@ class Server:
             self.warn("Server NIC saturated by %dus x %d IOPS for %s\n" %
                       (t_net_r, iops, descr))
         nic_load = t_net_w * iops / float(self.num_nics * SECOND)
-        delay = t_net_w * self.nic.queue_length(nic_load, depth)
+        delay = t_net_w * self.nic.queue_length(nic_load, depth,
+                                                self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -318,7 +640,8 @@ class Server:
             self.warn("Server CPUs saturated by %dus x %d IOPS for %s\n" %
                       (cpu_per_op, iops, descr))
         core_load = cpu_per_op * iops / float(avail_cores * SECOND)
-        delay = cpu_per_op * self.cpu.queue_length(core_load, depth)
+        delay = cpu_per_op * self.cpu.queue_length(core_load, depth,
+                                                   self.arrival_scv)
         q_delay += delay
         delta = 100 * float(delay) / latency
         if (delay >= WARN_DELAY and delta >= WARN_DELTA):
@@ -326,10 +649,176 @@ class Server:
                       (core_load, delay, delta, descr))
         load['cpu'] = core_load
 
-        return (latency + q_delay, bandwidth, load)
+        # once something saturates, the (closed loop) requests queue
+        #   behind it, so adding up the delays at every resource would
+        #   count them more than once: Little's law bounds the latency
+        latency += q_delay
+        if bandwidth < bw_base:
+            latency = min(latency, depth * bsize * SECOND / bandwidth)
+        return (latency, bandwidth, load)
+
+    def replicate(self, bsize, depth=1, seq=False, streams=1):
+        """ expected primary-copy replicated write performance
+            bsize -- size of each request
+            depth -- number of parallel requests (multiple objects)
+            seq -- is the I/O sequential (within a single object)
+            streams -- number of (sequential) objects per disk
+
+            NOTE: the primary forwards each write to the other replicas
+                  over the back-side network, and acks after all (or a
+                  quorum) of the copies have committed.  Every server is
+                  the primary for some objects and a replica for others,
+                  so each server does a local write for every copy.
 
-    def commit(self):
+            NOTE: commit times are (like the service times in the
+                  rest of our queues) exponentially distributed, so we
+                  wait for the k'th of r exponentials
+        """
+        descr = "%dK, d=%d %s replicated writes" % \
+            (bsize / 1024, depth, "seqential" if seq else "random")
+        r = self.replicas
+        small = self.min_msg
+        large = self.min_msg + bsize
+
+        # each server sees the local writes (and streams) for every copy
+        (t_loc, bw_loc, l_loc) = self.write(bsize, depth * r, seq, True,
+                                            streams * r)
+        iops_loc = bw_loc / bsize
+
+        # forward the data to the other replicas, and collect their acks
+        t_fwd = self.back.min_write_latency + self.back.write_time(large)
+        t_ack = self.back.min_write_latency + self.back.write_time(small)
+        cpu_pri = (r - 1) * (self.back.write_cpu(large) +
+                             self.back.read_cpu(small))
+        cpu_rep = (r - 1) * (self.back.read_cpu(large) +
+                             self.back.write_cpu(small))
+
+        # per client write, each server does r local writes
+        #   (background work takes the same fraction of the disks
+        #   regardless of our write rate)
+        per_op = {}
+        for k in l_loc:
+            if k != 'bg':
+                per_op[k] = l_loc[k] * r / iops_loc
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'write', depth * r)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus,
+                                                       depth * r), 'write')
+        per_op['cpu'] += (cpu_pri + cpu_rep) / float(avail_cores * SECOND)
+        if self.back is self.nic:
+            # (the replica acks are already in their local NIC load)
+            per_op['net'] += (r - 1) * t_fwd / \
+                float(self.num_nics * SECOND)
+        else:
+            # the client network only carries our own acks
+            per_op['net'] = l_loc['net'] / iops_loc
+            per_op['back'] = (r - 1) * (t_fwd + t_ack) / \
+                float(self.num_backs * SECOND)
+
+        # we ack after the k'th of r (parallel) commits
+        k = int(r / 2) + 1 if self.quorum else r
+        wait = 0.0
+        for i in range(r - k + 1, r + 1):
+            wait += 1.0 / i
+        latency = cpu_pri * x_cpu + t_fwd + t_ack + t_loc * wait
+
+        # and assemble the results for reporting
+        busiest = max(per_op.values())
+        bw_base = depth * bsize * SECOND / latency
+        bandwidth = min(bw_base, bsize / busiest)
+        if 'back' in per_op and bsize / per_op['back'] < bw_base:
+            self.warn("Server back network caps throughput at " +
+                      "%dMB/s for %s\n" % (bsize / per_op['back'] / MEG,
+                                           descr))
+        load = {}
+        for k in per_op:
+            load[k] = per_op[k] * bandwidth / bsize
+        if 'bg' in l_loc:
+            load['bg'] = l_loc['bg']
+        return (latency, bandwidth, load)
+
+    def drain_bw(self, bsize, seq=False):
+        """ rate (client bytes/sec) at which the writeback buffer drains
+            bsize -- size of each write
+            seq -- is the I/O sequential (within a single object)
+        """
+        (t, bw, l) = self.write(bsize, depth=1, seq=seq)
+        return bw / l['fs']
+
+    def fill_time(self, bsize, rate, seq=False):
+        """ (us) time for a write burst to fill the writeback buffer
+            bsize -- size of each write
+            rate -- writes per second during the burst
+            seq -- is the I/O sequential (within a single object)
+        """
+        excess = rate * bsize - self.drain_bw(bsize, seq)
+        if excess <= 0:
+            return float('inf')
+        return self.write_buf * SECOND / excess
+
+    def max_burst(self, bsize, rate, seq=False):
+        """ longest burst the writeback buffer can absorb
+            bsize -- size of each write
+            rate -- writes per second during the burst
+            seq -- is the I/O sequential (within a single object)
+
+            returns (duration, bytes)
+        """
+        t = self.fill_time(bsize, rate, seq)
+        return (t, rate * bsize * t / SECOND)
+
+    def buffer_for(self, bsize, rate, duration, seq=False):
+        """ bytes of writeback buffer needed to absorb a burst
+            bsize -- size of each write
+            rate -- writes per second during the burst
+            duration -- (us) length of the burst
+            seq -- is the I/O sequential (within a single object)
+        """
+        excess = rate * bsize - self.drain_bw(bsize, seq)
+        return max(0, excess * duration / SECOND)
+
+    def burst(self, bsize, rate, duration, seq=False, interval=None):
+        """ buffer fill and write latency over the course of a burst
+            bsize -- size of each write
+            rate -- writes per second during the burst
+            duration -- (us) length of the burst
+            seq -- is the I/O sequential (within a single object)
+            interval -- (us) length of each reporting interval
+
+            returns list of (time, buffered bytes, latency) per interval
+
+            NOTE: we assume that the network and CPUs can accept the
+                  burst, and only the flushing to disk falls behind.
+                  Writes that do not fit in the buffer wait (in order)
+                  until enough has been flushed to make room for them.
+        """
+        if interval is None:
+            interval = duration / 20
+        (t_base, bw, l) = self.write(bsize, depth=1, seq=seq)
+        drain = self.drain_bw(bsize, seq)
+        fill = 0.0      # bytes in the writeback buffer
+        backlog = 0.0   # bytes waiting for buffer space
+        results = []
+        t = 0
+        while t < duration or fill > 0:
+            # fluid model of arrivals and flushes in this interval
+            if t < duration:
+                fill += rate * bsize * float(interval) / SECOND
+            fill += backlog
+            fill = max(0.0, fill - drain * float(interval) / SECOND)
+            backlog = max(0.0, fill - self.write_buf)
+            fill -= backlog
+
+            # once the buffer is full, writes wait for flushes
+            latency = t_base
+            if fill >= self.write_buf:
+                latency += (backlog + bsize) * SECOND / drain
+            t += interval
+            results.append((t, fill, latency))
+        return results
+
+    def commit(self, depth=1):
         """ expected commit performance
+            depth -- number of concurrent commits
         """
 
         # basic wire times for message receipt, dispatch and response
@@ -343,19 +832,31 @@ class Server:
         t_dsp = self.nic.read_cpu(self.min_msg)
         t_cpu = self.commit_us
         t_rsp = self.nic.write_cpu(self.min_msg)
+        cpu_per_op = t_dsp + t_cpu + t_rsp
+
+        # concurrent commits share journal flushes
+        t_jrnl = 0
+        bw_j = float('inf')
+        if self.gcommit is not None:
+            (t_jrnl, bw_j, batch) = \
+                self.gcommit.commit(depth, cpu_per_op + t_net_w)
 
         # and assemble the results for reporting
         load = {}
-        cpu_per_op = t_dsp + t_cpu + t_rsp
-        latency = cpu_per_op + t_net_w
-        iops = SECOND / latency
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'meta', depth)
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'meta')
+        latency = cpu_per_op * x_cpu + t_net_w + t_jrnl
+        bw_cpu = avail_cores * SECOND / cpu_per_op
+        iops = min(depth * SECOND / latency, bw_n, bw_cpu, bw_j)
         core_load = cpu_per_op * iops / float(avail_cores * SECOND)
         load['cpu'] = core_load
         nic_load = t_net_w * iops / float(self.num_nics * SECOND)
         load['net'] = nic_load
+        if self.gcommit is not None:
+            load['journal'] = iops / bw_j
 
-        return(latency, bw, load)
+        return(latency, iops, load)
 
     def getattr(self, cached=0, depth=1):
         """ expected time for getattrs
@@ -382,9 +883,11 @@ class Server:
         # and assemble the results for reporting
         load = {}
         cpu_per_op = t_dsp + cpu_fsg + t_rsp
-        latency = t_dsp + t_fsg + t_rsp + t_net_w
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'meta')
+        latency = (t_dsp + t_rsp) * x_cpu + t_fsg + t_net_w
         iops = SECOND / latency
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'meta', depth)
         core_load = cpu_per_op * iops / float(avail_cores * SECOND)
         load['cpu'] = core_load
         nic_load = t_net_w * iops / float(self.num_nics * SECOND)
@@ -422,9 +925,11 @@ class Server:
         # and assemble the results for reporting
         load = {}
         cpu_per_op = t_dsp + cpu_fsg + cpu_fss + t_rsp
-        latency = t_dsp + t_fsg + t_fss + t_rsp + t_net_w
+        x_cpu = self.cpu.inflation(self.cpu.busy_cores(self.num_cpus, depth),
+                                   'meta')
+        latency = (t_dsp + t_rsp) * x_cpu + t_fsg + t_fss + t_net_w
         iops = SECOND / latency
-        avail_cores = self.num_cpus * self.cpu.cores * self.cpu.hyperthread
+        avail_cores = self.cpu.avail_cores(self.num_cpus, 'meta', depth)
         core_load = cpu_per_op * iops / float(avail_cores * SECOND)
         nic_load = t_net_w * iops / float(self.num_nics * SECOND)
         load['cpu'] = core_load
@@ -450,6 +955,12 @@ def makeServer(fs, dict):
         'nic':  10 * GIG,
         'hbas': 1,
         'hba': 8 * GIG,
+        'zero_copy': False,
+        'arrival_scv': 1.0,
+        'replicas': 1,
+        'quorum': False,
+        'read_any': False,
+        'backs': 1,
     }
 
     # collect the parameters
@@ -462,15 +973,73 @@ def makeServer(fs, dict):
     nic_bw = dict['nic'] if 'nic' in dict else dflts['nic']
     hbas = dict['hbas'] if 'hbas' in dict else dflts['hbas']
     hba_bw = dict['hba'] if 'hba' in dict else dflts['hba']
+    zero_copy = dict['zero_copy'] if 'zero_copy' in dict \
+        else dflts['zero_copy']
+    scv = dict['arrival_scv'] if 'arrival_scv' in dict \
+        else dflts['arrival_scv']
+    replicas = dict['replicas'] if 'replicas' in dict \
+        else dflts['replicas']
+    quorum = dict['quorum'] if 'quorum' in dict else dflts['quorum']
+    read_any = dict['read_any'] if 'read_any' in dict \
+        else dflts['read_any']
+    backs = dict['backs'] if 'backs' in dict else dflts['backs']
 
     myScpu = SimCPU.makeCPU(dict)
     mySnic = SimIFC.NIC("eth", processor=myScpu, bw=nic_bw)
     myShba = SimIFC.HBA("HBA", processor=myScpu, bw=hba_bw)
+    myBack = None
+    if 'back' in dict:
+        myBack = SimIFC.NIC("eth", processor=myScpu, bw=dict['back'])
+
+    reduce = None
+    if 'compress' in dict or 'dedup' in dict:
+        import Reduction
+        reduce = Reduction.makeReduction(dict)
+    threads = None
+    if 'msgr_threads' in dict or 'op_threads' in dict or \
+            'disk_threads' in dict:
+        import Threads
+        threads = Threads.makeThreadPools(dict)
+
+    import ObjCache
+    ocache = ObjCache.makeObjectCache(dict, cpus * myScpu.mem_size)
+    prefetch = None
+    if 'ra_window' in dict or 'ra_streams' in dict or \
+            'ra_threshold' in dict:
+        import Prefetch
+        prefetch = Prefetch.makePrefetch(dict)
+    background = None
+    if 'scrub_bw' in dict or 'recovery_bw' in dict or \
+            'backfill_bw' in dict or 'compaction_bw' in dict:
+        import Background
+        background = Background.makeBackground(dict)
+    import GroupCommit
+    if 'journal' in dict:
+        # a (shared) separate journal device
+        import SimDisk
+        jrnl = SimDisk.makedisk({'device': dict['journal']})
+        gcommit = GroupCommit.makeGroupCommit(dict, jrnl)
+    else:
+        # each data disk journals its own commits
+        gcommit = GroupCommit.makeGroupCommit(dict, fs.disk, devices=disks)
+    placement = None
+    if 'pgs' in dict:
+        # placement groups with their primaries on this server (each on
+        #   one of its disks), plus the replicas it holds for others
+        import Placement
+        placement = Placement.makePlacement(dict, replicas=1)
 
     server = Server(fs, num_disks=disks,
                     cpu=myScpu, num_cpus=cpus,
                     nic=mySnic, num_nics=nics,
-                    hba=myShba, num_hbas=hbas)
+                    hba=myShba, num_hbas=hbas,
+                    reduce=reduce, threads=threads,
+                    zero_copy=zero_copy, ocache=ocache,
+                    prefetch=prefetch, arrival_scv=scv,
+                    placement=placement, background=background,
+                    replicas=replicas, quorum=quorum, read_any=read_any,
+                    back_nic=myBack, num_backs=backs,
+                    gcommit=gcommit)
     return server
 
 
@@ -546,3 +1115,49 @@ if __name__ == '__main__':
             s.num_hbas, s.hba.desc)
 
         servertest(s, {}, descr=msg)
+
+        # where does memory bandwidth become the bottleneck
+        fs = makefs(makedisk({'device': 'ssd'}), {})
+        print("Server 1MB sequential I/O (d=64), 24 x %s, 32 cores" %
+              (fs.disk.desc))
+        print("\t   NICs   zero-copy    read MB/s (mem)   write MB/s (mem)")
+        for nic in (10 * GIG, 100 * GIG):
+            for zc in (False, True):
+                s = makeServer(fs, {'disks': 24, 'cores': 32, 'nics': 2,
+                                    'nic': nic, 'hbas': 4, 'hba': 32 * GIG,
+                                    'zero_copy': zc})
+                (tr, br, lr) = s.read(1024 * 1024, depth=64, seq=True)
+                (tw, bw, lw) = s.write(1024 * 1024, depth=64, seq=True)
+                print("\t2x%3dGb   %9s   %10.1f (%3.2f)  %10.1f (%3.2f)" %
+                      (nic / GIG, "yes" if zc else "no",
+                       br / MEG, lr['mem'], bw / MEG, lw['mem']))
+        print("")
+
+        # sequential objects sharing each disk
+        fs = makefs(makedisk({'device': 'disk'}), {})
+        s = makeServer(fs, {'disks': 4, 'cores': 4})
+        print("Server 128K sequential I/O (d=32), 4 x %s" % (fs.disk.desc))
+        print("\tstreams/disk   read MB/s   write MB/s")
+        for streams in (1, 2, 4, 8, 16, 32):
+            (tr, br, lr) = s.read(128 * KB, depth=32, seq=True,
+                                  streams=streams)
+            (tw, bw, lw) = s.write(128 * KB, depth=32, seq=True,
+                                   streams=streams)
+            print("\t%12d %11.1f %12.1f" % (streams, br / MEG, bw / MEG))
+        print("")
+
+        # how long a burst can the writeback buffer absorb
+        fs = makefs(makedisk({'device': 'disk'}), {})
+        s = makeServer(fs, {'disks': 4})
+        rate = 2 * s.drain_bw(4096) / 4096
+        (t_max, b_max) = s.max_burst(4096, rate)
+        print("Server 4K random write burst (%d IOPS for 2s), 4 x %s, "
+              "%dMB buffer" % (rate, fs.disk.desc, s.write_buf / MB))
+        print("\tfills in %dms (%dMB), 2s needs %dMB of buffer" %
+              (t_max / 1000, b_max / MB,
+               s.buffer_for(4096, rate, 2 * SECOND) / MB))
+        print("\t  time   buffered     latency")
+        for (t, fill, lat) in s.burst(4096, rate, 2 * SECOND,
+                                      interval=SECOND / 5):
+            print("\t%5dms  %7.1fMB  %8dus" % (t / 1000, fill / MB, lat))
+        print("")
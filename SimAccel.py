@@ -0,0 +1,182 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is intended to be a simulation of a (QAT or ISA-L style) offload
+accelerator, attached to a CPU, that can take over hashing, compression,
+RAID-6 and erasure coding computations.
+
+ACTIVE INGREDIENTS IN MODEL:
+    submission ... the CPU still pays to build, submit and complete
+                   each job, but no longer touches the data
+    transfer ..... input and output cross PCIe
+    engine ....... each job occupies the engine for bytes/bw, after a
+                   fixed per-job latency
+    queueing ..... jobs wait (M/M/1, up to the queue depth) for the
+                   engine.  The offered load depends on the request rate,
+                   so the caller (Server or Gateway) computes the engine
+                   load and adds its queueing delay (see queue_length)
+"""
+
+from units import *
+from Arrivals import gg1_factor
+
+
+class Accelerator:
+    """ Performance Modeling Offload Accelerator Simulation """
+
+    def __init__(self, name, bw=5 * GIG, latency=10, depth=64,
+                 pcie=8 * GIG, ops=('sha', 'compress', 'decompress',
+                                    'raid6', 'ec')):
+        """ create an accelerator simulation
+            name -- name of the simulated device
+            bw -- engine throughput (bytes/sec)
+            latency -- (us) per-job latency
+            depth -- maximum number of queued jobs
+            pcie -- PCIe transfer rate (bytes/sec)
+            ops -- list of computations it can offload
+        """
+        self.desc = "%s(%dGB/s)" % (name, bw / GIG)
+        self.bw = bw
+        self.latency = latency
+        self.depth = depth
+        self.pcie = pcie
+        self.ops = ops
+
+        # magic performance tuning constants
+        self.submit_us = 1      # FIX - CPU (us) to submit and complete a job
+
+    def offloads(self, op):
+        """ can this accelerator perform the named computation """
+        return op in self.ops
+
+    def submit_cpu(self):
+        """ return the CPU time to submit (and complete) a job """
+        return self.submit_us
+
+    def service(self, bytes):
+        """ return the time a job occupies the engine """
+        return float(bytes) * SECOND / self.bw
+
+    def transfer(self, bytes):
+        """ return the PCIe transfer time for that amount of data """
+        return float(bytes) * SECOND / self.pcie
+
+    def queue_length(self, rho, max_depth=None, ca2=1.0):
+        """ average queue depth as a function of load
+            rho -- average fraction of time engine is busy
+            max_depth -- the longest the queue can possibly be
+            ca2 -- SCV of inter-arrival times (1 = Poisson)
+        """
+        if max_depth is None:
+            max_depth = self.depth
+        if (rho >= 1):
+            return max_depth
+        else:
+            avg = gg1_factor(ca2) * rho / (1 - rho)
+            return avg if avg < max_depth else max_depth
+
+    def job_time(self, bytes_in, bytes_out):
+        """ return the elapsed time for a job on an idle accelerator
+            bytes_in -- bytes to be processed
+            bytes_out -- bytes of results
+        """
+        t = self.submit_us + self.latency
+        t += self.transfer(bytes_in) + self.transfer(bytes_out)
+        t += self.service(bytes_in)
+        return t
+
+    def time(self, bytes_in, bytes_out):
+        """ return the elapsed time for a job (w/o queueing)
+            bytes_in -- bytes to be processed
+            bytes_out -- bytes of results
+        """
+        return self.job_time(bytes_in, bytes_out)
+
+    def capacity(self, bytes):
+        """ maximum jobs per second of a given size """
+        t = max(self.service(bytes), self.transfer(bytes))
+        return SECOND / t
+
+
+def makeAccel(dict):
+    """ handy function to instantiate an accelerator from a dict
+        dict -- of accelerator parameters
+            accel -- name of the accelerator
+            accel_bw -- engine throughput (bytes/sec)
+            accel_lat -- (us) per-job latency
+            accel_depth -- maximum queued jobs
+            accel_pcie -- PCIe transfer rate (bytes/sec)
+    """
+
+    dflts = {
+        'accel': 'QAT',
+        'accel_bw': 5 * GIG,
+        'accel_lat': 10,
+        'accel_depth': 64,
+        'accel_pcie': 8 * GIG,
+    }
+
+    name = dict['accel'] if 'accel' in dict else dflts['accel']
+    bw = dict['accel_bw'] if 'accel_bw' in dict else dflts['accel_bw']
+    lat = dict['accel_lat'] if 'accel_lat' in dict else dflts['accel_lat']
+    depth = dict['accel_depth'] if 'accel_depth' in dict \
+        else dflts['accel_depth']
+    pcie = dict['accel_pcie'] if 'accel_pcie' in dict \
+        else dflts['accel_pcie']
+
+    return Accelerator(name, bw=bw, latency=lat, depth=depth, pcie=pcie)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    from SimCPU import makeCPU
+    from Report import Report
+
+    for accel in (None, 'QAT'):
+        d = {} if accel is None else {'accel': accel}
+        cpu = makeCPU(d)
+        print("%s %s" % (cpu.desc, "" if cpu.accel is None
+                         else "w/" + cpu.accel.desc))
+        r = Report(("sha-1", "comp", "decomp", "RAID-6"))
+        r.printHeading()
+        for bs in (4096, 128 * 1024, 1024 * 1024):
+            r.printLatency(bs, (cpu.sha_time(bs), cpu.compress_time(bs),
+                                cpu.decompress_time(bs), cpu.raid6_time(bs)))
+            r.printLatency(1, (cpu.sha_cpu(bs), cpu.compress_cpu(bs),
+                               cpu.decompress_cpu(bs), cpu.raid6_cpu(bs)))
+        print("")
+
+    # how many gateway cores does an offload card free up
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+    from Dlm import makeDLM
+    from Gateway import makeGateway
+    s = makeServer(makefs(makedisk({'device': 'ssd'}), {}),
+                   {'disks': 4, 'nic': 40 * GIG})
+    dlm = makeDLM({})
+    print("Gateway cores busy per GB/s of d=32 sequential writes")
+    print("\t   size   compress   no offload    offload")
+    for bs in (128 * 1024, 4096 * 1024):
+        for comp in (1, 2):
+            cores = ()
+            for accel in (None, 'QAT'):
+                d = {'cores': 16, 'back': 40 * GIG, 'front': 40 * GIG,
+                     'servers': 8}
+                if comp > 1:
+                    d['compress'] = comp
+                if accel is not None:
+                    d['accel'] = accel
+                gw = makeGateway(s, dlm, d)
+                (t, bw, l) = gw.write(bs, depth=32, seq=True)
+                avail = gw.cpu.avail_cores(gw.num_cpus, 'write')
+                cores += (l['cpu'] * avail * GB / bw,)
+            print("\t%6dK   %8.1fx   %10.2f %10.2f" %
+                  ((bs / 1024, comp) + cores))
+    print("")
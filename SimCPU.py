@@ -12,9 +12,17 @@
 
 """
 This is intended to be a simulation of processor speed and throughput
+
+Multi-core throughput does not scale linearly (lock contention, cache
+line bouncing), which we model with the Universal Scalability Law:
+    C(N) = N / (1 + sigma (N - 1) + kappa N (N - 1))
+where sigma is the contention (serialization) penalty and kappa the
+coherency (crosstalk) penalty.  Both may be fitted (see fit_usl) for
+each type of operation.
 """
 
 from units import MEG, GIG, SECOND
+from Arrivals import gg1_factor
 
 
 class CPU:
@@ -38,6 +46,8 @@ class CPU:
         self.clock = speed              # processor clock speed
         self.mem_speed = ddr            # memory speed
         self.hyperthread = HYPER_T      # hyperthreading multiplier
+        self.accel = None               # offload accelerator (if any)
+        self.usl = {'default': (0.0, 0.0)}  # (sigma, kappa) per op type
         width = BUS_WIDTH / 8           # bus width (bytes)
 
         # estimated time for key operations
@@ -60,6 +70,12 @@ class CPU:
         bw = min(self.bus_bw, self.mem_bw)
         return float(bytes) * SECOND / bw
 
+    def mem_busy(self, bytes):
+        """ return the time the memory is busy moving that much data
+            (CPU copies and DMA both consume memory bandwidth)
+        """
+        return float(bytes) * SECOND / self.mem_bw
+
     def process(self, bytes):
         """ return the elapsed time to process that amount of data """
         return float(bytes) * SECOND / self.bus_bw
@@ -80,17 +96,76 @@ class CPU:
         """ return the elapsed time to set-up/complete a DMA operation"""
         return self.DMA
 
-    def queue_length(self, rho, max_depth=1000):
+    def queue_length(self, rho, max_depth=1000, ca2=1.0):
         """ expected average queue depth as a function of load
             rho -- average fraction of time CPU is busy
             max_depth -- the longest the queue can possibly be
+            ca2 -- SCV of inter-arrival times (1 = Poisson)
         """
         if (rho >= 1):
             return max_depth
         else:
-            avg = rho / (1 - rho)
+            avg = gg1_factor(ca2) * rho / (1 - rho)
             return avg if avg < max_depth else max_depth
 
+    def set_usl(self, sigma, kappa, op='default'):
+        """ set the USL scaling parameters for a type of operation
+            sigma -- contention penalty
+            kappa -- coherency penalty
+            op -- type of operation they apply to
+        """
+        self.usl[op] = (sigma, kappa)
+
+    def scaling(self, n, op='default'):
+        """ effective capacity (in cores) of n concurrently busy cores
+            n -- number of cores
+            op -- type of operation
+        """
+        (sigma, kappa) = self.usl[op] if op in self.usl \
+            else self.usl['default']
+        if n <= 1:
+            return n
+        return n / (1 + (sigma * (n - 1)) + (kappa * n * (n - 1)))
+
+    def inflation(self, n, op='default'):
+        """ per-operation CPU time multiplier when n cores are busy
+            n -- number of cores
+            op -- type of operation
+        """
+        if n <= 1:
+            return 1.0
+        return float(n) / self.scaling(n, op)
+
+    def busy_cores(self, num_cpus=1, depth=1):
+        """ number of cores concurrently busy with depth requests
+            num_cpus -- number of processors (for our use)
+            depth -- number of concurrent requests
+        """
+        return max(1, min(depth, num_cpus * self.cores))
+
+    def avail_cores(self, num_cpus=1, op='default', depth=None):
+        """ effective number of cores available for a type of operation
+            num_cpus -- number of processors (for our use)
+            op -- type of operation
+            depth -- number of concurrent requests (default: all busy)
+
+            (each of the cores runs 1/inflation as fast as it would
+             alone, where the inflation depends on how many are busy)
+        """
+        n = num_cpus * self.cores
+        if depth is None or depth >= n:
+            return self.scaling(n, op) * self.hyperthread
+        busy = self.busy_cores(num_cpus, depth)
+        return n * self.hyperthread / self.inflation(busy, op)
+
+    def attach(self, accel):
+        """ attach an offload accelerator (SimAccel) to this processor """
+        self.accel = accel
+
+    def offloaded(self, op):
+        """ will the named computation be done by an accelerator """
+        return self.accel is not None and self.accel.offloads(op)
+
     #
     # these operations would normally be a function of CPU speed, but
     # may also be off-loaded, improving speed and reducing CPU loading
@@ -100,6 +175,8 @@ class CPU:
             bytes -- bytes to be hashed
             width -- desired output hash width
         """
+        if self.offloaded('sha'):
+            return self.accel.time(bytes, width)
         x = 43           # FIX - recalibrate SHA
         t_cpu = self.execute(x * bytes)
         t_read = self.mem_read(bytes)
@@ -112,6 +189,8 @@ class CPU:
             bytes -- bytes to be hashed
             width -- desired output hash width
         """
+        if self.offloaded('sha'):
+            return self.accel.submit_cpu()
         # w/o acceleration CPU time = clock time
         return self.sha_time(bytes, width)
 
@@ -120,6 +199,8 @@ class CPU:
             bytes -- input block size
             comp -- expected compression factor
         """
+        if self.offloaded('compress'):
+            return self.accel.time(bytes, bytes / comp)
         x = 68          # FIX - recalibrate compression
         t_cpu = self.execute(x * bytes)
         t_read = self.mem_read(bytes)
@@ -128,6 +209,8 @@ class CPU:
 
     def compress_cpu(self, bytes, comp=2):
         """ return the cpu time for an LZW-like compression """
+        if self.offloaded('compress'):
+            return self.accel.submit_cpu()
         # w/o acceleration CPU time = clock time
         return self.compress_time(bytes, comp)
 
@@ -136,6 +219,8 @@ class CPU:
             bytes -- expected output block size
             comp -- expected compression factor
         """
+        if self.offloaded('decompress'):
+            return self.accel.time(bytes / comp, bytes)
         x = 33          # FIX - recalibrate decompression
         t_cpu = self.execute(x * bytes)
         t_read = self.mem_read(bytes / comp)
@@ -144,11 +229,15 @@ class CPU:
 
     def decompress_cpu(self, bytes, comp=2):
         """ return the cpu time for an LZW-like decompression """
+        if self.offloaded('decompress'):
+            return self.accel.submit_cpu()
         # w/o acceleration CPU time = clock time
         return self.decompress_time(bytes)
 
     def raid6_time(self, bytes, n=6, m=2):
         """ return the elapsed time for a RAID-6 write computation """
+        if self.offloaded('raid6'):
+            return self.accel.time(n * bytes, m * bytes)
         x = 10          # FIX - recalibrate RAID-6 computation
         t_cpu = self.execute(x * n * bytes)
         t_read = self.mem_read(n * bytes)
@@ -157,12 +246,59 @@ class CPU:
 
     def raid6_cpu(self, bytes, n=6, m=2):
         """ return the cpu time for a RAID-6 write computation """
+        if self.offloaded('raid6'):
+            return self.accel.submit_cpu()
         # w/o acceleration CPU time = clock time
         return self.raid6_time(bytes, n, m)
 
 
+def fit_usl(points):
+    """ fit USL parameters to measured throughput
+        points -- list of (cores, throughput) measurements
+
+        returns (sigma, kappa)
+
+        If there is no single core measurement, we assume that
+        the smallest measured configuration scaled linearly.
+    """
+    (n0, x0) = sorted(points)[0]
+    per_core = float(x0) / n0
+
+    # N/C(N) - 1 = sigma (N - 1) + kappa N (N - 1) ... least squares
+    saa = sab = sbb = say = sby = 0.0
+    for (n, x) in points:
+        if n <= 1:
+            continue
+        y = (n * per_core / x) - 1
+        a = n - 1
+        b = n * (n - 1)
+        saa += a * a
+        sab += a * b
+        sbb += b * b
+        say += a * y
+        sby += b * y
+    if saa == 0:
+        return (0.0, 0.0)
+    det = (saa * sbb) - (sab * sab)
+    sigma = ((say * sbb) - (sby * sab)) / det if det > 0 else 0.0
+    kappa = ((saa * sby) - (sab * say)) / det if det > 0 else 0.0
+
+    # neither penalty can be negative
+    if kappa < 0:
+        kappa = 0.0
+        sigma = say / saa
+    if sigma < 0:
+        sigma = 0.0
+        kappa = sby / sbb
+    return (max(0.0, sigma), max(0.0, kappa))
+
+
 def makeCPU(dict):
-    """ handy function to instantiate a CPU from parameters in a dict """
+    """ handy function to instantiate a CPU from parameters in a dict
+        dict -- of CPU parameters
+            usl_sigma, usl_kappa -- default USL scaling parameters
+            usl -- map from op type to (sigma, kappa)
+    """
 
     defaults = {
         'cpu': 'Essex',
@@ -180,6 +316,16 @@ def makeCPU(dict):
     ddr = dict['ddr'] if 'ddr' in dict else defaults['ddr']
 
     cpu = CPU(cpu_type, speed=speed, cores=cores, mem=mem, ddr=ddr)
+    sigma = dict['usl_sigma'] if 'usl_sigma' in dict else 0.0
+    kappa = dict['usl_kappa'] if 'usl_kappa' in dict else 0.0
+    cpu.set_usl(sigma, kappa)
+    if 'usl' in dict:
+        for op in dict['usl']:
+            (sigma, kappa) = dict['usl'][op]
+            cpu.set_usl(sigma, kappa, op)
+    if 'accel' in dict:
+        import SimAccel
+        cpu.attach(SimAccel.makeAccel(dict))
     return cpu
 
 
@@ -224,3 +370,15 @@ if __name__ == '__main__':
         raid_c = cpu.raid6_cpu(bs)
         r.printLatency(bs, (sha_t, lzwc_t, lzwd_t, raid_t))
         r.printLatency(1, (sha_c, lzwc_c, lzwd_c, raid_c))
+
+    # fit USL parameters to (synthetic) measurements that flatten at 16
+    points = [(1, 100), (2, 196), (4, 376), (8, 680), (16, 1050),
+              (32, 1180), (64, 1000)]
+    (sigma, kappa) = fit_usl(points)
+    cpu = makeCPU({'cores': 64, 'usl_sigma': sigma, 'usl_kappa': kappa})
+    print("")
+    print("USL fit: sigma=%6.4f, kappa=%8.6f" % (sigma, kappa))
+    print("\t cores  measured     model   effective  inflation")
+    for (n, x) in points:
+        print("\t%6d  %8d  %8d  %10.1f  %9.2f" %
+              (n, x, 100 * cpu.scaling(n), cpu.scaling(n), cpu.inflation(n)))
@@ -127,8 +127,10 @@ class Disk:
     # kind of matches some observed behavior and is only intended
     # to put a box around the expected performance.
     #
-    def cache_size(self, size, read, depth=1):
-        """ Estimate a non-aggressive read-ahead cache size """
+    def cache_size(self, size, read, depth=1, streams=1):
+        """ Estimate a non-aggressive read-ahead cache size
+            (for each of 'streams' streams sharing the cache segments)
+        """
 
         # make sure that caching is enabled
         if read and not self.do_readahead:
@@ -146,21 +148,21 @@ class Disk:
         # 3. we are willing to go farther if we see more requests
         c *= min(depth, self.cache_max_depth)
 
-        # 4. but only up to a total maximum amount
-        m = self.cache_max_tracks * self.trk_size
+        # 4. but only up to a total maximum amount (shared by all streams)
+        m = self.cache_max_tracks * self.trk_size / streams
         return min(c, m)
 
     # this method tries to simulate the interplay of
     # queue depth, read-ahead, and write back to figure
     # out how often we can avoid rotational latency waits
-    def latency(self, size, read=True, seq=True, depth=1):
+    def latency(self, size, read=True, seq=True, depth=1, streams=1):
         """ Time (us) a request is likely to incur awaiting rotation """
 
         # start out with the average rotational latency
         l = (SECOND / (self.rpm / 60)) / 2 if self.rpm > 0 else 0
 
         # figure out how many of these operations I can cache
-        c = self.cache_size(size, read, depth)
+        c = self.cache_size(size, read, depth, streams)
         n = (c / size) if c > size else 1
 
         # sequential is about caching AND seek/latency optimization
@@ -186,8 +188,17 @@ class Disk:
     # this method ties all the rest together into a simulation
     # of the average time to do a standard throughput test
     # (for random I/O we ignore coincidental same-cylinder hits)
-    def avgTime(self, bsize, file_size, read=True, seq=True, depth=1):
-        """ average operation time (us) for a specified test. """
+    #
+    # Multiple sequential streams sharing the head are sequential
+    # in runs: each trip to a stream reads (or writes) its share of
+    # the cache (or its queued requests), and then the head must seek
+    # (and wait for rotation) to another stream.  As streams are added
+    # the runs get shorter, and the streams look more like random I/O.
+    def avgTime(self, bsize, file_size, read=True, seq=True, depth=1,
+                streams=1):
+        """ average operation time (us) for a specified test.
+            streams -- number of sequential streams sharing the disk
+        """
 
         # transfer time includes intra-transfer-seeks
         tXfer = self.xferTime(bsize, read)
@@ -195,8 +206,24 @@ class Disk:
         # requests can't queue deeper than the drive supports
         if depth > self.nr_requests:
             depth = self.nr_requests
-        tLatency = self.latency(bsize, read, seq, depth)
 
+        if seq and streams > 1:
+            # each stream has its share of the queue and the cache
+            d = max(1, float(depth) / streams)
+            c = self.cache_size(bsize, read, d, streams)
+            run = max(d, (c / bsize) if c > bsize else 1)
+
+            # the queue holds requests for (at most) this many streams
+            places = min(depth, streams)
+            tLatency = self.latency(bsize, read, False, places)
+            cyls = self.cylinders_in(file_size)
+            tSeek = self.seekTime(cyls / (places + 2), read)
+
+            # (interleaving never makes a stream faster)
+            t = self.avgTime(bsize, file_size, read, seq, depth)
+            return max(t, tXfer + (tLatency + tSeek) / run)
+
+        tLatency = self.latency(bsize, read, seq, depth)
         if seq:
             return tXfer + tLatency
         else:
@@ -206,13 +233,15 @@ class Disk:
             return tXfer + tLatency + tSeek
 
     # convenience functions to plug in operation (and optionally seq)
-    def avgRead(self, bsize, file_size, seq=False, depth=1):
+    def avgRead(self, bsize, file_size, seq=False, depth=1, streams=1):
         """ average time (us) for a specified read test. """
-        return self.avgTime(bsize, file_size, read=True, seq=seq, depth=depth)
+        return self.avgTime(bsize, file_size, read=True, seq=seq, depth=depth,
+                            streams=streams)
 
-    def avgWrite(self, bsize, file_size, seq=False, depth=1):
+    def avgWrite(self, bsize, file_size, seq=False, depth=1, streams=1):
         """ average time (us) for a specified write test. """
-        return self.avgTime(bsize, file_size, read=False, seq=seq, depth=depth)
+        return self.avgTime(bsize, file_size, read=False, seq=seq,
+                            depth=depth, streams=streams)
 
 
 #
@@ -270,8 +299,11 @@ class SSD(Disk):
         self.trk_size = self.cyl_size / self.heads
         self.desc = "SSD"
 
-    def avgTime(self, bsize, file_size, read=True, seq=True, depth=1):
-        """ average operation time (us) for a specified test. """
+    def avgTime(self, bsize, file_size, read=True, seq=True, depth=1,
+                streams=1):
+        """ average operation time (us) for a specified test.
+            (without seeks, interleaved streams cost nothing extra)
+        """
 
         tXfer = self.xferTime(bsize, read)
         if not read:
@@ -450,3 +482,21 @@ if __name__ == '__main__':
             print("\nDefault %s simulation" % (d))
             diskparms(disk)
             tptest(disk, {})
+
+        # sequential streams interleaved on a single disk
+        disk = makedisk({'device': 'disk'})
+        sz = 16 * GIG
+        print("\nInterleaved sequential streams (%s, depth=32)" % (disk.desc))
+        print("\t streams   128K read MB/s   4K read MB/s   4K write MB/s")
+        for streams in (1, 2, 4, 8, 16, 32, 0):
+            if streams > 0:
+                (seq, n) = (True, streams)
+            else:
+                (seq, n) = (False, 1)
+            t1 = disk.avgRead(128 * KB, sz, seq=seq, depth=32, streams=n)
+            t2 = disk.avgRead(4 * KB, sz, seq=seq, depth=32, streams=n)
+            t3 = disk.avgWrite(4 * KB, sz, seq=seq, depth=32, streams=n)
+            print("\t%8s %16.1f %14.2f %15.2f" %
+                  (streams if streams > 0 else "random",
+                   128 * KB * SECOND / t1 / MEG, 4 * KB * SECOND / t2 / MEG,
+                   4 * KB * SECOND / t3 / MEG))
@@ -25,6 +25,7 @@ of the average costs of a few things:
 """
 
 from units import SECOND, MEG
+from GroupCommit import GroupCommit, makeGroupCommit
 
 
 def log2(v):
@@ -119,6 +120,7 @@ class FS:
     flush_time = 500000         # flush cache after this much time elapses
     flush_max = 128             # max parallelism for cache flush writes
     md_seek = 0                 # average cylinders from data to metadata
+    kv = None                   # key-value store holding metadata (or None)
 
     # number of metadata writes associated with create/delete
     md_open = 1.0               # one directory read (rest in cache)
@@ -137,9 +139,38 @@ class FS:
         self.size = disk.size
         self.cpu = cpu
         self.md_seek = md_span * self.size
+        self.gcommit = GroupCommit(disk)
 
         # FIX better values for cpu_* parameters, computed w/CPU
 
+    def md_read_time(self, depth=1):
+        """ average time to read a metadata block (or key)
+            depth -- number of queued operations
+        """
+        if self.kv is not None:
+            return self.kv.get_time(depth)
+        return self.disk.avgRead(self.md_size, self.md_seek, depth=depth)
+
+    def md_write_time(self, depth=1):
+        """ average time to write a metadata block (or key)
+            depth -- number of queued operations
+        """
+        if self.kv is not None:
+            return self.kv.put_time(depth)
+        return self.disk.avgWrite(self.md_size, self.md_seek, depth=depth)
+
+    def md_read_cpu(self):
+        """ CPU time (us) to read a metadata key (blocks are in cpu_*) """
+        if self.kv is not None:
+            return self.kv.cpu_get()
+        return 0
+
+    def md_write_cpu(self):
+        """ CPU time (us) to write a metadata key (blocks are in cpu_*) """
+        if self.kv is not None:
+            return self.kv.cpu_put()
+        return 0
+
     def flush_depth(self, bsize, time):
         """ write depth resulting from cache flushes
             bsize -- bytes written per operation
@@ -167,12 +198,14 @@ class FS:
     # used by the filestore to write the journal and read/write
     # data disks
     #
-    def read(self, bsize, file_size, seq=True, depth=1, direct=False):
+    def read(self, bsize, file_size, seq=True, depth=1, direct=False,
+             streams=1):
         """ average time for reads from a single file
             bsize -- read unit (bytes)
             file_size -- size of file being read from (bytes)
             seq -- sequential (vs random) read
             depth -- number of queued operations
+            streams -- number of (interleaved) sequential streams
         """
 
         # see if we have to break this up into smaller requests
@@ -191,7 +224,8 @@ class FS:
 
         # figure out the times for the underlying disk operations
         #  (initial read is seq per op, shard reads are seq per fs)
-        time = self.disk.avgRead(bsize, file_size, seq=seq, depth=d)
+        time = self.disk.avgRead(bsize, file_size, seq=seq, depth=d,
+                                 streams=streams)
         if seq or shards == 1:
             time *= shards
         else:
@@ -205,14 +239,14 @@ class FS:
         mdreads = shards * interpolate(self.md_read, bsize)
         if seq:
             mdreads *= interpolate(self.seq_read, bsize)
-        time += mdreads * \
-            self.disk.avgRead(self.md_size, self.md_seek, depth=d)
+        time += mdreads * self.md_read_time(depth=d)
 
         bw = bsize * SECOND / time
 
         loads = {}
         loads['disk'] = 1.0
-        loads['cpu'] = interpolate(self.cpu_read, bsize) / SECOND
+        cpu = interpolate(self.cpu_read, bsize)
+        loads['cpu'] = (cpu + mdreads * self.md_read_cpu()) / SECOND
 
         return (time, bw, loads)
 
@@ -223,7 +257,7 @@ class FS:
     # data disks
     #
     def write(self, bsize, file_size, seq=True, depth=1,
-              direct=False, sync=False):
+              direct=False, sync=False, streams=1):
         """ average time for writes to a single file
             bsize -- read unit (bytes)
             file_size -- size of file being read from (bytes)
@@ -231,6 +265,7 @@ class FS:
             depth -- number of queued operations
             direct -- don't go through the buffer cache
             sync -- force flush after write
+            streams -- number of (interleaved) sequential streams
         """
 
         # FS may not support specified bsize
@@ -243,7 +278,8 @@ class FS:
         # estimate effective parallelism the disk will see
         d = depth * shards
         if not sync and not direct:
-            t = shards * self.disk.avgWrite(bsize, file_size, seq, d)
+            t = shards * self.disk.avgWrite(bsize, file_size, seq, d,
+                                            streams)
             d = self.flush_depth(bsize * shards, t)
         elif direct:
             m = interpolate(self.max_dir_w, bsize)
@@ -252,7 +288,8 @@ class FS:
 
         # figure out the times for the underlying disk operations
         #  (initial write is seq per op, shard writes are seq per fs)
-        time = self.disk.avgWrite(bsize, file_size, seq=seq, depth=d)
+        time = self.disk.avgWrite(bsize, file_size, seq=seq, depth=d,
+                                  streams=streams)
         if seq or shards == 1:
             time *= shards
         else:
@@ -267,69 +304,79 @@ class FS:
             mdw *= interpolate(self.seq_write, bsize)
 
         # also consider the time for the meta-data updates
+        committers = d
         if sync:
-            mdw += 1    # I-node updates don't come along for free
             d = 1       # we don't parallelize requests
-        t = mdw * self.disk.avgWrite(self.md_size, self.md_seek, depth=d)
-        time += t
+        time += mdw * self.md_write_time(depth=d)
+
+        # I-node updates don't come along for free, but concurrent
+        #   syncs share (group) commits to the journal
+        if sync:
+            (t_c, rate, batch) = self.gcommit.commit(committers, time)
+            time += SECOND / rate
         bw = bsize * SECOND / time
 
         loads = {}
         loads['disk'] = 1.0  # by design
-        loads['cpu'] = interpolate(self.cpu_write, bsize) / SECOND
+        cpu = interpolate(self.cpu_write, bsize)
+        loads['cpu'] = (cpu + mdw * self.md_write_cpu()) / SECOND
 
         return (time, bw, loads)
 
     def stat(self):
         """ stat a file whose parent directory is already in cache """
-        t = self.disk.avgRead(self.md_size, self.md_seek)
+        t = self.md_read_time()
         time = self.md_open * t
         bw = SECOND / time
 
         loads = {}
         loads['disk'] = 1.0
-        loads['cpu'] = float(self.cpu_open) / SECOND
+        cpu = self.cpu_open + self.md_open * self.md_read_cpu()
+        loads['cpu'] = float(cpu) / SECOND
         return (time, bw, loads)
 
     def open(self):
         """ open a file whose parent directory is already in cache """
-        t = self.disk.avgRead(self.md_size, self.md_seek)
+        t = self.md_read_time()
         time = self.md_open * t
         bw = SECOND / time
 
         loads = {}
         loads['disk'] = 1.0
-        loads['cpu'] = float(self.cpu_open) / SECOND
+        cpu = self.cpu_open + self.md_open * self.md_read_cpu()
+        loads['cpu'] = float(cpu) / SECOND
         return (time, bw, loads)
 
     def create(self, sync=False):
         """ new file creation """
 
-        t = self.disk.avgWrite(self.md_size, self.md_seek)
+        t = self.md_write_time()
         if not sync:
             d = self.flush_depth(self.md_size, t)
-            t = self.disk.avgWrite(self.md_size, self.md_seek, depth=d)
+            t = self.md_write_time(depth=d)
         time = self.md_create * t
         bw = SECOND / time
 
         loads = {}
         loads['disk'] = 1.0
-        loads['cpu'] = float(self.cpu_create) / SECOND
+        cpu = self.cpu_create + self.md_create * self.md_write_cpu()
+        loads['cpu'] = float(cpu) / SECOND
         return (time, bw, loads)
 
     def delete(self, sync=False):
         """ file deletion """
 
-        t = self.disk.avgWrite(self.md_size, self.md_seek)
+        t = self.md_write_time()
         if not sync:
             d = self.flush_depth(self.md_size, t)
-            t = self.disk.avgWrite(self.md_size, self.md_seek, depth=d)
+            t = self.md_write_time(depth=d)
         time = self.md_delete * t
         bw = SECOND / time
 
         loads = {}
         loads['disk'] = 1.0
-        loads['cpu'] = float(self.cpu_delete) / SECOND
+        cpu = self.cpu_delete + self.md_delete * self.md_write_cpu()
+        loads['cpu'] = float(cpu) / SECOND
 
         return (time, bw, loads)
 
@@ -337,26 +384,26 @@ class FS:
         """ get file attributes for an open file """
 
         # FIX shouldn't this be in memory cheap
-        time = self.disk.avgRead(self.md_size, self.md_seek)
+        time = self.md_read_time()
         bw = SECOND / time
 
         loads = {}
         loads['disk'] = 1.0
-        loads['cpu'] = float(self.cpu_getatr) / SECOND
+        loads['cpu'] = float(self.cpu_getatr + self.md_read_cpu()) / SECOND
         return (time, bw, loads)
 
     def setattr(self, sync=False):
         """ set file attributes for an open file """
 
-        time = self.disk.avgWrite(self.md_size, self.md_seek)
+        time = self.md_write_time()
         if not sync:
             d = self.flush_depth(self.md_size, time)
-            time = self.disk.avgWrite(self.md_size, self.md_seek, depth=d)
+            time = self.md_write_time(depth=d)
         bw = SECOND / time
 
         loads = {}
         loads['disk'] = 1.0
-        loads['cpu'] = float(self.cpu_setatr) / SECOND
+        loads['cpu'] = float(self.cpu_setatr + self.md_write_cpu()) / SECOND
 
         return (time, bw, loads)
 
@@ -428,21 +475,41 @@ def makefs(disk, dict):
         dict -- of file system paramters
              -- fs: type of file system
              -- age: 0-1
+             -- metadata: 'fs' (blocks) or 'lsm' (key-value store)
+             -- deferred: (raw) writes smaller than this go through the WAL
+             -- raw_compress: (raw) expected compression ratio
+             -- commit_window, commit_batch, commit_record: group commit
     """
 
     age = dict['age'] if 'age' in dict else 0
 
     if 'fs' in dict and dict['fs'] == 'btrfs':
-        return btrfs(disk, age)
+        fs = btrfs(disk, age)
     elif 'fs' in dict and dict['fs'] == 'ext4':
-        return ext4(disk, age)
+        fs = ext4(disk, age)
     elif 'fs' in dict and dict['fs'] == 'xfs':
-        return xfs(disk, age)
+        fs = xfs(disk, age)
     elif 'fs' in dict and dict['fs'] == 'zfs':
         from zfs import zfs
-        return zfs(disk, age)
+        fs = zfs(disk, age)
+    elif 'fs' in dict and dict['fs'] == 'raw':
+        from raw import raw
+        from SimCPU import makeCPU
+        dfr = dict['deferred'] if 'deferred' in dict else 64 * 1024
+        comp = dict['raw_compress'] if 'raw_compress' in dict else 1
+        fs = raw(disk, cpu=makeCPU(dict), deferred=dfr, compress=comp)
     else:
-        return xfs(disk, age)
+        fs = xfs(disk, age)
+
+    # metadata may be kept in a key-value store on the same device
+    if 'metadata' in dict and dict['metadata'] == 'lsm':
+        from Lsm import makeLSM
+        fs.kv = makeLSM(disk, dict, cpu=fs.cpu)
+        fs.desc += "+LSM"
+
+    # sync writes are committed (in groups) to the journal
+    fs.gcommit = makeGroupCommit(dict, disk)
+    return fs
 
 
 from Report import Report
@@ -523,6 +590,6 @@ if __name__ == '__main__':
         from SimDisk import makedisk
         disk = makedisk({'device': 'disk'})
 
-        for f in ('btrfs', 'xfs', 'zfs'):
+        for f in ('btrfs', 'xfs', 'zfs', 'raw'):
             fs = makefs(disk, {'fs': f})
             fstest(fs, {}, descr="%s on %s" % (fs.desc, fs.disk.desc))
@@ -18,6 +18,7 @@ could include the costs of the protocol stack) above it.
 
 import SimCPU
 from units import MEG, GIG, SECOND
+from Arrivals import gg1_factor
 
 
 class IFC:
@@ -74,15 +75,16 @@ class IFC:
         cpu += self.cpu_write_x * self.cpu.process(bytes)    # process the data
         return cpu
 
-    def queue_length(self, rho, max_depth=1000):
+    def queue_length(self, rho, max_depth=1000, ca2=1.0):
         """ average queue depth as a function of load
             rho -- average fraction of time NIC is busy
             max_depth -- the longest the queue can possibly be
+            ca2 -- SCV of inter-arrival times (1 = Poisson)
         """
         if (rho >= 1):
             return max_depth
         else:
-            avg = rho / (1 - rho)
+            avg = gg1_factor(ca2) * rho / (1 - rho)
             return avg if avg < max_depth else max_depth
 
 
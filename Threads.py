@@ -0,0 +1,176 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of the thread pools in a Server.  Requests are
+received by messenger threads, handed off to a pool of op worker
+threads, which hand their I/O to disk threads, whose completions are
+handed back to the messengers to send the responses.
+
+ACTIVE INGREDIENTS IN MODEL:
+    handoffs ..... each hand-off between stages costs a thread switch
+                   (or a process switch, if the stages are processes)
+    pools ........ each stage is a pool of c threads, each of which is
+                   held for the duration of its part of the operation
+                   (disk threads are held while the I/O is in progress).
+                   We model each stage as an M/M/c queue, so an under-
+                   provisioned pool adds an (Erlang C) queueing delay,
+                   and caps the throughput at c/holding-time.
+    oversubscription ... when there are more runnable threads than
+                   cores, operations incur additional context switches
+"""
+
+from units import *
+
+
+def erlang_c(c, a):
+    """ probability that an arrival has to wait in an M/M/c queue
+        c -- number of servers
+        a -- offered load (in Erlangs, arrival rate x holding time)
+    """
+    if a <= 0:
+        return 0.0
+    if a >= c:
+        return 1.0
+
+    # compute Erlang B iteratively (avoiding factorials), then C
+    b = 1.0
+    for k in range(1, int(c) + 1):
+        b = a * b / (k + a * b)
+    return c * b / (c - a * (1 - b))
+
+
+class ThreadPools:
+    """ Performance Modeling Server Thread Pool Simulation. """
+
+    def __init__(self, msgr=2, workers=16, disk=4, handoff='thread'):
+        """ create a thread pool simulation
+            msgr -- number of messenger threads
+            workers -- number of op worker threads
+            disk -- number of disk threads (per disk)
+            handoff -- stages are separate 'thread's or 'proc'esses
+        """
+        self.msgr = msgr
+        self.workers = workers
+        self.disk = disk
+        self.handoff = handoff
+        self.desc = "%d/%d/%d threads" % (msgr, workers, disk)
+
+    def handoff_cpu(self, cpu):
+        """ CPU time for one hand-off between stages """
+        if self.handoff == 'proc':
+            return cpu.proc_us()
+        return cpu.thread_us()
+
+    def switch_cpu(self, cpu, cores, depth, stages):
+        """ CPU time for additional (oversubscription) context switches
+            cpu -- SimCPU for the processor
+            cores -- number of available cores
+            depth -- number of parallel requests
+            stages -- number of stages each operation passes through
+        """
+        runnable = self.msgr + min(depth, self.workers)
+        if runnable <= cores:
+            return 0
+        p_switch = 1 - (float(cores) / runnable)
+        return p_switch * stages * cpu.thread_us()
+
+    def pools(self, disks=1):
+        """ list of (name, threads) for each stage
+            disks -- number of disks served by the disk threads
+        """
+        return [('msgr', self.msgr), ('worker', self.workers),
+                ('disk', self.disk * disks)]
+
+    def capacity(self, holds, disks=1):
+        """ maximum operations per second the pools can sustain
+            holds -- map from stage name to (us) per-op holding time
+            disks -- number of disks served by the disk threads
+        """
+        iops = float('inf')
+        for (name, threads) in self.pools(disks):
+            if name in holds and holds[name] > 0:
+                iops = min(iops, threads * SECOND / holds[name])
+        return iops
+
+    def delay(self, holds, iops, depth=1, disks=1):
+        """ expected queueing delay (for threads) and load on each pool
+            holds -- map from stage name to (us) per-op holding time
+            iops -- operations per second
+            depth -- number of parallel requests (the longest a queue
+                     can possibly be)
+            disks -- number of disks served by the disk threads
+
+            returns (delay, {stage: utilization})
+        """
+        wait = 0.0
+        loads = {}
+        for (name, threads) in self.pools(disks):
+            if name not in holds or holds[name] <= 0:
+                continue
+            h = holds[name]
+            a = iops * h / SECOND
+            loads[name] = a / threads
+            if a >= threads:
+                waiting = depth
+            else:
+                waiting = erlang_c(threads, a) * a / (threads - a)
+            wait += min(waiting, depth) * h / threads
+        return (wait, loads)
+
+
+def makeThreadPools(dict):
+    """ instantiate the thread pools described by a configuration dict
+        dict -- of thread pool parameters
+            msgr_threads -- number of messenger threads
+            op_threads -- number of op worker threads
+            disk_threads -- number of disk threads per disk
+            handoff -- 'thread' or 'proc'
+    """
+
+    dflts = {
+        'msgr_threads': 2,
+        'op_threads': 16,
+        'disk_threads': 4,
+        'handoff': 'thread',
+    }
+
+    msgr = dict['msgr_threads'] if 'msgr_threads' in dict \
+        else dflts['msgr_threads']
+    workers = dict['op_threads'] if 'op_threads' in dict \
+        else dflts['op_threads']
+    disk = dict['disk_threads'] if 'disk_threads' in dict \
+        else dflts['disk_threads']
+    handoff = dict['handoff'] if 'handoff' in dict else dflts['handoff']
+
+    return ThreadPools(msgr, workers, disk, handoff=handoff)
+
+
+#
+# find the worker pool size that maximizes server throughput
+#
+if __name__ == '__main__':
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+
+    fs = makefs(makedisk({'device': 'ssd'}), {})
+    for cores in (2, 8):
+        print("Server 4K random I/O (d=64), %d cores, 4 x %s" %
+              (cores, fs.disk.desc))
+        print("\tworkers     read IOPS    latency    write IOPS    latency")
+        best = (0, 0)
+        for w in (1, 2, 4, 8, 16, 32, 64, 128):
+            s = makeServer(fs, {'disks': 4, 'cores': cores,
+                                'op_threads': w})
+            (tr, br, lr) = s.read(4096, depth=64)
+            (tw, bw, lw) = s.write(4096, depth=64)
+            print("\t%7d  %12d  %7dus  %12d  %7dus" %
+                  (w, br / 4096, tr, bw / 4096, tw))
+            if br + bw > best[1]:
+                best = (w, br + bw)
+        print("\tbest: %d workers" % (best[0]))
+        print("")
@@ -0,0 +1,263 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a replay of operation-level request logs (e.g. from our gateways)
+against a Server or Gateway simulation.  Each logged operation is
+classified into the categories the simulations understand, the cost of
+each class of operation is taken from the simulation, and the resulting
+resource loads are accumulated over fixed windows of (logged) time, so
+that we can see which resources would have saturated, and when.
+
+ACTIVE INGREDIENTS IN MODEL:
+    log format ... one operation per line: timestamp, op, object, offset,
+                   size and client, separated by commas or white space.
+                   Blank lines and lines beginning with '#' are ignored.
+    sequential ... an operation is sequential if it begins where the
+                   previous operation on the same object ended.  We only
+                   remember the most recently used objects.
+    block size ... sizes are rounded up to a power of two
+    concurrency .. each client is assumed to have one request outstanding,
+                   so the request depth is the number of clients that
+                   have issued a request within the last idle interval
+                   (rounded up to a power of two)
+    costs ........ the simulation is only run once for each distinct
+                   (op, block size, sequential, depth) class, and each
+                   operation then contributes (resource load / ops per
+                   second) seconds of busy time to each resource
+    windows ...... are reported as they close, so arbitrarily large logs
+                   stream through in bounded memory
+
+    LATER: we assume the log is (nearly) sorted by timestamp.  Operations
+           that predate the current window are charged to it.
+"""
+
+from collections import OrderedDict
+from units import *
+
+# map logged operation names into simulation methods
+OPS = {
+    'read': 'read', 'get': 'read', 'r': 'read',
+    'write': 'write', 'put': 'write', 'w': 'write',
+    'create': 'create', 'delete': 'delete', 'open': 'open',
+    'getattr': 'getattr', 'stat': 'getattr', 'head': 'getattr',
+    'setattr': 'setattr',
+}
+
+
+def parse(lines, scale=1):
+    """ parse operation log lines into operation tuples
+        lines -- iterable of log lines (e.g. an open file)
+        scale -- log timestamp units per second (default: seconds)
+
+        yields (time (us), op, object, offset, size, client)
+    """
+    factor = float(SECOND) / scale
+    for line in lines:
+        line = line.strip()
+        if line == "" or line.startswith('#'):
+            continue
+        fields = line.replace(',', ' ').split()
+        if len(fields) < 6:
+            continue
+        op = fields[1].lower()
+        yield (float(fields[0]) * factor, OPS[op] if op in OPS else op,
+               fields[2], int(fields[3]), int(fields[4]), fields[5])
+
+
+def round_up(x, smallest=1):
+    """ round a number up to the next power of two """
+    p = smallest
+    while p < x:
+        p *= 2
+    return p
+
+
+class Trace:
+    """ Performance Modeling Operation Log Replay. """
+
+    def __init__(self, target, window=SECOND, idle=SECOND / 100, max_depth=64,
+                 objects=100000, saturation=1.0, min_bsize=512):
+        """ create an operation log replay
+            target -- Server or Gateway simulation
+            window -- (us) length of each reporting window
+            idle -- (us) after which a client is no longer active
+            max_depth -- largest request depth we will simulate
+            objects -- number of objects whose offsets we remember
+            saturation -- load at which a resource is flagged
+            min_bsize -- smallest block size class
+        """
+        self.target = target
+        self.window = window
+        self.idle = idle
+        self.max_depth = max_depth
+        self.objects = objects
+        self.saturation = saturation
+        self.min_bsize = min_bsize
+        self.memo = {}
+        self.offsets = OrderedDict()   # object -> end of last operation
+        self.clients = OrderedDict()   # client -> time of last operation
+        self.unmodeled = {}            # op -> count of unmodeled ops
+
+    def classify(self, t, op, obj, offset, size, client):
+        """ classify a logged operation
+
+            returns (op, block size, sequential, depth)
+        """
+        # was this a continuation of the last operation on this object
+        seq = False
+        if obj in self.offsets:
+            seq = self.offsets[obj] == offset
+            del self.offsets[obj]
+        elif len(self.offsets) >= self.objects:
+            self.offsets.popitem(last=False)
+        self.offsets[obj] = offset + size
+
+        # how many clients are currently active
+        if client in self.clients:
+            del self.clients[client]
+        self.clients[client] = t
+        oldest = next(iter(self.clients))
+        while self.clients[oldest] <= t - self.idle:
+            del self.clients[oldest]
+            oldest = next(iter(self.clients))
+        depth = min(self.max_depth, round_up(len(self.clients)))
+
+        if op in ('read', 'write'):
+            return (op, round_up(size, self.min_bsize), seq, depth)
+        return (op, 0, False, depth)
+
+    def cost(self, key):
+        """ (remembered) per-operation cost of a class of operations
+            key -- (op, block size, sequential, depth)
+
+            returns (latency, {resource: busy seconds per op}) or None
+        """
+        if key in self.memo:
+            return self.memo[key]
+        (op, bsize, seq, depth) = key
+        if op in ('read', 'write'):
+            sim = self.target.read if op == 'read' else self.target.write
+            (t, bw, loads) = sim(bsize, depth=depth, seq=seq)
+            rate = float(bw) / bsize
+        elif hasattr(self.target, op):
+            # metadata operations return IOPS rather than bandwidth
+            (t, rate, loads) = getattr(self.target, op)(depth=depth)
+        else:
+            self.memo[key] = None
+            return None
+
+        busy = {}
+        for k in loads:
+            busy[k] = loads[k] / rate
+        self.memo[key] = (t, busy)
+        return self.memo[key]
+
+    def replay(self, ops):
+        """ replay a stream of operations
+            ops -- iterable of (time, op, object, offset, size, client)
+
+            yields (window start, ops, bytes, avg latency, loads,
+                    saturated resources) for each window
+        """
+        start = None
+        for (t, op, obj, offset, size, client) in ops:
+            if start is None:
+                start = t - (t % self.window)
+                (n, bytes, latency, busy) = (0, 0, 0.0, {})
+            while t >= start + self.window:
+                yield self.report(start, n, bytes, latency, busy)
+                start += self.window
+                (n, bytes, latency, busy) = (0, 0, 0.0, {})
+
+            key = self.classify(t, op, obj, offset, size, client)
+            c = self.cost(key)
+            if c is None:
+                self.unmodeled[op] = self.unmodeled.get(op, 0) + 1
+                continue
+            n += 1
+            bytes += size if key[1] > 0 else 0
+            latency += c[0]
+            for k in c[1]:
+                busy[k] = busy.get(k, 0) + c[1][k]
+
+        if start is not None:
+            yield self.report(start, n, bytes, latency, busy)
+
+    def report(self, start, n, bytes, latency, busy):
+        """ summarize the loads accumulated over one window """
+        secs = float(self.window) / SECOND
+        loads = {}
+        saturated = []
+        for k in busy:
+            loads[k] = busy[k] / secs
+            if loads[k] >= self.saturation:
+                saturated.append(k)
+        saturated.sort()
+        return (start, n, bytes, latency / n if n > 0 else 0,
+                loads, saturated)
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    import sys
+    import random
+    from Arrivals import poisson, mmpp
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+    from Dlm import makeDLM
+    from Gateway import makeGateway
+
+    def synthetic(duration, seed=1):
+        """ a gateway log: steady random 4K clients and bursty streamers """
+        rng = random.Random(seed)
+        ends = {}
+        streams = (poisson(1000, duration, seed),
+                   mmpp((20, 400), (4 * SECOND, 2 * SECOND), duration,
+                        seed))
+        pending = [next(s, None) for s in streams]
+        while True:
+            live = [i for i in range(len(pending)) if pending[i] is not None]
+            if not live:
+                return
+            i = min(live, key=pending.__getitem__)
+            t = pending[i]
+            pending[i] = next(streams[i], None)
+            if i == 0:
+                obj = "obj%d" % rng.randrange(1000000)
+                (off, size) = (4096 * rng.randrange(1024), 4096)
+                client = "c%d" % rng.randrange(16)
+            else:
+                obj = "big%d" % rng.randrange(8)
+                (off, size) = (ends.get(obj, 0), 1 * MB)
+                ends[obj] = off + size
+                client = "s" + obj
+            op = 'GET' if rng.random() < 0.7 else 'PUT'
+            yield "%.6f,%s,%s,%d,%d,%s" % (float(t) / SECOND, op, obj, off,
+                                           size, client)
+
+    s = makeServer(makefs(makedisk({'device': 'disk'}), {}), {'disks': 4})
+    gw = makeGateway(s, makeDLM({}), {'servers': 4, 'cores': 4,
+                                         'front': 10 * GIG})
+    tr = Trace(gw, saturation=0.8)
+    if len(sys.argv) > 1:
+        log = open(sys.argv[1])
+        print("Gateway replay of %s" % (sys.argv[1]))
+    else:
+        log = synthetic(20 * SECOND)
+        print("Gateway replay of a synthetic 20 second log")
+    print("\t time      ops     MB/s   latency    cpu  front   back" +
+          "  saturated")
+    for (t, n, b, lat, loads, sat) in tr.replay(parse(log)):
+        print("\t%4ds %8d %8.1f %8dus  %5.2f  %5.2f  %5.2f  %s" %
+              (t / SECOND, n, b / MEG, lat, loads.get('cpu', 0),
+               loads.get('front', 0), loads.get('back', 0),
+               ",".join(sat)))
+    print("\t(%d classes of operation simulated)" % (len(tr.memo)))
+    print("")
@@ -0,0 +1,312 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a time-stepped simulation of how a Server (or Gateway) responds
+to an offered load that changes over time.  The other simulations only
+describe steady states.  Here we use those steady states to obtain the
+capacity, unloaded latency, and per-resource loads of the target, and
+then advance the transient state (queues, dirty buffers, cache warmth)
+in fixed ticks under a time-varying offered load.
+
+ACTIVE INGREDIENTS IN MODEL:
+    profiles ..... offered load (ops/sec) as a function of time: step,
+                   ramp, diurnal curve or replayed per-second rates
+    queues ....... requests that cannot be served in a tick carry over
+                   (as a backlog) into the next tick, and latency grows
+                   with both utilization and the backlog
+    dirty buffer . (optional) writes are accepted into a writeback buffer
+                   as fast as the front end can take them, and drained
+                   at the rate of the drain resource (e.g. 'fs').  Once
+                   it fills, writes are only accepted as it drains.
+    cache warmth . (optional) a cache starts cold and warms as objects
+                   are touched.  Capacity and latency are interpolated
+                   between a cold and a warm simulation of the target.
+
+    The steady-state simulations are only run a few times (and remembered),
+    so each tick is a handful of arithmetic operations, and a simulated
+    day (at one second resolution) takes well under a second.
+"""
+
+import math
+from units import *
+
+
+class Step:
+    """ offered load that steps from one rate to another """
+
+    def __init__(self, base, peak, at):
+        """ create a step load profile
+            base -- ops/sec before the step
+            peak -- ops/sec after the step
+            at -- (us) time of the step
+        """
+        self.base = base
+        self.peak = peak
+        self.at = at
+
+    def rate(self, t):
+        """ offered ops/sec at time t (us) """
+        return self.peak if t >= self.at else self.base
+
+
+class Ramp:
+    """ offered load that ramps linearly from one rate to another """
+
+    def __init__(self, start, end, duration, begin=0):
+        """ create a ramp load profile
+            start -- ops/sec at the beginning of the ramp
+            end -- ops/sec at (and after) the end of the ramp
+            duration -- (us) length of the ramp
+            begin -- (us) time the ramp begins
+        """
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.begin = begin
+
+    def rate(self, t):
+        """ offered ops/sec at time t (us) """
+        if t <= self.begin:
+            return self.start
+        if t >= self.begin + self.duration:
+            return self.end
+        f = float(t - self.begin) / self.duration
+        return self.start + f * (self.end - self.start)
+
+
+class Diurnal:
+    """ offered load that follows a (sinusoidal) daily cycle """
+
+    def __init__(self, low, high, period=86400 * SECOND, peak_at=None):
+        """ create a diurnal load profile
+            low -- ops/sec at the quietest time of day
+            high -- ops/sec at the busiest time of day
+            period -- (us) length of the cycle
+            peak_at -- (us) time (within the cycle) of the peak
+        """
+        self.low = low
+        self.high = high
+        self.period = period
+        self.peak_at = period * 14 / 24 if peak_at is None else peak_at
+
+    def rate(self, t):
+        """ offered ops/sec at time t (us) """
+        phase = 2 * math.pi * float(t - self.peak_at) / self.period
+        mid = (self.high + self.low) / 2.0
+        return mid + (self.high - mid) * math.cos(phase)
+
+
+class Replay:
+    """ offered load replayed from a list of per-interval rates """
+
+    def __init__(self, rates, interval=SECOND):
+        """ create a replayed load profile
+            rates -- list of ops/sec, one per interval
+            interval -- (us) length of each interval
+        """
+        self.rates = rates
+        self.interval = interval
+
+    def rate(self, t):
+        """ offered ops/sec at time t (us) """
+        i = int(t / self.interval)
+        return self.rates[i] if i < len(self.rates) else 0
+
+
+class Transient:
+    """ Performance Modeling Time-Stepped Transient Simulation. """
+
+    def __init__(self, target, bsize=4096, seq=False, write=False,
+                 depth=32, buffer=0, drain='fs', cold=None, objects=0):
+        """ create a transient simulation
+            target -- Server or Gateway simulation (with a warm cache)
+            bsize -- size of each request
+            seq -- sequential (vs random) requests
+            write -- writes (vs reads)
+            depth -- request depth at which we measure capacity
+            buffer -- bytes of writeback buffer (0 = none)
+            drain -- resource (load key) that drains the buffer
+            cold -- simulation of the same target with a cold cache
+            objects -- number of objects the cache must warm up on
+        """
+        self.target = target
+        self.bsize = bsize
+        self.seq = seq
+        self.write = write
+        self.depth = depth
+        self.buffer = buffer
+        self.drain = drain
+        self.cold = cold
+        self.objects = objects
+        self.memo = {}
+
+    def steady(self, sim):
+        """ (remembered) steady state capacity of a simulation
+
+            returns (capacity ops/sec, unloaded latency, loads at capacity)
+        """
+        if sim in self.memo:
+            return self.memo[sim]
+        op = sim.write if self.write else sim.read
+        (t, bw, loads) = op(self.bsize, depth=self.depth, seq=self.seq)
+        (t1, bw1, l1) = op(self.bsize, depth=1, seq=self.seq)
+        result = (float(bw) / self.bsize, t1, loads)
+        self.memo[sim] = result
+        return result
+
+    def queue_length(self, rho):
+        """ average queue depth as a function of load """
+        if rho >= 1:
+            return self.depth
+        avg = rho / (1 - rho)
+        return avg if avg < self.depth else self.depth
+
+    def run(self, profile, duration, tick=SECOND):
+        """ simulate the response to an offered load
+            profile -- load profile (with a rate(t) method)
+            duration -- (us) length of the simulation
+            tick -- (us) length of each time step
+
+            returns list of (time, offered, ops/sec, latency, loads)
+        """
+        dt = float(tick) / SECOND
+        (cap_w, lat_w, loads_w) = self.steady(self.target)
+        if self.cold is not None:
+            (cap_c, lat_c, loads_c) = self.steady(self.cold)
+            warm = 0.0
+        else:
+            (cap_c, lat_c, loads_c) = (cap_w, lat_w, loads_w)
+            warm = 1.0
+
+        # capacity of the writeback front end and its drain
+        keys = list(loads_w.keys())
+        if self.buffer > 0:
+            front_w = self.capacity(cap_w, loads_w, self.drain)
+            front_c = self.capacity(cap_c, loads_c, self.drain)
+            drain_w = cap_w / loads_w[self.drain]
+            drain_c = cap_c / loads_c[self.drain]
+
+        backlog = 0.0   # requests waiting from previous ticks
+        dirty = 0.0     # bytes in the writeback buffer
+        results = []
+        t = 0
+        while t < duration:
+            offered = profile.rate(t)
+            demand = offered * dt + backlog
+
+            # interpolate between the cold and warm simulations
+            cap = 1 / ((warm / cap_w) + ((1 - warm) / cap_c))
+            base = (warm * lat_w) + ((1 - warm) * lat_c)
+
+            if self.buffer > 0:
+                front = 1 / ((warm / front_w) + ((1 - warm) / front_c))
+                drain = 1 / ((warm / drain_w) + ((1 - warm) / drain_c))
+                room = (self.buffer - dirty) / self.bsize + drain * dt
+                done = min(demand, front * dt, room)
+                dirty += done * self.bsize
+                flushed = min(dirty, drain * self.bsize * dt)
+                dirty = min(self.buffer, dirty - flushed)
+                limit = front if dirty < self.buffer else min(front, drain)
+            else:
+                done = min(demand, cap * dt)
+                limit = cap
+            backlog = demand - done
+            iops = done / dt
+
+            # queueing (within the tick) plus waiting for the backlog
+            rho = iops / limit
+            latency = base * (1 + self.queue_length(rho))
+            latency += backlog * SECOND / limit
+
+            # utilization of each resource
+            loads = {}
+            for k in keys:
+                l_w = loads_w[k] * iops / cap_w
+                l_c = loads_c[k] * iops / cap_c if k in loads_c else l_w
+                loads[k] = (warm * l_w) + ((1 - warm) * l_c)
+            if self.buffer > 0:
+                loads[self.drain] = flushed / (drain * self.bsize * dt)
+                loads['dirty'] = dirty / self.buffer
+            if self.cold is not None:
+                loads['cache'] = warm
+
+            # the cache warms as new objects are touched
+            if warm < 1 and self.objects > 0:
+                warm = 1 - (1 - warm) * math.exp(-done / self.objects)
+
+            t += tick
+            results.append((t, offered, iops, latency, loads))
+        return results
+
+    def capacity(self, cap, loads, exclude):
+        """ capacity (ops/sec) of all resources but one
+            cap -- capacity (ops/sec) at which the loads were measured
+            loads -- resource loads at that capacity
+            exclude -- resource to be ignored
+        """
+        limit = float('inf')
+        for k in loads:
+            if k != exclude and loads[k] > 0:
+                limit = min(limit, cap / loads[k])
+        return limit
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    import time
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+
+    fs = makefs(makedisk({'device': 'disk'}), {})
+    s = makeServer(fs, {'disks': 4, 'cores': 8})
+
+    # a burst of writes into (and back out of) the writeback buffer
+    tr = Transient(s, bsize=4096, write=True, buffer=s.write_buf)
+    (cap, lat, loads) = tr.steady(s)
+    profile = Replay([cap / 2] * 4 + [2 * cap] * 4 + [cap / 2] * 8)
+    print("Server 4K random writes, %dMB buffer, 4s burst of %d IOPS" %
+          (s.write_buf / MB, 2 * cap))
+    print("\t  time   offered      IOPS     latency   dirty   disk")
+    for (t, o, iops, l, ld) in tr.run(profile, 16 * SECOND):
+        print("\t%5ds  %8d  %8d  %8dus   %4.2f   %4.2f" %
+              (t / SECOND, o, iops, l, ld['dirty'], ld['fs']))
+    print("")
+
+    # a cold object cache warming up under random reads
+    cold = makeServer(fs, {'disks': 4, 'cores': 8})
+    cold.ocache = None
+    objects = s.ocache.objects(s.num_disks * fs.size)
+    tr = Transient(s, bsize=4096, cold=cold, objects=objects)
+    (cap, lat, loads) = tr.steady(cold)
+    print("Server 4K random reads (%d objects), cold cache, %d IOPS" %
+          (objects, cap))
+    print("\t  time   offered      IOPS     latency   warm")
+    results = tr.run(Step(0, cap, 0), 4 * 3600 * SECOND,
+                     tick=30 * 60 * SECOND)
+    for (t, o, iops, l, ld) in results:
+        print("\t%5dm  %8d  %8d  %8dus   %4.2f" %
+              (t / SECOND / 60, o, iops, l, ld['cache']))
+    print("")
+
+    # a simulated day, at one second resolution
+    tr = Transient(s, bsize=4096, write=True, buffer=s.write_buf)
+    (cap, lat, loads) = tr.steady(s)
+    start = time.time()
+    day = tr.run(Diurnal(cap / 10, cap), 86400 * SECOND)
+    elapsed = time.time() - start
+    worst = day[0]
+    for r in day:
+        if r[3] > worst[3]:
+            worst = r
+    print("Server 4K random writes, diurnal load (peak %d IOPS)" % (cap))
+    print("\t%d ticks in %3.1f seconds, worst latency %dus at %02d:%02d" %
+          (len(day), elapsed, worst[3], worst[0] / SECOND / 3600,
+           (worst[0] / SECOND / 60) % 60))
+    print("")
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+#
+# nonesuch
+#
+
+"""
+This is a simulation of a battery-backed (NVRAM) write buffer in a
+Gateway, in which small writes are acknowledged as soon as they are
+safely buffered, and accumulate into (hopefully full) stripes before
+being flushed to the storage servers.
+
+ACTIVE INGREDIENTS IN MODEL:
+    locality ... the probability that the next block of a stripe
+                 is written while that stripe is still in the buffer.
+                 A stripe of k blocks fills if k-1 consecutive
+                 continuations all arrive in time.
+    streams .... the number of stripes being written concurrently.
+                 If the buffer cannot hold one open stripe per stream,
+                 (LRU) flushing evicts stripes before they fill.
+    policy ..... 'watermark' starts flushing when the buffer reaches
+                 high_water (leaving the rest to absorb bursts),
+                 'age' flushes anything older than flush_age.
+    stalls ..... when the buffer is full, writes wait for a flush.
+                 We model the buffer as an M/M/1/K queue.
+"""
+
+import math
+from units import *
+
+
+class WriteBuffer:
+    """ Performance Modeling Gateway Stripe Buffer Simulation. """
+
+    def __init__(self, size=1 * GB, bw=2 * GIG, policy='watermark',
+                 high_water=0.75, flush_age=SECOND, locality=0.5):
+        """ create a write buffer simulation
+            size -- bytes of NVRAM
+            bw -- NVRAM write bandwidth (bytes/sec)
+            policy -- flush policy ('watermark' or 'age')
+            high_water -- fraction of the buffer that triggers flushing
+            flush_age -- (us) maximum age of buffered data ('age' policy)
+            locality -- probability a stripe continues while buffered
+        """
+        self.size = size
+        self.bw = bw
+        self.policy = policy
+        self.high_water = high_water
+        self.flush_age = flush_age
+        self.locality = locality
+        self.desc = "%dMB NVRAM (%s)" % (size / MB, policy)
+
+        # magic performance tuning constants
+        self.min_latency = 5    # (us) NVRAM write setup/completion
+
+    def write_time(self, bytes):
+        """ elapsed time to commit a write into NVRAM """
+        return self.min_latency + (float(bytes) * SECOND / self.bw)
+
+    def capacity(self):
+        """ bytes of buffer available for accumulating stripes """
+        if self.policy == 'watermark':
+            return self.high_water * self.size
+        return self.size
+
+    def continuation(self, stripe, streams=1, t_gap=0):
+        """ probability next block of a stripe arrives before it is flushed
+            stripe -- bytes per (data) stripe
+            streams -- number of stripes being concurrently written
+            t_gap -- (us) time between successive writes to a stripe
+        """
+        p = self.locality
+
+        # open stripes beyond the buffer capacity get evicted
+        slots = self.capacity() / stripe
+        if streams > slots:
+            p *= float(slots) / streams
+
+        # old stripes get flushed whether or not they are full
+        if self.policy == 'age' and t_gap > 0:
+            p *= math.exp(-float(t_gap) / self.flush_age)
+        return p
+
+    def full_fraction(self, bsize, stripe, streams=1, t_gap=0):
+        """ fraction of writes that end up in full-stripe writes
+            bsize -- bytes per write
+            stripe -- bytes per (data) stripe
+            streams -- number of stripes being concurrently written
+            t_gap -- (us) time between successive writes to a stripe
+        """
+        if bsize >= stripe:
+            return 1.0
+        k = int(stripe / bsize)     # writes per stripe
+        p = self.continuation(stripe, streams, t_gap)
+        if p >= 1:
+            return 1.0
+
+        # each stripe gets a geometric number of writes (capped at k)
+        #   writes per stripe = (1 - p^k) / (1 - p)
+        #   writes in full stripes = k * p^(k-1)
+        return k * (p ** (k - 1)) * (1 - p) / (1 - p ** k)
+
+    def stall(self, rho, bsize):
+        """ probability that an arriving write finds the buffer full
+            rho -- ratio of write arrival rate to flush rate
+            bsize -- bytes per write
+        """
+        K = max(1, int(self.size / bsize))
+        if rho <= 0:
+            return 0.0
+        elif abs(rho - 1) < 0.000001:
+            return 1.0 / (K + 1)
+
+        # M/M/1/K blocking probability (in log space to avoid overflow)
+        #   (1 - rho) rho^K / (1 - rho^(K+1))
+        if rho < 1:
+            return (1 - rho) * math.exp(K * math.log(rho)) / \
+                (1 - math.exp((K + 1) * math.log(rho)))
+        r = 1.0 / rho
+        return (1 - r) / (1 - math.exp((K + 1) * math.log(r)))
+
+    def traffic(self, code, bsize, strip, full):
+        """ back-end bytes moved per buffered write
+            code -- Coding scheme for the stripes
+            bsize -- bytes per write
+            strip -- bytes per strip
+            full -- fraction of writes that form full stripes
+        """
+        t_full = bsize * float(code.width) / code.n
+        t_part = code.write_bytes(bsize, strip)
+        return (full * t_full) + ((1 - full) * t_part)
+
+
+def makeWriteBuffer(dict):
+    """ instantiate the write buffer described by a configuration dict
+        dict -- of write buffer parameters
+            nvram -- buffer size (bytes)
+            nvram_bw -- buffer write bandwidth (bytes/sec)
+            flush -- flush policy ('watermark' or 'age')
+            high_water -- fraction of buffer that triggers flushing
+            flush_age -- (us) maximum age of buffered data
+            locality -- probability a stripe continues while buffered
+    """
+
+    dflts = {
+        'nvram': 1 * GB,
+        'nvram_bw': 2 * GIG,
+        'flush': 'watermark',
+        'high_water': 0.75,
+        'flush_age': SECOND,
+        'locality': 0.5,
+    }
+
+    size = dict['nvram'] if 'nvram' in dict else dflts['nvram']
+    bw = dict['nvram_bw'] if 'nvram_bw' in dict else dflts['nvram_bw']
+    policy = dict['flush'] if 'flush' in dict else dflts['flush']
+    hw = dict['high_water'] if 'high_water' in dict else dflts['high_water']
+    age = dict['flush_age'] if 'flush_age' in dict else dflts['flush_age']
+    loc = dict['locality'] if 'locality' in dict else dflts['locality']
+
+    return WriteBuffer(size, bw, policy=policy, high_water=hw,
+                       flush_age=age, locality=loc)
+
+
+def buffertest(wb, code, strip=128 * KB, streams=(1, 32, 1024),
+               bsizes=(4096, 16 * 1024, 128 * 1024)):
+    """ tabulate stripe coalescing for a write buffer
+        wb -- write buffer to be tested
+        code -- Coding scheme for the stripes
+        strip -- bytes per strip
+        streams -- list of concurrent stripe counts
+        bsizes -- list of write sizes
+    """
+
+    stripe = strip * code.n
+    print("%s, %s stripes, locality=%4.2f" %
+          (wb.desc, code.desc, wb.locality))
+    print("\t  size  streams   full   stall(.9)  stall(1.1)  back-end")
+    for bs in bsizes:
+        for s in streams:
+            f = wb.full_fraction(bs, stripe, streams=s)
+            before = code.write_bytes(bs, strip)
+            after = wb.traffic(code, bs, strip, f)
+            print("\t%5dK  %7d  %5.3f  %10.2e  %10.2e    %5.1f%%" %
+                  (bs / 1024, s, f, wb.stall(0.9, bs), wb.stall(1.1, bs),
+                   100.0 * after / before))
+    print("")
+
+
+#
+# basic unit test exerciser
+#
+if __name__ == '__main__':
+
+    import Coding
+    code = Coding.makeCode({})
+    for loc in (0.5, 0.99):
+        wb = makeWriteBuffer({'locality': loc, 'nvram': 64 * MB})
+        buffertest(wb, code)
+
+    from SimDisk import makedisk
+    from SimFS import makefs
+    from Server import makeServer
+    from Dlm import makeDLM
+    from Gateway import makeGateway, gatewaytest
+    s = makeServer(makefs(makedisk({}), {}), {})
+    dlm = makeDLM({})
+    for d in ({}, {'nvram': 64 * MB, 'locality': 0.99}):
+        gw = makeGateway(s, dlm, d)
+        msg = "no NVRAM" if gw.wbuf is None else gw.wbuf.desc
+        gatewaytest(gw, {'SioCdepth': [16], 'SioCbs': [4096]}, descr=msg)
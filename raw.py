@@ -0,0 +1,189 @@
+#
+# NO COPYRIGHT/COPYLEFT
+#
+#   This module defines a sub-class of the Open Source SimFS
+#   file system simulation, and as such is an "application"
+#   under the Gnu Lesser General Public Licence.  It can be
+#   reproduced, modified, and distributed without restriction.
+#
+
+"""
+    A simulation of an object store that writes directly to the raw
+    device (with no underlying file system), with its own allocator,
+    and with all metadata (object nodes, extent maps, free space)
+    kept in an LSM key-value store on the same device.
+
+    ACTIVE INGREDIENTS IN MODEL:
+        large writes .... are appended to newly allocated space (so even
+                          random writes are sequential on the device),
+                          followed by one key-value transaction
+        small writes .... (below the deferred threshold) are committed
+                          to the key-value store's write-ahead log, and
+                          later applied in place (asynchronously)
+        checksums ....... every block written is checksummed, and every
+                          block read is verified
+        compression ..... (optional) reduces the bytes written and read,
+                          at the cost of compression/decompression CPU
+
+    The metadata operations (open, create, getattr, ...) are inherited
+    from SimFS.FS, and go to the key-value store through md_read_time
+    and md_write_time.
+"""
+
+import math
+from SimFS import FS, interpolate
+from Lsm import LSM
+from units import *
+
+
+class raw(FS):
+    """ raw device object store simulation """
+
+    def __init__(self, disk, cpu=None, deferred=64 * 1024, compress=1,
+                 min_alloc=64 * 1024, cache=1 * GB):
+        """ Instantiate a raw device object store simulation
+            disk -- device on which objects are stored
+            cpu -- SimCPU for checksum/compression computation (or None)
+            deferred -- writes smaller than this go through the WAL
+            compress -- expected compression ratio (1 = no compression)
+            min_alloc -- allocation unit (bytes)
+            cache -- bytes of metadata (key-value block) cache
+        """
+
+        FS.__init__(self, disk, cpu=cpu, md_span=0.5)
+        self.desc = "RAW"
+        if compress > 1:
+            self.desc += "(%3.1fx)" % compress
+        self.deferred = deferred
+        self.compress = compress
+        self.min_alloc = min_alloc
+
+        # all of our metadata lives in a key-value store
+        self.kv = LSM(disk, cpu=cpu, db_size=disk.size / 1000, cache=cache)
+
+        # we do our own allocation, so I/Os are not broken up
+        self.max_shard = 4096 * 1024
+        self.seq_shard = True
+        self.max_dir_r = {4096: 32, 4096 * 1024: 32}
+        self.max_dir_w = {4096: 32, 4096 * 1024: 32}
+
+        # one key-value transaction per operation
+        self.md_open = 1.0       # object node lookup
+        self.md_create = 1.0     # object node and collection entry
+        self.md_delete = 1.0     # object node and freed extents
+
+        # FIX ... these CPU costs are guesses
+        self.cpu_read = {4096: 10, 4096 * 1024: 60}
+        self.cpu_write = {4096: 30, 4096 * 1024: 90}
+        self.cpu_open = 20
+        self.cpu_create = 40
+        self.cpu_delete = 20
+        self.cpu_getatr = 5
+        self.cpu_setatr = 10
+
+    def stored(self, bsize):
+        """ bytes actually written to the device for a block """
+        if self.compress <= 1:
+            return bsize
+        b = float(bsize) / self.compress
+        # compressed blobs are still allocated in min_alloc units
+        if bsize >= self.min_alloc:
+            units = int(math.ceil(b / self.min_alloc))
+            b = max(1, units) * self.min_alloc
+        return min(bsize, int(b))
+
+    def cpu_data(self, bsize, write):
+        """ CPU time (us) to checksum and (de)compress a block
+            bsize -- bytes per operation
+            write -- write (vs read) operation
+        """
+        if self.cpu is None:
+            return 0
+        t = self.cpu.sha_cpu(bsize)
+        if self.compress > 1:
+            if write:
+                t += self.cpu.compress_cpu(bsize, self.compress)
+            else:
+                t += self.cpu.decompress_cpu(bsize, self.compress)
+        return t
+
+    def read(self, bsize, file_size, seq=True, depth=1, direct=False,
+             streams=1):
+        """ average time for reads from a single object
+            bsize -- read unit (bytes)
+            file_size -- size of object being read from (bytes)
+            seq -- sequential (vs random) read
+            depth -- number of queued operations
+            streams -- number of (interleaved) sequential streams
+        """
+
+        # large reads are already in a single extent
+        shards = 1
+        if bsize > self.max_shard:
+            shards = bsize / self.max_shard
+            bsize = self.max_shard
+
+        d = depth * shards
+        time = shards * self.disk.avgRead(self.stored(bsize), file_size,
+                                          seq=seq, depth=d, streams=streams)
+
+        # the extent map must be found (unless it is still cached)
+        cpu = interpolate(self.cpu_read, bsize)
+        if not seq:
+            time += self.md_read_time(depth=d)
+            cpu += self.md_read_cpu()
+
+        bw = bsize * shards * SECOND / time
+
+        loads = {}
+        loads['disk'] = 1.0
+        loads['cpu'] = (cpu + shards * self.cpu_data(bsize, False)) / SECOND
+        return (time, bw, loads)
+
+    def write(self, bsize, file_size, seq=True, depth=1,
+              direct=False, sync=False, streams=1):
+        """ average time for writes to a single object
+            bsize -- write unit (bytes)
+            file_size -- size of object being written to (bytes)
+            seq -- sequential (vs random) write
+            depth -- number of queued operations
+            direct -- (ignored, we never go through a buffer cache)
+            sync -- force flush after write
+            streams -- number of (interleaved) sequential streams
+                       (appends to free space are not interleaved)
+        """
+
+        shards = 1
+        if bsize > self.max_shard:
+            shards = bsize / self.max_shard
+            bsize = self.max_shard
+        d = depth * shards
+        size = self.stored(bsize)
+
+        if bsize < self.deferred:
+            # the data goes into the WAL with the metadata ...
+            batch = 1 if sync else min(d, self.kv.log_batch)
+            t_log = self.disk.avgWrite(batch * (size + self.kv.entry),
+                                       self.disk.size, seq=True) / batch
+
+            # ... and is later written in place (asynchronously)
+            t = self.disk.avgWrite(size, file_size, seq=seq, streams=streams)
+            d_flush = self.flush_depth(size, t)
+            t_place = self.disk.avgWrite(size, file_size, seq=seq,
+                                         depth=d_flush, streams=streams)
+            time = t_log + self.kv.bg_time() + t_place
+        else:
+            # new data is appended to free space, then the metadata
+            time = shards * self.disk.avgWrite(size, self.disk.size,
+                                               seq=True, depth=d)
+            time += self.md_write_time(depth=1 if sync else d)
+
+        bw = bsize * shards * SECOND / time
+
+        # either way, the metadata is a put to the key-value store
+        loads = {}
+        loads['disk'] = 1.0
+        cpu = interpolate(self.cpu_write, bsize) + self.md_write_cpu()
+        loads['cpu'] = (cpu + shards * self.cpu_data(bsize, True)) / SECOND
+        return (time, bw, loads)
+
@@ -52,6 +52,19 @@ dlm = {
     'nics': 1
 }
 
+mds = {
+    # Metadata Server
+    'cpu': "xeon",
+    'speed': 2.5 * GIG,
+    'cores': 2,
+    'cpus': 1,
+    'nic': 10 * GIG,
+    'nics': 1,
+    'journal': 'ssd',
+    'device': 'disk',
+    'fs': 'xfs'
+}
+
 #
 # tests to be run
 #
@@ -75,6 +88,7 @@ tests = {
     # Gateway performance tests
     'SioCdepth': [1, 16],
     'SioCbs': (4096, 128 * 1024, 4096 * 1024),
+    'SioCmisc': True,
 }
 
 #   instantiate the described objects and run the described tests
@@ -118,9 +132,14 @@ if __name__ == '__main__':
     import Dlm
     myDlm = Dlm.makeDLM(dlm)
 
+    # instantiate a metadata server (on its own metadata file system)
+    import Mds
+    myMDisk = SimDisk.makedisk(mds)
+    myMds = Mds.makeMDS(SimFS.makefs(myMDisk, mds), mds)
+
     # instantiate and test the gateway server
     import Gateway
-    myGate = Gateway.makeGateway(myServer, myDlm, gateway)
+    myGate = Gateway.makeGateway(myServer, myDlm, gateway, mds=myMds)
     msg = "%dx%s, front=%dx%s, back=%dx%s" % (
         myGate.num_cpus, myGate.cpu.desc,
         myGate.num_fronts, myGate.front.desc,